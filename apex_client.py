@@ -1,16 +1,23 @@
 import os
 import time
 import json
+import asyncio
+import heapq
 import random
 import inspect
+import functools
 import re
 import threading
 import queue
+from bisect import bisect_left
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal, ROUND_DOWN
 from typing import Any, Dict, Optional, Tuple, Union, Iterable, Set, List
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Public WS client (top-of-book)
 try:
@@ -46,11 +53,24 @@ DEFAULT_SYMBOL_RULES = {
     "price_decimals": 2,
 }
 
+# Copy-on-write: writers build a new dict and rebind SYMBOL_RULES under _SYMBOL_RULES_LOCK;
+# readers just look up whatever map is current and never take the lock.
 SYMBOL_RULES: Dict[str, Dict[str, Any]] = {}
 
 # Cache timestamp for dynamically fetched market rules
 _SYMBOL_RULES_TS: float = 0.0
-_SYMBOL_RULES_LOCK = threading.Lock()
+_SYMBOL_RULES_LOCK = threading.Lock()  # serializes writers (swap + snapshot file)
+_SYMBOL_RULES_FETCH_LOCK = threading.Lock()  # one refresh at a time
+_SYMBOL_RULES_ENDPOINT: Optional[str] = None  # endpoint that last returned rules
+_SYMBOL_RULES_RETRY_TS: float = 0.0  # background refreshes pause until then after a failure
+
+# Last good rules snapshot, loaded at import so a restart doesn't fall back to DEFAULT_SYMBOL_RULES.
+# Lives next to the PnL database (pnl_store resolves PNL_DB_PATH the same way), not in the source tree.
+_DATA_DIR = os.path.dirname(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    os.getenv("PNL_DB_PATH", "pnl.sqlite3"),
+))
+SYMBOL_RULES_CACHE_PATH = os.path.join(_DATA_DIR, os.getenv("SYMBOL_RULES_CACHE_PATH", "symbol_rules.json"))
 
 NumberLike = Union[str, int, float]
 
@@ -66,15 +86,11 @@ _CLIENT: Optional[HttpPrivateSign] = None
 _WS_STARTED = False
 _WS_LOCK = threading.Lock()
 
-# Fill aggregation per orderId
-_FILL_AGG: Dict[str, Dict[str, Any]] = {}
+# Order status + fill aggregation per orderId: see OrderStateStore / _ORDERS below.
 
 # (orderId, fillId) dedupe with TTL (OrderedDict as LRU)
 _FILL_DEDUPE: "OrderedDict[str, float]" = OrderedDict()
 
-# Order state cache (status/cumQty/avg)
-_ORDER_STATE: Dict[str, Dict[str, Any]] = {}
-
 # A small queue of raw fill events (optional; currently not consumed by app.py)
 _FILL_Q: "queue.Queue[dict]" = queue.Queue(maxsize=20000)
 
@@ -110,10 +126,10 @@ _PUB_WS_TOPICS_LOCK = threading.Lock()
 _PUB_LAST_MSG_TS = 0.0
 _PUB_LAST_PONG_TS = 0.0
 
-_BOOKS_BY_TOPIC: Dict[str, Dict[str, Any]] = {}
+_BOOKS_BY_TOPIC: Dict[str, "_OrderBook"] = {}
 
-_L1_LOCK = threading.Lock()
-_L1_CACHE: Dict[str, Dict[str, Any]] = {}
+_L1_LOCK = threading.Lock()  # guards _L1_CACHE and every _OrderBook
+_L1_CACHE: Dict[str, Dict[str, Any]] = {}  # symbol -> {"book", "bid", "ask" (last good BBO ticks), "px_scale", "ts", "topic", "u"}
 
 
 # REST poller
@@ -176,6 +192,145 @@ def _get_api_credentials() -> Dict[str, str]:
     }
 
 
+# -----------------------------------------------------------------------------
+# Shared HTTP session
+# One keep-alive connection pool per process for every REST call (public helpers and,
+# where the SDK exposes its requests.Session, the SDK too). Only GET/HEAD are retried.
+# -----------------------------------------------------------------------------
+HTTP_POOL_SIZE = int(os.getenv("APEX_HTTP_POOL_SIZE") or os.getenv("GUNICORN_THREADS") or "16")
+HTTP_RETRIES = int(os.getenv("APEX_HTTP_RETRIES", "2"))
+HTTP_BACKOFF_SEC = float(os.getenv("APEX_HTTP_BACKOFF_SEC", "0.2"))
+HTTP_KEEPALIVE_SEC = float(os.getenv("APEX_HTTP_KEEPALIVE_SEC", "45"))
+
+_HTTP_SESSION: Optional[requests.Session] = None
+_HTTP_SESSION_PID: Optional[int] = None
+_HTTP_ADAPTER: Optional[HTTPAdapter] = None
+_HTTP_LOCK = threading.Lock()
+_HTTP_LAST_USE = 0.0
+_HTTP_WARMER_PID: Optional[int] = None
+
+
+def _http_adapter() -> HTTPAdapter:
+    kw = dict(
+        total=HTTP_RETRIES,
+        connect=HTTP_RETRIES,
+        read=0,  # a slow ticker is better reported than retried
+        status=HTTP_RETRIES,
+        backoff_factor=HTTP_BACKOFF_SEC,
+        status_forcelist=(429, 500, 502, 503, 504),
+        raise_on_status=False,
+    )
+    try:
+        retry = Retry(allowed_methods=frozenset({"GET", "HEAD"}), **kw)
+    except TypeError:  # urllib3 < 1.26
+        retry = Retry(method_whitelist=frozenset({"GET", "HEAD"}), **kw)
+    return HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+
+
+def _http_session() -> requests.Session:
+    """Process-wide session (recreated after fork: pooled sockets must not be shared)."""
+    global _HTTP_SESSION, _HTTP_SESSION_PID, _HTTP_ADAPTER
+    s = _HTTP_SESSION
+    if s is not None and _HTTP_SESSION_PID == os.getpid():
+        return s
+    with _HTTP_LOCK:
+        if _HTTP_SESSION is None or _HTTP_SESSION_PID != os.getpid():
+            _HTTP_ADAPTER = _http_adapter()
+            s = requests.Session()
+            s.mount("https://", _HTTP_ADAPTER)
+            s.mount("http://", _HTTP_ADAPTER)
+            s.headers.update({"Accept": "application/json", "Connection": "keep-alive"})
+            _HTTP_SESSION, _HTTP_SESSION_PID = s, os.getpid()
+        return _HTTP_SESSION
+
+
+def _http_get(url: str, params: Optional[Dict[str, Any]] = None, timeout: float = 8.0) -> requests.Response:
+    global _HTTP_LAST_USE
+    _HTTP_LAST_USE = time.time()
+    return _http_session().get(url, params=params, timeout=timeout)
+
+
+def _share_http_pool(client: Any) -> None:
+    """Mount the shared adapter on the SDK's own requests.Session, if it has one."""
+    _http_session()
+    for attr in ("client", "session", "_session", "http_session"):
+        sess = getattr(client, attr, None)
+        if isinstance(sess, requests.Session):
+            sess.mount("https://", _HTTP_ADAPTER)
+            sess.mount("http://", _HTTP_ADAPTER)
+
+
+def warm_http_connections(n: Optional[int] = None) -> int:
+    """Open up to n pooled connections to the REST host (TLS handshakes happen here, not on
+    the first order). Returns how many warm-up requests succeeded."""
+    base_url, _ = _get_base_and_network()
+    n = max(1, int(n or min(4, HTTP_POOL_SIZE)))
+    ok = [0]
+
+    def _one():
+        try:
+            _http_get(f"{base_url}/api/v3/time", timeout=5).close()
+            ok[0] += 1
+        except Exception:
+            pass
+
+    # concurrent requests each check out their own connection, so the pool ends up with n
+    threads = [threading.Thread(target=_one, daemon=True) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(6)
+    return ok[0]
+
+
+def start_http_warmer() -> None:
+    """Warm the pool once, then keep it from idling out (ping when unused for HTTP_KEEPALIVE_SEC)."""
+    global _HTTP_WARMER_PID
+    with _HTTP_LOCK:
+        if _HTTP_WARMER_PID == os.getpid():
+            return
+        _HTTP_WARMER_PID = os.getpid()
+
+    def _loop():
+        print(f"[apex_client][http] warmed {warm_http_connections()} connection(s) pool_size={HTTP_POOL_SIZE}")
+        if HTTP_KEEPALIVE_SEC <= 0:
+            return
+        while True:
+            time.sleep(HTTP_KEEPALIVE_SEC / 3)
+            if time.time() - _HTTP_LAST_USE >= HTTP_KEEPALIVE_SEC:
+                warm_http_connections(1)
+
+    threading.Thread(target=_loop, daemon=True, name="http-warmer").start()
+
+
+_SIG_CACHE: Dict[Any, Optional[Tuple[bool, frozenset]]] = {}
+
+
+def _sig_info(fn) -> Optional[Tuple[bool, frozenset]]:
+    """(accepts **kwargs, parameter names) for fn, cached per underlying function; None if
+    the signature is not available. Per-call wrappers name their target in _sig_key so
+    they share its entry instead of adding one each."""
+    key = getattr(fn, "__func__", fn)
+    key = getattr(key, "_sig_key", key)
+    try:
+        return _SIG_CACHE[key]
+    except KeyError:
+        pass
+    except TypeError:
+        key = None  # unhashable callable
+    try:
+        params = inspect.signature(fn).parameters
+        info: Optional[Tuple[bool, frozenset]] = (
+            any(p.kind == inspect.Parameter.VAR_KEYWORD for p in params.values()),
+            frozenset(params.keys()),
+        )
+    except (ValueError, TypeError):
+        info = None
+    if key is not None:
+        _SIG_CACHE[key] = info
+    return info
+
+
 def _safe_call(fn, **kwargs):
     """
     Call an SDK function in a cross-version compatible way.
@@ -210,29 +365,25 @@ def _safe_call(fn, **kwargs):
             raise last
         raise RuntimeError("_safe_call: call failed")
 
-    try:
-        sig = inspect.signature(fn)
-        params = sig.parameters
-        has_var_kw = any(p.kind == inspect.Parameter.VAR_KEYWORD for p in params.values())
-
-        if has_var_kw:
-            return _call_with_prune(fn, call_kwargs)
+    info = _sig_info(fn)
+    if info is None:
+        # Signature not available (C-extensions / dynamic wrappers): prune on error.
+        return _call_with_prune(fn, call_kwargs)
 
-        allowed = set(params.keys())
-        filtered = {k: v for k, v in call_kwargs.items() if k in allowed}
+    has_var_kw, allowed = info
+    if has_var_kw:
+        return _call_with_prune(fn, call_kwargs)
 
-        try:
-            return _call_with_prune(fn, filtered)
-        except TypeError as e:
-            msg = str(e)
-            # Critical: if filtering caused missing required args, retry unfiltered.
-            if ("missing" in msg) and (("required positional argument" in msg) or ("required positional arguments" in msg)):
-                return _call_with_prune(fn, call_kwargs)
-            raise
+    filtered = {k: v for k, v in call_kwargs.items() if k in allowed}
 
-    except (ValueError, TypeError):
-        # Signature not available (C-extensions / dynamic wrappers): prune on error.
-        return _call_with_prune(fn, call_kwargs)
+    try:
+        return _call_with_prune(fn, filtered)
+    except TypeError as e:
+        msg = str(e)
+        # Critical: if filtering caused missing required args, retry unfiltered.
+        if ("missing" in msg) and (("required positional argument" in msg) or ("required positional arguments" in msg)):
+            return _call_with_prune(fn, call_kwargs)
+        raise
 
 
 def _extract_data_dict(res: Any) -> Optional[Dict[str, Any]]:
@@ -389,6 +540,12 @@ def get_client() -> HttpPrivateSign:
 
     # Install shims first so snake/camel are both available where safe.
     _install_compat_shims(client)
+    _share_http_pool(client)
+    if os.getenv("APEX_PREFLIGHT_CALL_SHAPES", "1") != "0":
+        try:
+            preflight_call_shapes(client)
+        except Exception as e:
+            print(f"[apex_client][WARN] call-shape preflight failed (continuing): {e}")
 
     # Best-effort: initialize v3 configs (some SDK builds rely on it for v3 helpers)
     try:
@@ -402,9 +559,13 @@ def get_client() -> HttpPrivateSign:
     # CRITICAL: ensure accountV3 cache is a dict (SDK internal usage)
     _ensure_account_v3_cache(client)
 
-    # Best-effort: fetch dynamic market rules (stepSize/minQty/tickSize)
+    # Best-effort: fetch dynamic market rules (stepSize/minQty/tickSize). With a warm
+    # snapshot loaded, refresh in the background instead of delaying the first order.
     try:
-        refresh_symbol_rules(force=False)
+        if SYMBOL_RULES:
+            refresh_symbol_rules_async()
+        else:
+            refresh_symbol_rules(force=False)
     except Exception as e:
         print(f'[apex_client][WARN] refresh_symbol_rules failed (continuing): {e}')
 
@@ -615,7 +776,114 @@ def _parse_rule_item(item: Dict[str, Any]) -> Optional[Tuple[str, Dict[str, Any]
     return sym, rule
 
 
-def refresh_symbol_rules(force: bool = False) -> bool:
+_SYMBOL_RULES_ENDPOINTS = [
+    # v3-style
+    '/api/v3/symbols',
+    '/api/v3/markets',
+    '/api/v3/instruments',
+    '/api/v3/contracts',
+    '/api/v3/exchangeInfo',
+    # older variants sometimes seen
+    '/api/v2/symbols',
+    '/api/v2/markets',
+    '/api/v1/symbols',
+    '/api/v1/markets',
+    '/api/v1/exchangeInfo',
+]
+
+
+def _swap_symbol_rules(updates: Dict[str, Dict[str, Any]], ts: Optional[float] = None, persist: bool = True) -> None:
+    """Merge per-symbol updates into a copy of SYMBOL_RULES and swap it in (keeps fields the
+    update doesn't carry, e.g. earlier overrides)."""
+    global SYMBOL_RULES, _SYMBOL_RULES_TS
+    with _SYMBOL_RULES_LOCK:
+        new = dict(SYMBOL_RULES)
+        for sym, rule in updates.items():
+            merged = dict(new.get(sym, {}))
+            merged.update(rule)
+            new[sym] = merged
+        SYMBOL_RULES = new
+        if ts is not None:
+            _SYMBOL_RULES_TS = ts
+        if persist:
+            _save_symbol_rules_cache()
+
+
+def _set_symbol_rule(symbol: str, rule: Dict[str, Any]) -> None:
+    _swap_symbol_rules({format_symbol(symbol): rule})
+
+
+def _save_symbol_rules_cache() -> None:
+    """Write the current rules + endpoint to SYMBOL_RULES_CACHE_PATH (atomic rename)."""
+    base_url, _ = _get_base_and_network()
+    snap = {
+        "ts": _SYMBOL_RULES_TS,
+        "base_url": base_url,
+        "endpoint": _SYMBOL_RULES_ENDPOINT,
+        "rules": {
+            sym: {k: (str(v) if isinstance(v, Decimal) else v) for k, v in rule.items()}
+            for sym, rule in SYMBOL_RULES.items()
+        },
+    }
+    tmp = f"{SYMBOL_RULES_CACHE_PATH}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(SYMBOL_RULES_CACHE_PATH), exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(snap, f, separators=(",", ":"))
+        os.replace(tmp, SYMBOL_RULES_CACHE_PATH)
+    except Exception as e:
+        print(f"[apex_client][WARN] symbol rules snapshot write failed: {e}")
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+def _load_symbol_rules_cache() -> int:
+    """Warm start from the last snapshot; returns the number of symbols loaded."""
+    global _SYMBOL_RULES_ENDPOINT
+    try:
+        with open(SYMBOL_RULES_CACHE_PATH, "r", encoding="utf-8") as f:
+            snap = json.load(f)
+    except FileNotFoundError:
+        return 0
+    except Exception as e:
+        print(f"[apex_client][WARN] symbol rules snapshot unreadable ({e}); ignoring")
+        return 0
+    base_url, _ = _get_base_and_network()
+    if not isinstance(snap, dict) or snap.get("base_url") != base_url:
+        return 0  # other network (testnet vs mainnet)
+
+    int_keys = ("qty_decimals", "price_decimals")
+    rules: Dict[str, Dict[str, Any]] = {}
+    for sym, rule in (snap.get("rules") or {}).items():
+        if not isinstance(rule, dict):
+            continue
+        try:
+            rules[sym] = {k: (int(v) if k in int_keys else Decimal(str(v))) for k, v in rule.items()}
+        except Exception:
+            continue
+    if not rules:
+        return 0
+    _SYMBOL_RULES_ENDPOINT = snap.get("endpoint") or None
+    _swap_symbol_rules(rules, ts=float(snap.get("ts") or 0.0), persist=False)
+    print(f"[apex_client][rules] warm start: {len(rules)} symbols from {SYMBOL_RULES_CACHE_PATH} (endpoint={_SYMBOL_RULES_ENDPOINT})")
+    return len(rules)
+
+
+def _fetch_symbol_rules(base_url: str, ep: str) -> Dict[str, Dict[str, Any]]:
+    resp = _http_get(f'{base_url}{ep}', timeout=10)
+    resp.raise_for_status()
+    out: Dict[str, Dict[str, Any]] = {}
+    for it in _extract_list_payload(resp.json()):
+        parsed = _parse_rule_item(it)
+        if parsed:
+            sym, rule = parsed
+            out[sym] = rule
+    return out
+
+
+def refresh_symbol_rules(force: bool = False, wait: bool = True) -> bool:
     """Fetch market rules (stepSize/minQty/tickSize) and populate SYMBOL_RULES.
 
     Why this matters:
@@ -625,17 +893,22 @@ def refresh_symbol_rules(force: bool = False) -> bool:
 
     Behavior:
       - Best-effort and safe: never crashes startup; prints a warning on failure.
-      - Cached with a TTL.
+      - Cached with a TTL; the result is swapped in copy-on-write and snapshotted to
+        SYMBOL_RULES_CACHE_PATH, so readers never wait on it.
+      - The endpoint that worked is remembered and tried alone first next time.
+      - wait=False returns immediately if another refresh is already running.
       - Can be disabled via env APEX_DISABLE_SYMBOL_RULES_FETCH=1
     """
+    global _SYMBOL_RULES_ENDPOINT, _SYMBOL_RULES_RETRY_TS
     if _env_bool('APEX_DISABLE_SYMBOL_RULES_FETCH', False):
         return False
 
     ttl = float(os.getenv('SYMBOL_RULES_TTL_SEC', '3600'))
-    now = time.time()
 
-    global _SYMBOL_RULES_TS
-    with _SYMBOL_RULES_LOCK:
+    if not _SYMBOL_RULES_FETCH_LOCK.acquire(blocking=wait):
+        return bool(SYMBOL_RULES)
+    try:
+        now = time.time()
         if (not force) and _SYMBOL_RULES_TS and (now - _SYMBOL_RULES_TS) < ttl and SYMBOL_RULES:
             return True
 
@@ -643,60 +916,47 @@ def refresh_symbol_rules(force: bool = False) -> bool:
         # ApeX environments/SDK builds differ in which public endpoints are exposed.
         # We try a broader set; the first endpoint that yields parseable instruments
         # will populate SYMBOL_RULES.
-        endpoints = [
-            # v3-style
-            '/api/v3/symbols',
-            '/api/v3/markets',
-            '/api/v3/instruments',
-            '/api/v3/contracts',
-            '/api/v3/exchangeInfo',
-            # older variants sometimes seen
-            '/api/v2/symbols',
-            '/api/v2/markets',
-            '/api/v1/symbols',
-            '/api/v1/markets',
-            '/api/v1/exchangeInfo',
-        ]
+        endpoints = list(_SYMBOL_RULES_ENDPOINTS)
+        if _SYMBOL_RULES_ENDPOINT:
+            if _SYMBOL_RULES_ENDPOINT in endpoints:
+                endpoints.remove(_SYMBOL_RULES_ENDPOINT)
+            endpoints.insert(0, _SYMBOL_RULES_ENDPOINT)
 
-        loaded = 0
         tried = 0
         last_err: Optional[Exception] = None
 
         for ep in endpoints:
             tried += 1
             try:
-                url = f'{base_url}{ep}'
-                resp = requests.get(url, timeout=10)
-                resp.raise_for_status()
-                j = resp.json()
-                items = _extract_list_payload(j)
-                if not items:
-                    continue
-
-                for it in items:
-                    parsed = _parse_rule_item(it)
-                    if not parsed:
-                        continue
-                    sym, rule = parsed
-                    # Merge into dict (keep any pre-config overrides)
-                    cur = SYMBOL_RULES.get(sym, {})
-                    merged = dict(cur)
-                    merged.update(rule)
-                    SYMBOL_RULES[sym] = merged
-                    loaded += 1
-
-                if loaded > 0:
-                    _SYMBOL_RULES_TS = now
-                    print(f'[apex_client][rules] loaded {len(SYMBOL_RULES)} symbols from {ep}')
-                    return True
-
+                rules = _fetch_symbol_rules(base_url, ep)
             except Exception as e:
                 last_err = e
                 continue
+            if rules:
+                _SYMBOL_RULES_ENDPOINT = ep
+                _swap_symbol_rules(rules, ts=now)
+                print(f'[apex_client][rules] loaded {len(rules)} symbols from {ep} (requests={tried})')
+                return True
 
+        _SYMBOL_RULES_RETRY_TS = time.time() + 60.0
         if last_err:
             print(f'[apex_client][WARN] symbol rules fetch failed (tried={tried}): {last_err}')
         return False
+    finally:
+        _SYMBOL_RULES_FETCH_LOCK.release()
+
+
+def refresh_symbol_rules_async(force: bool = False) -> None:
+    """refresh_symbol_rules on a daemon thread (no-op while one is running)."""
+    if _SYMBOL_RULES_FETCH_LOCK.locked() or time.time() < _SYMBOL_RULES_RETRY_TS:
+        return
+    threading.Thread(
+        target=refresh_symbol_rules, kwargs={"force": force, "wait": False},
+        daemon=True, name="symbol-rules-refresh",
+    ).start()
+
+
+_load_symbol_rules_cache()
 
 
 # -----------------------------------------------------------------------------
@@ -705,6 +965,8 @@ def refresh_symbol_rules(force: bool = False) -> bool:
 
 def _get_symbol_rules(symbol: str) -> Dict[str, Any]:
     s = format_symbol(symbol)
+    if _SYMBOL_RULES_TS and time.time() - _SYMBOL_RULES_TS > float(os.getenv('SYMBOL_RULES_TTL_SEC', '3600')):
+        refresh_symbol_rules_async()
     rules = SYMBOL_RULES.get(s)
     if rules:
         merged = dict(DEFAULT_SYMBOL_RULES)
@@ -752,17 +1014,47 @@ def _dec_to_str(d: Decimal) -> str:
 # This function returns a conservative price bound (worst price).
 # -----------------------------------------------------------------------------
 
-def get_reference_price(symbol: str) -> Decimal:
-    """Public ticker-based reference price (no auth)."""
+# Ticker cache: one entry per symbol, refreshed at most once per TICKER_TTL_SEC. Concurrent
+# misses for the same symbol share a single in-flight request (single-flight).
+TICKER_TTL_SEC = float(os.getenv("TICKER_TTL_SEC", "1.0"))
+TICKER_WAIT_SEC = float(os.getenv("TICKER_WAIT_SEC", "20"))
+
+_TICKER_LOCK = threading.Lock()
+_TICKER_CACHE: Dict[str, Tuple[Decimal, float, Dict[str, Any]]] = {}  # BTC-USDT -> (price, ts, ticker item)
+_TICKER_INFLIGHT: Dict[str, "_TickerFlight"] = {}
+_TICKER_SYMBOL_FMT: Dict[str, str] = {}  # BTC-USDT -> the symbol form /ticker accepted
+
+
+class _TickerFlight:
+    __slots__ = ("done", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.error: Optional[Exception] = None
+
+
+def _ticker_price(item: Dict[str, Any]) -> Optional[Decimal]:
+    for k in ("indexPrice", "markPrice", "lastPrice", "price"):
+        v = item.get(k)
+        if v is None or v == "":
+            continue
+        return Decimal(str(v))
+    return None
+
+
+def _fetch_ticker(sym_dash: str) -> Tuple[Decimal, Dict[str, Any]]:
     base_url, _ = _get_base_and_network()
-    sym_dash = format_symbol(symbol)
     candidates = [sym_dash.replace("-", ""), sym_dash]
+    known = _TICKER_SYMBOL_FMT.get(sym_dash)
+    if known in candidates:
+        candidates.remove(known)
+        candidates.insert(0, known)
 
     last_err: Optional[Exception] = None
     for sym in candidates:
         try:
             url = f"{base_url}/api/v3/ticker"
-            resp = requests.get(url, params={"symbol": sym}, timeout=8)
+            resp = _http_get(url, params={"symbol": sym}, timeout=8)
             resp.raise_for_status()
             j = resp.json()
 
@@ -777,19 +1069,223 @@ def get_reference_price(symbol: str) -> Decimal:
             if not isinstance(item, dict):
                 raise ValueError("ticker item is not dict")
 
-            for k in ("indexPrice", "markPrice", "lastPrice", "price"):
-                v = item.get(k)
-                if v is None or v == "":
-                    continue
-                return Decimal(str(v))
-
-            raise ValueError(f"no numeric price in ticker: keys={list(item.keys())}")
+            price = _ticker_price(item)
+            if price is None:
+                raise ValueError(f"no numeric price in ticker: keys={list(item.keys())}")
+            _TICKER_SYMBOL_FMT[sym_dash] = sym
+            return price, item
         except Exception as e:
             last_err = e
 
     raise ValueError(f"ticker lookup failed for {sym_dash} (last_err={last_err})")
 
 
+def get_reference_price_with_age(symbol: str, max_age_sec: Optional[float] = None) -> Tuple[Decimal, float]:
+    """(price, age_sec) from the ticker cache; refetches when older than max_age_sec
+    (default TICKER_TTL_SEC). Raises if the ticker cannot be fetched."""
+    sym_dash = format_symbol(symbol)
+    if max_age_sec is not None:
+        ttl = float(max_age_sec)
+    elif _tickers_bulk_fresh():
+        # the refresher keeps entries current; don't race it with per-symbol calls
+        ttl = max(TICKER_TTL_SEC, 3 * TICKERS_BULK_INTERVAL_SEC)
+    else:
+        ttl = TICKER_TTL_SEC
+
+    with _TICKER_LOCK:
+        hit = _TICKER_CACHE.get(sym_dash)
+        now = time.time()
+        if hit and now - hit[1] <= ttl:
+            return hit[0], now - hit[1]
+        flight = _TICKER_INFLIGHT.get(sym_dash)
+        leader = flight is None
+        if leader:
+            flight = _TICKER_INFLIGHT[sym_dash] = _TickerFlight()
+
+    if not leader:
+        if not flight.done.wait(TICKER_WAIT_SEC):
+            raise TimeoutError(f"ticker lookup for {sym_dash} still in flight")
+        if flight.error is not None:
+            raise flight.error
+        with _TICKER_LOCK:
+            hit = _TICKER_CACHE.get(sym_dash)
+        if not hit:
+            raise ValueError(f"ticker lookup failed for {sym_dash}")
+        return hit[0], max(0.0, time.time() - hit[1])
+
+    try:
+        price, item = _fetch_ticker(sym_dash)
+        with _TICKER_LOCK:
+            _TICKER_CACHE[sym_dash] = (price, time.time(), item)
+        return price, 0.0
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _TICKER_LOCK:
+            _TICKER_INFLIGHT.pop(sym_dash, None)
+        flight.done.set()
+
+
+def get_reference_price(symbol: str) -> Decimal:
+    """Public ticker-based reference price (no auth), cached for TICKER_TTL_SEC."""
+    return get_reference_price_with_age(symbol)[0]
+
+
+# Bulk ticker refresher: one all-markets request every TICKERS_BULK_INTERVAL_SEC feeds the
+# same ticker cache, so per-symbol /ticker calls only happen for symbols the bulk response lacks.
+TICKERS_BULK_INTERVAL_SEC = float(os.getenv("TICKERS_BULK_INTERVAL_SEC", "0.5"))
+TICKERS_BULK_PATHS = [
+    x.strip() for x in os.getenv("TICKERS_BULK_PATHS", "/api/v3/tickers,/api/v3/ticker").split(",") if x.strip()
+]
+
+_TICKERS_BULK_PATH: Optional[str] = None
+_TICKERS_BULK_TS = 0.0
+_TICKERS_BULK_PID: Optional[int] = None
+
+
+def _ticker_item_symbol(item: Dict[str, Any]) -> Optional[str]:
+    raw = _pick(item, "symbol", "crossSymbolName", "symbolName", "contractName")
+    return format_symbol(raw) if raw else None
+
+
+def refresh_tickers_bulk() -> int:
+    """Fetch every market's ticker in one request and publish it into the ticker cache.
+
+    Returns the number of symbols updated (0 if no bulk endpoint answered usefully).
+    """
+    global _TICKERS_BULK_PATH, _TICKERS_BULK_TS
+    base_url, _ = _get_base_and_network()
+    paths = list(TICKERS_BULK_PATHS)
+    if _TICKERS_BULK_PATH in paths:
+        paths.remove(_TICKERS_BULK_PATH)
+        paths.insert(0, _TICKERS_BULK_PATH)
+
+    for path in paths:
+        try:
+            resp = _http_get(f"{base_url}{path}", timeout=5)
+            resp.raise_for_status()
+            items = _extract_list_payload(resp.json())
+        except Exception:
+            continue
+
+        fresh: Dict[str, Tuple[Decimal, Dict[str, Any]]] = {}
+        for it in items:
+            sym = _ticker_item_symbol(it)
+            if not sym:
+                continue
+            try:
+                price = _ticker_price(it)
+            except Exception:
+                continue
+            if price is not None and price > 0:
+                fresh[sym] = (price, it)
+        if len(fresh) < 2:
+            # a single-symbol default is not an all-markets ticker
+            continue
+
+        now = time.time()
+        with _TICKER_LOCK:
+            for sym, (price, it) in fresh.items():
+                _TICKER_CACHE[sym] = (price, now, it)
+        _TICKERS_BULK_PATH = path
+        _TICKERS_BULK_TS = now
+        return len(fresh)
+    return 0
+
+
+def _tickers_bulk_fresh() -> bool:
+    return time.time() - _TICKERS_BULK_TS <= 3 * TICKERS_BULK_INTERVAL_SEC
+
+
+def start_ticker_refresher() -> None:
+    """Background bulk ticker refresh (idempotent per process). Backs off to 60s while
+    no bulk endpoint works; per-symbol lookups keep working meanwhile."""
+    global _TICKERS_BULK_PID
+    with _TICKER_LOCK:
+        if _TICKERS_BULK_PID == os.getpid():
+            return
+        _TICKERS_BULK_PID = os.getpid()
+
+    def _loop():
+        fails = 0
+        while True:
+            try:
+                n = refresh_tickers_bulk()
+            except Exception as e:
+                print(f"[apex_client][tickers] bulk refresh error: {e}")
+                n = 0
+            if n > 0:
+                if fails:
+                    print(f"[apex_client][tickers] bulk refresh ok via {_TICKERS_BULK_PATH} ({n} symbols)")
+                fails = 0
+                time.sleep(TICKERS_BULK_INTERVAL_SEC)
+                continue
+            fails += 1
+            if fails == 1:
+                print(f"[apex_client][tickers] no bulk ticker endpoint answered (tried {TICKERS_BULK_PATHS}); per-symbol fallback")
+            time.sleep(min(60.0, TICKERS_BULK_INTERVAL_SEC * (2 ** min(fails, 8))))
+
+    threading.Thread(target=_loop, daemon=True, name="ticker-refresher").start()
+
+
+def get_price_table(symbols: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """Snapshot of cached tickers: {symbol: {"mark", "index", "last", "age"}} (Decimals or None)."""
+    now = time.time()
+    with _TICKER_LOCK:
+        if symbols is None:
+            items = list(_TICKER_CACHE.items())
+        else:
+            items = [(s, _TICKER_CACHE[s]) for s in {format_symbol(x) for x in symbols} if s in _TICKER_CACHE]
+    out: Dict[str, Dict[str, Any]] = {}
+    for sym, (_price, ts, it) in items:
+        out[sym] = {
+            "mark": _to_dec(_pick(it, "markPrice", "mark_price")),
+            "index": _to_dec(_pick(it, "indexPrice", "index_price", "oraclePrice")),
+            "last": _to_dec(_pick(it, "lastPrice", "last_price")),
+            "age": max(0.0, now - ts),
+        }
+    return out
+
+
+def get_cached_mark_price(symbol: str, max_age_sec: float = 2.0) -> Optional[Decimal]:
+    """Mark (then index, then last) from the ticker cache if younger than max_age_sec; no I/O."""
+    row = get_price_table([symbol]).get(format_symbol(symbol))
+    if not row or row["age"] > max_age_sec:
+        return None
+    for k in ("mark", "index", "last"):
+        v = row.get(k)
+        if v is not None and v > 0:
+            return v
+    return None
+
+
+PUBLIC_WS_TICKER_STALE_SEC = float(os.getenv("PUBLIC_WS_TICKER_STALE_SEC", "5.0"))
+
+
+def get_ticker(symbol: str) -> Dict[str, Any]:
+    """Latest ticker fields (markPrice/indexPrice/lastPrice, ...) for symbol.
+
+    Served from the shared ticker cache, which the public WS ticker stream (subscribed here
+    on first use unless ENABLE_PUBLIC_WS_TICKER=0) and the bulk refresher keep current.
+    Only when neither has a fresh row does this make a per-symbol REST call.
+    """
+    sym = format_symbol(symbol)
+    if _env_bool("ENABLE_PUBLIC_WS_TICKER", True):
+        try:
+            ensure_public_ticker_subscription(sym)
+        except Exception:
+            pass
+    with _TICKER_LOCK:
+        hit = _TICKER_CACHE.get(sym)
+    if hit and time.time() - hit[1] <= PUBLIC_WS_TICKER_STALE_SEC:
+        return dict(hit[2])
+    get_reference_price_with_age(sym)
+    with _TICKER_LOCK:
+        hit = _TICKER_CACHE.get(sym)
+    return dict(hit[2]) if hit else {}
+
+
 def get_mark_price(symbol: str) -> Decimal:
     """Return MARK price if available; otherwise fallback to INDEX then LAST.
 
@@ -799,13 +1295,13 @@ def get_mark_price(symbol: str) -> Decimal:
     ticker = get_ticker(symbol)
     # Common key names seen on different streams
     for k in ('markPrice', 'mark_price', 'mark'):
-        if k in ticker and ticker[k] is not None:
+        if ticker.get(k) not in (None, ''):
             return Decimal(str(ticker[k]))
     for k in ('indexPrice', 'index_price', 'index'):
-        if k in ticker and ticker[k] is not None:
+        if ticker.get(k) not in (None, ''):
             return Decimal(str(ticker[k]))
     for k in ('lastPrice', 'last_price', 'last'):
-        if k in ticker and ticker[k] is not None:
+        if ticker.get(k) not in (None, ''):
             return Decimal(str(ticker[k]))
     # Last resort: reuse reference price logic (may raise if none found)
     return get_reference_price(symbol)
@@ -867,6 +1363,174 @@ def _random_client_id() -> str:
     return str(int(float(str(random.random())[2:])))
 
 
+# -----------------------------------------------------------------------------
+# Learned call shapes
+# create_order_v3's parameter names/positions drift across apexomni versions, and finding the
+# working spelling costs a probe through dozens of TypeErrors. The first call that succeeds is
+# recorded as a shape (positional fields + keyword names) per (method, kind, has clientId) and
+# replayed directly afterwards. A shape that fails is dropped and the probe runs again.
+# -----------------------------------------------------------------------------
+
+_FIELD_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "symbol": ("symbol",),
+    "side": ("side",),
+    "type": ("type", "orderType", "order_type"),
+    "size": ("size", "qty", "quantity"),
+    "price": ("price", "limitPrice", "worstPrice", "worst_price"),
+    "tif": ("timeInForce", "time_in_force", "tif"),
+    "reduce_only": ("reduceOnly", "reduce_only"),
+    "client_id": ("clientId", "clientOrderId", "client_id"),
+    "trigger_price": ("triggerPrice", "trigger_price"),
+}
+_ALIAS_FIELD = {alias: field for field, aliases in _FIELD_ALIASES.items() for alias in aliases}
+_POSITIONAL_FIELDS = ("symbol", "side", "type", "size", "price")  # positional patterns keep this order
+
+_CALL_SHAPES_LOCK = threading.Lock()
+_CALL_SHAPES: Dict[Tuple[str, str, bool], "_CallShape"] = {}
+
+
+class _CallShape:
+    __slots__ = ("pos", "kw", "source")
+
+    def __init__(self, pos: Tuple[str, ...], kw: Tuple[Tuple[str, str], ...], source: str) -> None:
+        self.pos = pos  # fields passed positionally, in order
+        self.kw = kw  # (sdk keyword, field)
+        self.source = source  # "probe" | "preflight"
+
+    def call(self, fn, fields: Dict[str, Any]) -> Any:
+        kwargs = {name: fields[f] for name, f in self.kw if fields.get(f) is not None}
+        return fn(*[fields[f] for f in self.pos], **kwargs)
+
+    def __repr__(self) -> str:
+        return f"pos={list(self.pos)} kw={[n for n, _f in self.kw]} ({self.source})"
+
+
+def _sdk_version() -> str:
+    try:
+        from importlib.metadata import version
+        return version("apexomni")
+    except Exception:
+        return "?"
+
+
+def _shape_from_call(args: Tuple[Any, ...], kwargs: Dict[str, Any], fields: Dict[str, Any]) -> Optional[_CallShape]:
+    """Map a successful call back to field names; None if any argument can't be attributed."""
+    pos: List[str] = []
+    i = 0
+    for a in args:
+        while i < len(_POSITIONAL_FIELDS) and fields.get(_POSITIONAL_FIELDS[i]) != a:
+            i += 1
+        if i >= len(_POSITIONAL_FIELDS):
+            return None
+        pos.append(_POSITIONAL_FIELDS[i])
+        i += 1
+    kw = []
+    for name in kwargs:
+        f = _ALIAS_FIELD.get(name)
+        if f is None or f not in fields:
+            return None
+        kw.append((name, f))
+    return _CallShape(tuple(pos), tuple(kw), "probe")
+
+
+def _shape_from_signature(fn, fields: Dict[str, Any], prefs: Dict[str, Tuple[str, ...]]) -> Optional[_CallShape]:
+    """Keyword-only shape from the installed SDK's signature: per field, the first preferred
+    spelling the method names. None when the signature is unavailable or only **kwargs."""
+    info = _sig_info(fn)
+    if info is None:
+        return None
+    _has_var_kw, names = info
+    kw = []
+    for f in fields:
+        hit = next((a for a in prefs.get(f, _FIELD_ALIASES[f]) if a in names), None)
+        if hit is None and f != "tif":
+            return None  # a field with no named parameter: leave it to the probe
+        if hit is not None:
+            kw.append((hit, f))
+    if not kw:
+        return None
+    return _CallShape((), tuple(kw), "preflight")
+
+
+def _record_calls(fn):
+    """Wrap fn so the probe's successful call can be read back; keeps fn's signature."""
+    calls: List[Tuple[Tuple[Any, ...], Dict[str, Any]]] = []
+
+    @functools.wraps(fn)
+    def _rec(*args, **kwargs):
+        calls.append((args, dict(kwargs)))
+        return fn(*args, **kwargs)
+
+    _rec._sig_key = getattr(fn, "__func__", fn)  # type: ignore[attr-defined]
+    return _rec, calls
+
+
+def _shaped_call(client: HttpPrivateSign, method: str, kind: str, fields: Dict[str, Any], probe) -> Any:
+    """client.<method>(...) with the learned shape for (method, kind); probe(fn) on a miss."""
+    key = (method, kind, fields.get("client_id") is not None)
+    fn = getattr(client, method)
+    shape = _CALL_SHAPES.get(key)
+    if shape is not None:
+        try:
+            return shape.call(fn, fields)
+        except TypeError as e:
+            # only a signature mismatch means the shape is stale; API/network errors propagate
+            with _CALL_SHAPES_LOCK:
+                if _CALL_SHAPES.get(key) is shape:
+                    del _CALL_SHAPES[key]
+            print(f"[apex_client][shape] {method}/{kind} {shape} failed ({e}); re-probing")
+
+    rec, calls = _record_calls(fn)
+    t0 = time.perf_counter()
+    try:
+        res = probe(rec)
+    except Exception:
+        print(f"[apex_client][shape] {method}/{kind} probe failed after {len(calls)} attempt(s) "
+              f"{(time.perf_counter() - t0) * 1000:.1f}ms")
+        raise
+    learned = _shape_from_call(calls[-1][0], calls[-1][1], fields) if calls else None
+    if learned is not None:
+        with _CALL_SHAPES_LOCK:
+            _CALL_SHAPES[key] = learned
+    print(f"[apex_client][shape] {method}/{kind} probed: {len(calls)} attempt(s) "
+          f"{(time.perf_counter() - t0) * 1000:.1f}ms -> {learned if learned is not None else 'not cacheable'}")
+    return res
+
+
+# Spelling preference per kind, matching the order the probes try them in.
+_ORDER_SHAPE_PREFS: Dict[str, Tuple[str, ...]] = {}
+_TRIGGER_SHAPE_PREFS: Dict[str, Tuple[str, ...]] = {
+    "type": ("type", "orderType"),
+    "size": ("size", "qty"),
+    "price": ("price", "limitPrice"),
+    "client_id": ("clientOrderId", "clientId", "client_id"),
+}
+
+
+def preflight_call_shapes(client: HttpPrivateSign) -> None:
+    """Seed the shape cache from create_order_v3's signature (no request is sent). The first
+    real order still verifies it; a wrong guess costs one failed call and a probe."""
+    fn = getattr(client, "create_order_v3", None)
+    if fn is None:
+        return
+    t0 = time.perf_counter()
+    order = {"symbol": "", "side": "", "type": "", "size": "", "price": "", "tif": "", "reduce_only": False, "client_id": ""}
+    trigger = {"symbol": "", "side": "", "type": "", "size": "", "price": "", "trigger_price": "", "reduce_only": False, "client_id": ""}
+    seeded = {}
+    for kind, fields, prefs in (("order", order, _ORDER_SHAPE_PREFS), ("trigger", trigger, _TRIGGER_SHAPE_PREFS)):
+        for has_cid in (True, False):
+            f = fields if has_cid else {k: v for k, v in fields.items() if k != "client_id"}
+            shape = _shape_from_signature(fn, f, prefs)
+            if shape is not None:
+                seeded[("create_order_v3", kind, has_cid)] = shape
+    with _CALL_SHAPES_LOCK:
+        for key, shape in seeded.items():
+            _CALL_SHAPES.setdefault(key, shape)
+    print(f"[apex_client][shape] preflight apexomni={_sdk_version()} "
+          f"{(time.perf_counter() - t0) * 1000:.1f}ms: "
+          + (", ".join(f"{k[1]}{'+cid' if k[2] else ''} {v}" for k, v in seeded.items()) or "no usable signature; will probe"))
+
+
 def _create_order_v3_compat(
     client: HttpPrivateSign,
     *,
@@ -879,7 +1543,8 @@ def _create_order_v3_compat(
     client_id: Optional[str],
 ) -> Any:
     """
-    SDK parameter names differ across apexomni versions.
+    SDK parameter names differ across apexomni versions. The probe below finds the working
+    spelling once; later orders replay it via _shaped_call.
 
     NOTE:
     We also ensure accountV3 cache is dict before sending order (some SDK builds require it).
@@ -1029,44 +1694,56 @@ def _create_order_v3_compat(
             raise last_e
         raise RuntimeError("positional patterns all failed")
 
-    last_exc = None
-    fn = getattr(client, "create_order_v3")
-
-    for t in type_variants:
-        for s in size_variants:
-            for p in price_variants:
-                for tif in tif_variants:
-                    for r in reduce_variants:
-                        for c in client_variants:
-                            payload = {}
-                            payload.update(base)
-                            payload.update(t)
-                            payload.update(s)
-                            payload.update(p)
-                            payload.update(tif)
-                            payload.update(r)
-                            payload.update(c)
-                            try:
-                                return _safe_call(fn, **payload)
-                            except TypeError as e:
-                                last_exc = e
-                                msg = str(e)
-                                if ("missing" in msg and (("required positional argument" in msg) or ("required positional arguments" in msg))) or (
-                                    "unexpected keyword argument" in msg and ("'type'" in msg or "'size'" in msg)
-                                ):
-                                    try:
-                                        return _try_positional(fn, payload)
-                                    except Exception as e2:
-                                        last_exc = e2
-                                        continue
-                                continue
-                            except Exception as e:
-                                last_exc = e
-                                continue
+    def _probe(fn):
+        last_exc = None
+
+        for t in type_variants:
+            for s in size_variants:
+                for p in price_variants:
+                    for tif in tif_variants:
+                        for r in reduce_variants:
+                            for c in client_variants:
+                                payload = {}
+                                payload.update(base)
+                                payload.update(t)
+                                payload.update(s)
+                                payload.update(p)
+                                payload.update(tif)
+                                payload.update(r)
+                                payload.update(c)
+                                try:
+                                    return _safe_call(fn, **payload)
+                                except TypeError as e:
+                                    last_exc = e
+                                    msg = str(e)
+                                    if ("missing" in msg and (("required positional argument" in msg) or ("required positional arguments" in msg))) or (
+                                        "unexpected keyword argument" in msg and ("'type'" in msg or "'size'" in msg)
+                                    ):
+                                        try:
+                                            return _try_positional(fn, payload)
+                                        except Exception as e2:
+                                            last_exc = e2
+                                            continue
+                                    continue
+                                except Exception as e:
+                                    last_exc = e
+                                    continue
+
+        if last_exc:
+            raise last_exc
+        raise RuntimeError("create_order_v3 failed with all compatible parameter variants")
 
-    if last_exc:
-        raise last_exc
-    raise RuntimeError("create_order_v3 failed with all compatible parameter variants")
+    fields = {
+        "symbol": symbol,
+        "side": side,
+        "type": order_type,
+        "size": size,
+        "price": price,
+        "tif": "IOC",
+        "reduce_only": bool(reduce_only),
+        "client_id": str(client_id) if client_id else None,
+    }
+    return _shaped_call(client, "create_order_v3", "order", fields, _probe)
 
 
 def create_market_order(
@@ -1200,14 +1877,11 @@ def create_market_order(
                                 )
                                 # Persist inferred rule for future orders
                                 try:
-                                    cur = SYMBOL_RULES.get(sym, {})
-                                    merged = dict(cur)
-                                    merged.update({
+                                    _set_symbol_rule(sym, {
                                         'step_size': inferred_step,
                                         'min_qty': max(min_now, inferred_step) if min_now else inferred_step,
                                         'qty_decimals': _decimals_from_step(inferred_step) or 0
                                     })
-                                    SYMBOL_RULES[sym] = merged
                                     print(f"[apex_client][rules][infer] {sym} overriding stepSize={inferred_step} (from rejection msg)")
                                 except Exception:
                                     pass
@@ -1265,10 +1939,7 @@ def create_market_order(
 
                     # Persist the inferred integer rule so future orders are snapped correctly.
                     try:
-                        cur = SYMBOL_RULES.get(sym, {})
-                        merged = dict(cur)
-                        merged.update({'step_size': Decimal('1'), 'min_qty': Decimal('1'), 'qty_decimals': 0})
-                        SYMBOL_RULES[sym] = merged
+                        _set_symbol_rule(sym, {'step_size': Decimal('1'), 'min_qty': Decimal('1'), 'qty_decimals': 0})
                         print(f"[apex_client][rules][infer] {sym} appears integer-sized; overriding stepSize=1 minQty=1")
                     except Exception:
                         pass
@@ -1384,110 +2055,115 @@ def create_trigger_order(
             {"client_id": str(client_order_id)},
         ]
 
-    last_exc: Optional[Exception] = None
-    for t in type_variants:
-        for s in size_variants:
-            for p in price_variants:
-                for trig in trigger_variants:
-                    for r in reduce_variants:
-                        for c in client_variants:
-                            payload: Dict[str, Any] = {}
-                            payload.update(base)
-                            payload.update(t)
-                            payload.update(s)
-                            payload.update(p)
-                            payload.update(trig)
-                            payload.update(r)
-                            payload.update(c)
-                            try:
-                                res = _safe_call(getattr(client, "create_order_v3"), **payload)
-                                data = _extract_data_dict(res)
-                                if isinstance(data, dict):
-                                    oid = data.get("orderId") or data.get("id")
-                                    if oid:
-                                        register_order_for_tracking(str(oid), str(client_order_id or ""), sym)
-                                return res
-                            except Exception as e:
-                                # Some SDK builds require positional args (notably: type + size). Try a broader
-                                # positional fallback before giving up.
-                                last_exc = e
-
+    def _probe(fn):
+        last_exc: Optional[Exception] = None
+        for t in type_variants:
+            for s in size_variants:
+                for p in price_variants:
+                    for trig in trigger_variants:
+                        for r in reduce_variants:
+                            for c in client_variants:
+                                payload: Dict[str, Any] = {}
+                                payload.update(base)
+                                payload.update(t)
+                                payload.update(s)
+                                payload.update(p)
+                                payload.update(trig)
+                                payload.update(r)
+                                payload.update(c)
                                 try:
-                                    if isinstance(e, TypeError) and ("missing" in str(e)) and ("required positional argument" in str(e)):
-                                        fn = getattr(client, "create_order_v3")
-
-                                        ty = payload.get("type") or payload.get("orderType") or payload.get("order_type")
-                                        sz = payload.get("size") or payload.get("qty") or payload.get("quantity")
-                                        px = payload.get("price") or payload.get("limitPrice") or payload.get("worstPrice") or payload.get("worst_price")
-
-                                        if ty is None or sz is None:
-                                            raise e
-
-                                        TYPE_KEYS = ("type", "orderType", "order_type")
-                                        SIZE_KEYS = ("size", "qty", "quantity")
-                                        PRICE_KEYS = ("price", "limitPrice", "worstPrice", "worst_price")
-                                        SIDE_KEYS = ("side",)
-                                        SYM_KEYS = ("symbol",)
-
-                                        def _call_positional_with_prune(f, args, kw_payload: Dict[str, Any]):
-                                            p = dict(kw_payload)
-                                            last = None
-                                            for _ in range(12):
+                                    return _safe_call(fn, **payload)
+                                except Exception as e:
+                                    # Some SDK builds require positional args (notably: type + size). Try a broader
+                                    # positional fallback before giving up.
+                                    last_exc = e
+
+                                    try:
+                                        if isinstance(e, TypeError) and ("missing" in str(e)) and ("required positional argument" in str(e)):
+                                            ty = payload.get("type") or payload.get("orderType") or payload.get("order_type")
+                                            sz = payload.get("size") or payload.get("qty") or payload.get("quantity")
+                                            px = payload.get("price") or payload.get("limitPrice") or payload.get("worstPrice") or payload.get("worst_price")
+
+                                            if ty is None or sz is None:
+                                                raise e
+
+                                            TYPE_KEYS = ("type", "orderType", "order_type")
+                                            SIZE_KEYS = ("size", "qty", "quantity")
+                                            PRICE_KEYS = ("price", "limitPrice", "worstPrice", "worst_price")
+                                            SIDE_KEYS = ("side",)
+                                            SYM_KEYS = ("symbol",)
+
+                                            def _call_positional_with_prune(f, args, kw_payload: Dict[str, Any]):
+                                                p = dict(kw_payload)
+                                                last = None
+                                                for _ in range(12):
+                                                    try:
+                                                        return f(*args, **p)
+                                                    except TypeError as te:
+                                                        last = te
+                                                        msg = str(te)
+                                                        m = re.search(r"unexpected keyword argument ['\"]([^'\"]+)['\"]", msg)
+                                                        if m:
+                                                            bad = m.group(1)
+                                                            p.pop(bad, None)
+                                                            continue
+                                                        raise
+                                                if last:
+                                                    raise last
+                                                raise RuntimeError("positional prune failed")
+
+                                            def _kw_without(remove_keys: Tuple[str, ...]):
+                                                kw = dict(payload)
+                                                for k in remove_keys:
+                                                    kw.pop(k, None)
+                                                return kw
+
+                                            patterns = [
+                                                ([ty, sz], TYPE_KEYS + SIZE_KEYS),
+                                                ([ty, sz, px] if px is not None else None, TYPE_KEYS + SIZE_KEYS + PRICE_KEYS),
+                                                ([side_u, ty, sz], SIDE_KEYS + TYPE_KEYS + SIZE_KEYS),
+                                                ([side_u, ty, sz, px] if px is not None else None, SIDE_KEYS + TYPE_KEYS + SIZE_KEYS + PRICE_KEYS),
+                                                ([sym, side_u, ty, sz], SYM_KEYS + SIDE_KEYS + TYPE_KEYS + SIZE_KEYS),
+                                                ([sym, side_u, ty, sz, px] if px is not None else None, SYM_KEYS + SIDE_KEYS + TYPE_KEYS + SIZE_KEYS + PRICE_KEYS),
+                                                ([sym, ty, sz], SYM_KEYS + TYPE_KEYS + SIZE_KEYS),
+                                                ([sym, ty, sz, px] if px is not None else None, SYM_KEYS + TYPE_KEYS + SIZE_KEYS + PRICE_KEYS),
+                                            ]
+
+                                            for args, remove in patterns:
+                                                if args is None:
+                                                    continue
                                                 try:
-                                                    return f(*args, **p)
-                                                except TypeError as te:
-                                                    last = te
-                                                    msg = str(te)
-                                                    m = re.search(r"unexpected keyword argument ['\"]([^'\"]+)['\"]", msg)
-                                                    if m:
-                                                        bad = m.group(1)
-                                                        p.pop(bad, None)
-                                                        continue
-                                                    raise
-                                            if last:
-                                                raise last
-                                            raise RuntimeError("positional prune failed")
-
-                                        def _kw_without(remove_keys: Tuple[str, ...]):
-                                            kw = dict(payload)
-                                            for k in remove_keys:
-                                                kw.pop(k, None)
-                                            return kw
-
-                                        patterns = [
-                                            ([ty, sz], TYPE_KEYS + SIZE_KEYS),
-                                            ([ty, sz, px] if px is not None else None, TYPE_KEYS + SIZE_KEYS + PRICE_KEYS),
-                                            ([side_u, ty, sz], SIDE_KEYS + TYPE_KEYS + SIZE_KEYS),
-                                            ([side_u, ty, sz, px] if px is not None else None, SIDE_KEYS + TYPE_KEYS + SIZE_KEYS + PRICE_KEYS),
-                                            ([sym, side_u, ty, sz], SYM_KEYS + SIDE_KEYS + TYPE_KEYS + SIZE_KEYS),
-                                            ([sym, side_u, ty, sz, px] if px is not None else None, SYM_KEYS + SIDE_KEYS + TYPE_KEYS + SIZE_KEYS + PRICE_KEYS),
-                                            ([sym, ty, sz], SYM_KEYS + TYPE_KEYS + SIZE_KEYS),
-                                            ([sym, ty, sz, px] if px is not None else None, SYM_KEYS + TYPE_KEYS + SIZE_KEYS + PRICE_KEYS),
-                                        ]
-
-                                        for args, remove in patterns:
-                                            if args is None:
-                                                continue
-                                            try:
-                                                res2 = _call_positional_with_prune(fn, args, _kw_without(remove))
-                                                data2 = _extract_data_dict(res2)
-                                                if isinstance(data2, dict):
-                                                    oid2 = data2.get("orderId") or data2.get("id")
-                                                    if oid2:
-                                                        register_order_for_tracking(str(oid2), str(client_order_id or ""), sym)
-                                                return res2
-                                            except Exception as e2:
-                                                last_exc = e2
-                                                continue
-                                except Exception:
-                                    # Keep the original exception semantics.
-                                    pass
+                                                    return _call_positional_with_prune(fn, args, _kw_without(remove))
+                                                except Exception as e2:
+                                                    last_exc = e2
+                                                    continue
+                                    except Exception:
+                                        # Keep the original exception semantics.
+                                        pass
+
+                                    continue
 
-                                continue
+        if last_exc:
+            raise last_exc
+        raise RuntimeError("create_trigger_order: create_order_v3 failed with all compatible parameter variants")
 
-    if last_exc:
-        raise last_exc
-    raise RuntimeError("create_trigger_order: create_order_v3 failed with all compatible parameter variants")
+    fields = {
+        "symbol": sym,
+        "side": side_u,
+        "type": "STOP_MARKET",
+        "size": str(qty),
+        "price": str(protective_price),
+        "trigger_price": str(trigger_price),
+        "reduce_only": bool(reduce_only),
+        "client_id": str(client_order_id) if client_order_id else None,
+    }
+    res = _shaped_call(client, "create_order_v3", "trigger", fields, _probe)
+    data = _extract_data_dict(res)
+    if isinstance(data, dict):
+        oid = data.get("orderId") or data.get("id")
+        if oid:
+            register_order_for_tracking(str(oid), str(client_order_id or ""), sym)
+    return res
 
 
 def get_open_position_for_symbol(symbol: str) -> Dict[str, Any]:
@@ -1654,81 +2330,403 @@ def _dedupe_add(key: str, ts: float) -> bool:
     return True
 
 
-def _apply_fill(fill: Dict[str, Any]) -> None:
-    oid = fill["order_id"]
-    qty = Decimal(str(fill["qty"]))
-    px = Decimal(str(fill["price"]))
-    notional = qty * px
-    now = float(fill.get("ts") or time.time())
-
-    agg = _FILL_AGG.get(oid)
-    if agg is None:
-        agg = {
-            "order_id": oid,
-            "symbol": fill.get("symbol"),
-            "client_order_id": fill.get("client_order_id"),
-            "qty": Decimal("0"),
-            "notional": Decimal("0"),
-            "fee": Decimal("0"),
-            "ts": now,
-            "source": "ws_fills",
-        }
-        _FILL_AGG[oid] = agg
+# -----------------------------------------------------------------------------
+# Order state store
+# One record per orderId holding its lifecycle (status/cumQty/avg from order updates) and its
+# fill aggregate. Bounded: terminal orders are evicted ORDER_STATE_TTL_SEC after they settle,
+# orders without any update for ORDER_STATE_OPEN_TTL_SEC are dropped, and ORDER_STATE_MAX caps
+# the total (least recently updated first).
+# -----------------------------------------------------------------------------
 
-    agg["qty"] = Decimal(str(agg["qty"])) + qty
-    agg["notional"] = Decimal(str(agg["notional"])) + notional
-    if fill.get("fee") is not None:
-        try:
-            agg["fee"] = Decimal(str(agg["fee"])) + Decimal(str(fill["fee"]))
-        except Exception:
-            pass
-    agg["ts"] = now
-    if fill.get("symbol"):
-        agg["symbol"] = fill.get("symbol")
-    if fill.get("client_order_id"):
-        agg["client_order_id"] = fill.get("client_order_id")
+_TERMINAL_ORDER_STATUSES = {"FILLED", "CANCELED", "CANCELLED", "REJECTED", "EXPIRED"}
 
-    try:
-        _FILL_Q.put_nowait({"type": "fill", **fill})
-    except Exception:
-        pass
+ORDER_STATE_MAX = int(os.getenv("ORDER_STATE_MAX", "20000"))
+ORDER_STATE_TTL_SEC = float(os.getenv("ORDER_STATE_TTL_SEC", "3600"))
+ORDER_STATE_OPEN_TTL_SEC = float(os.getenv("ORDER_STATE_OPEN_TTL_SEC", "86400"))
 
 
-def register_order_for_tracking(
-    order_id: str,
-    client_order_id: Optional[str] = None,
-    symbol: Optional[str] = None,
-    expected_qty: Optional[str] = None,
-    status: str = "PENDING",
-) -> None:
-    if not order_id:
-        return
-    st = _ORDER_STATE.get(str(order_id))
-    if st is None:
-        st = {
-            "order_id": str(order_id),
-            "client_order_id": client_order_id,
-            "symbol": format_symbol(symbol) if symbol else None,
-            "status": str(status).upper().strip(),
-            "cum_qty": Decimal("0"),
-            "avg_px": None,
-            "expected_qty": _to_dec(expected_qty) if expected_qty is not None else None,
-            "ts": time.time(),
-        }
-        _ORDER_STATE[str(order_id)] = st
-    else:
-        if client_order_id:
-            st["client_order_id"] = client_order_id
-        if symbol:
-            st["symbol"] = format_symbol(symbol)
-        if status:
-            st["status"] = str(status).upper().strip()
-        if expected_qty is not None:
-            st["expected_qty"] = _to_dec(expected_qty)
-        st["ts"] = time.time()
+class _OrderRecord:
+    __slots__ = (
+        "order_id", "client_order_id", "symbol", "status", "cum_qty", "avg_px", "expected_qty",
+        "order_source", "fill_qty", "fill_notional", "fill_fee", "fill_ts", "ts",
+    )
 
+    def __init__(self, order_id: str) -> None:
+        self.order_id = order_id
+        self.client_order_id: Optional[str] = None
+        self.symbol: Optional[str] = None
+        self.status = ""
+        self.cum_qty: Optional[Decimal] = None
+        self.avg_px: Optional[Decimal] = None
+        self.expected_qty: Optional[Decimal] = None
+        self.order_source: Optional[str] = None  # who last set cum_qty/avg_px
+        self.fill_qty = Decimal("0")
+        self.fill_notional = Decimal("0")
+        self.fill_fee = Decimal("0")
+        self.fill_ts = 0.0
+        self.ts = time.time()  # last update of any kind
+
+    def filled(self) -> Tuple[Decimal, Decimal, Decimal, str]:
+        """(qty, notional, fee, source): fills when we have them, else the order's cumQty x avgPrice."""
+        if self.fill_qty > 0 and self.fill_notional > 0:
+            return self.fill_qty, self.fill_notional, self.fill_fee, "ws_fills"
+        if self.cum_qty and self.avg_px and self.cum_qty > 0 and self.avg_px > 0:
+            return self.cum_qty, self.cum_qty * self.avg_px, Decimal("0"), self.order_source or "ws_orders"
+        return Decimal("0"), Decimal("0"), Decimal("0"), ""
+
+
+class OrderStateStore:
+    """Thread-safe orderId -> _OrderRecord map with a clientOrderId index and bounded size.
+
+    Only orders that are not yet settled (terminal with fills, or terminal without any fill
+    to wait for) are handed to the REST poller.
+    """
 
-def start_private_ws() -> None:
+    def __init__(self, max_orders: int = ORDER_STATE_MAX, ttl_sec: float = ORDER_STATE_TTL_SEC,
+                 open_ttl_sec: float = ORDER_STATE_OPEN_TTL_SEC) -> None:
+        self.max_orders = max(1, int(max_orders))
+        self.ttl_sec = float(ttl_sec)
+        self.open_ttl_sec = float(open_ttl_sec)
+        self._lock = threading.Lock()
+        self._orders: "OrderedDict[str, _OrderRecord]" = OrderedDict()  # least recently updated first
+        self._by_cid: Dict[str, str] = {}
+        self._open: Set[str] = set()
+        self._settled: "OrderedDict[str, float]" = OrderedDict()  # orderId -> settle ts, oldest first
+        self._evicted = {"ttl": 0, "stale": 0, "cap": 0}
+        self._lookups = 0
+        self._hits = 0
+        self._cid_lookups = 0
+        self._cid_hits = 0
+
+    # --- internals (lock held) ---
+
+    def _touch(self, oid: str, now: float) -> _OrderRecord:
+        rec = self._orders.get(oid)
+        if rec is None:
+            rec = self._orders[oid] = _OrderRecord(oid)
+            self._open.add(oid)
+        else:
+            self._orders.move_to_end(oid)
+        rec.ts = now
+        return rec
+
+    def _set_cid(self, rec: _OrderRecord, cid: Optional[str]) -> None:
+        if not cid or cid == rec.client_order_id:
+            return
+        if rec.client_order_id and self._by_cid.get(rec.client_order_id) == rec.order_id:
+            del self._by_cid[rec.client_order_id]
+        rec.client_order_id = cid
+        self._by_cid[cid] = rec.order_id
+
+    def _refresh(self, rec: _OrderRecord, now: float) -> None:
+        oid = rec.order_id
+        if rec.status in _TERMINAL_ORDER_STATUSES and (rec.filled()[0] > 0 or rec.status != "FILLED"):
+            self._open.discard(oid)
+            if oid not in self._settled:
+                self._settled[oid] = now
+        else:
+            self._open.add(oid)
+            self._settled.pop(oid, None)
+
+    def _drop(self, oid: str, why: str) -> None:
+        rec = self._orders.pop(oid, None)
+        if rec is None:
+            return
+        if rec.client_order_id and self._by_cid.get(rec.client_order_id) == oid:
+            del self._by_cid[rec.client_order_id]
+        self._open.discard(oid)
+        self._settled.pop(oid, None)
+        self._evicted[why] += 1
+
+    def _evict(self, now: float) -> None:
+        while self._settled:
+            oid, t = next(iter(self._settled.items()))
+            if now - t < self.ttl_sec:
+                break
+            self._drop(oid, "ttl")
+        while self._orders:
+            oid, rec = next(iter(self._orders.items()))
+            if now - rec.ts < self.open_ttl_sec:
+                break
+            self._drop(oid, "stale")
+        while len(self._orders) > self.max_orders:
+            self._drop(next(iter(self._orders)), "cap")
+
+    # --- writers ---
+
+    def apply_fill(self, fill: Dict[str, Any]) -> Optional[str]:
+        """Add one (deduped) fill; returns the order's clientOrderId if known."""
+        qty = Decimal(str(fill["qty"]))
+        px = Decimal(str(fill["price"]))
+        now = time.time()
+        with self._lock:
+            rec = self._touch(str(fill["order_id"]), now)
+            rec.fill_qty += qty
+            rec.fill_notional += qty * px
+            if fill.get("fee") is not None:
+                try:
+                    rec.fill_fee += Decimal(str(fill["fee"]))
+                except Exception:
+                    pass
+            rec.fill_ts = float(fill.get("ts") or now)
+            if fill.get("symbol"):
+                rec.symbol = fill.get("symbol")
+            self._set_cid(rec, fill.get("client_order_id"))
+            self._refresh(rec, now)
+            self._evict(now)
+            return rec.client_order_id
+
+    def apply_order_update(self, upd: Dict[str, Any], source: str) -> Optional[str]:
+        """Merge a parsed order update (_parse_order_update); returns the clientOrderId if known."""
+        now = time.time()
+        with self._lock:
+            rec = self._touch(str(upd["order_id"]), now)
+            if upd.get("status"):
+                rec.status = str(upd["status"]).upper().strip()
+            if upd.get("symbol"):
+                rec.symbol = upd.get("symbol")
+            if upd.get("cum_qty") is not None:
+                rec.cum_qty = Decimal(str(upd["cum_qty"]))
+                rec.order_source = source
+            if upd.get("avg_px") is not None:
+                rec.avg_px = Decimal(str(upd["avg_px"]))
+                rec.order_source = source
+            if upd.get("expected_qty") is not None:
+                rec.expected_qty = _to_dec(upd.get("expected_qty"))
+            self._set_cid(rec, upd.get("client_order_id"))
+            self._refresh(rec, now)
+            self._evict(now)
+            return rec.client_order_id
+
+    def track(self, order_id: str, client_order_id: Optional[str] = None, symbol: Optional[str] = None,
+              expected_qty: Optional[str] = None, status: str = "PENDING") -> None:
+        now = time.time()
+        with self._lock:
+            rec = self._touch(str(order_id), now)
+            if symbol:
+                rec.symbol = format_symbol(symbol)
+            if status:
+                rec.status = str(status).upper().strip()
+            if expected_qty is not None:
+                rec.expected_qty = _to_dec(expected_qty)
+            self._set_cid(rec, client_order_id)
+            self._refresh(rec, now)
+            self._evict(now)
+
+    # --- readers ---
+
+    def summary(self, order_id: Optional[str], client_order_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Fill summary by orderId, else by clientOrderId; None until something has filled."""
+        with self._lock:
+            self._lookups += 1
+            rec = self._orders.get(str(order_id)) if order_id else None
+            if (rec is None or rec.filled()[0] <= 0) and client_order_id:
+                self._cid_lookups += 1
+                oid = self._by_cid.get(str(client_order_id))
+                by_cid = self._orders.get(oid) if oid else None
+                if by_cid is not None and by_cid.filled()[0] > 0:
+                    self._cid_hits += 1
+                    rec = by_cid
+            if rec is None:
+                return None
+            qty, notional, fee, source = rec.filled()
+            if qty <= 0 or notional <= 0:
+                return None
+            self._hits += 1
+            return {
+                "order_id": rec.order_id,
+                "client_order_id": rec.client_order_id or client_order_id,
+                "filled_qty": qty,
+                "avg_fill_price": notional / qty,
+                "fee": fee,
+                "source": source,
+                "status": rec.status,
+            }
+
+    def poll_state(self, order_id: str) -> Optional[Tuple[Optional[str], bool, str]]:
+        """(symbol, has_fills, status) while the order is unsettled; None once settled or evicted."""
+        with self._lock:
+            if order_id not in self._open:
+                return None
+            rec = self._orders[order_id]
+            return rec.symbol, rec.filled()[0] > 0, rec.status
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._orders),
+                "open": len(self._open),
+                "settled": len(self._settled),
+                "max": self.max_orders,
+                "evicted": dict(self._evicted),
+                "lookups": self._lookups,
+                "hits": self._hits,
+                "hit_rate": round(self._hits / self._lookups, 4) if self._lookups else None,
+                "cid_lookups": self._cid_lookups,
+                "cid_hit_rate": round(self._cid_hits / self._cid_lookups, 4) if self._cid_lookups else None,
+            }
+
+
+_ORDERS = OrderStateStore()
+
+
+def get_order_state_stats() -> Dict[str, Any]:
+    return _ORDERS.stats()
+
+
+# -----------------------------------------------------------------------------
+# Fill waiters
+# get_fill_summary() callers register a waiter per order; _apply_fill and order-status
+# updates signal it, so a waiter wakes as soon as a fill or terminal status lands. The REST
+# fallbacks run on a shared deadline timer, not on the waiting thread.
+# -----------------------------------------------------------------------------
+
+FILL_TIMER_WORKERS = int(os.getenv("FILL_TIMER_WORKERS", "4"))
+
+_WAITERS_LOCK = threading.Lock()
+_WAITERS: Dict[str, List["_FillWaiter"]] = {}  # "o:<orderId>" / "c:<clientOrderId>" -> waiters
+
+
+class _FillWaiter:
+    __slots__ = ("symbol", "order_id", "client_order_id", "event", "futures", "result", "done", "closed", "last_source")
+
+    def __init__(self, symbol: str, order_id: Optional[str], client_order_id: Optional[str]) -> None:
+        self.symbol = symbol
+        self.order_id = str(order_id) if order_id else None
+        self.client_order_id = str(client_order_id) if client_order_id else None
+        self.event = threading.Event()
+        self.futures: List[Tuple[Any, Any]] = []  # (loop, asyncio.Future) for async waiters
+        self.result: Optional[Dict[str, Any]] = None
+        self.done = False  # deadline handled (result may still be None)
+        self.closed = False  # caller returned; timers skip it
+        self.last_source: Optional[str] = None
+
+    def keys(self) -> List[str]:
+        out = []
+        if self.order_id:
+            out.append("o:" + self.order_id)
+        if self.client_order_id:
+            out.append("c:" + self.client_order_id)
+        return out
+
+    def signal(self) -> None:
+        self.event.set()
+        with _WAITERS_LOCK:
+            futs, self.futures = self.futures, []
+        for loop, fut in futs:
+            try:
+                loop.call_soon_threadsafe(_resolve_future, fut)
+            except RuntimeError:
+                pass  # loop closed
+
+
+def _resolve_future(fut: Any) -> None:
+    if not fut.done():
+        fut.set_result(None)
+
+
+def _waiter_add(w: _FillWaiter) -> None:
+    with _WAITERS_LOCK:
+        for k in w.keys():
+            _WAITERS.setdefault(k, []).append(w)
+
+
+def _waiter_remove(w: _FillWaiter) -> None:
+    w.closed = True
+    with _WAITERS_LOCK:
+        for k in w.keys():
+            ws = _WAITERS.get(k)
+            if not ws:
+                continue
+            try:
+                ws.remove(w)
+            except ValueError:
+                pass
+            if not ws:
+                del _WAITERS[k]
+
+
+def _notify_fill_waiters(order_id: Optional[str], client_order_id: Optional[str] = None) -> None:
+    """Wake every waiter on this order (by orderId or clientOrderId)."""
+    hit: List[_FillWaiter] = []
+    with _WAITERS_LOCK:
+        if not _WAITERS:
+            return
+        if order_id:
+            hit.extend(_WAITERS.get("o:" + str(order_id)) or ())
+        if client_order_id:
+            hit.extend(_WAITERS.get("c:" + str(client_order_id)) or ())
+    for w in hit:
+        w.signal()
+
+
+class _DeadlineTimer:
+    """One heap-ordered timer thread for all waiters; callbacks run on a small pool so a slow
+    REST fallback never delays the next deadline."""
+
+    def __init__(self, workers: int) -> None:
+        self._cv = threading.Condition()
+        self._heap: List[Tuple[float, int, Any]] = []
+        self._seq = 0
+        self._workers = max(1, int(workers))
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def call_at(self, when: float, fn: Any) -> None:
+        with self._cv:
+            if self._pid != os.getpid():  # fresh thread/pool after fork
+                self._pid = os.getpid()
+                self._heap = []
+                self._pool = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="apex-fill-rest")
+                self._thread = threading.Thread(target=self._run, daemon=True, name="apex-fill-timer")
+                self._thread.start()
+            self._seq += 1
+            heapq.heappush(self._heap, (when, self._seq, fn))
+            self._cv.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cv:
+                while not self._heap or self._heap[0][0] > time.time():
+                    self._cv.wait(timeout=(self._heap[0][0] - time.time()) if self._heap else None)
+                _when, _seq, fn = heapq.heappop(self._heap)
+                pool = self._pool
+            try:
+                pool.submit(fn)
+            except Exception as e:
+                print("[apex_client][FILL] timer submit error:", e)
+
+
+_FILL_TIMER = _DeadlineTimer(FILL_TIMER_WORKERS)
+
+
+def _apply_fill(fill: Dict[str, Any]) -> None:
+    cid = _ORDERS.apply_fill(fill)
+    _poll_enroll(fill["order_id"])
+
+    try:
+        _FILL_Q.put_nowait({"type": "fill", **fill})
+    except Exception:
+        pass
+
+    _notify_fill_waiters(fill["order_id"], cid)
+
+
+def register_order_for_tracking(
+    order_id: str,
+    client_order_id: Optional[str] = None,
+    symbol: Optional[str] = None,
+    expected_qty: Optional[str] = None,
+    status: str = "PENDING",
+) -> None:
+    if not order_id:
+        return
+    _ORDERS.track(order_id, client_order_id=client_order_id, symbol=symbol, expected_qty=expected_qty, status=status)
+    _poll_enroll(str(order_id))
+
+
+def start_private_ws() -> None:
     """Idempotent. Subscribe to private stream and parse BOTH orders and fills."""
     global _WS_STARTED
     with _WS_LOCK:
@@ -1796,38 +2794,9 @@ def start_private_ws() -> None:
                     upd = _parse_order_update(raw)
                     if not upd:
                         continue
-                    oid = upd["order_id"]
-                    st = _ORDER_STATE.get(oid) or {"order_id": oid}
-                    st.update({
-                        "client_order_id": upd.get("client_order_id") or st.get("client_order_id"),
-                        "symbol": upd.get("symbol") or st.get("symbol"),
-                        "status": upd.get("status") or st.get("status"),
-                        "ts": time.time(),
-                    })
-
-                    if upd.get("cum_qty") is not None:
-                        st["cum_qty"] = Decimal(str(upd["cum_qty"]))
-                    if upd.get("avg_px") is not None:
-                        st["avg_px"] = Decimal(str(upd["avg_px"]))
-                    if upd.get("expected_qty") is not None:
-                        st["expected_qty"] = upd.get("expected_qty")
-                    _ORDER_STATE[oid] = st
-
-                    agg = _FILL_AGG.get(oid)
-                    if (agg is None or Decimal(str(agg.get("qty") or "0")) <= 0) and st.get("cum_qty") and st.get("avg_px"):
-                        cum_qty = Decimal(str(st.get("cum_qty") or "0"))
-                        avg_px = Decimal(str(st.get("avg_px") or "0"))
-                        if cum_qty > 0 and avg_px > 0:
-                            _FILL_AGG[oid] = {
-                                "order_id": oid,
-                                "symbol": st.get("symbol"),
-                                "client_order_id": st.get("client_order_id"),
-                                "qty": cum_qty,
-                                "notional": cum_qty * avg_px,
-                                "fee": Decimal("0"),
-                                "ts": time.time(),
-                                "source": "ws_orders",
-                            }
+                    cid = _ORDERS.apply_order_update(upd, "ws_orders")
+                    _poll_enroll(upd["order_id"])
+                    _notify_fill_waiters(upd["order_id"], cid)
 
         except Exception as e:
             print("[apex_client][WS] handle_account error:", e)
@@ -1976,6 +2945,19 @@ def _rest_fetch_fills_by_client_order_id(client_order_id: str, symbol: Optional[
     return None
 
 
+_FILL_HISTORY_METHODS = [
+    'get_fills_v3',
+    'fills_v3',
+    'get_user_fills_v3',
+    'get_trades_v3',
+    'get_user_trades_v3',
+    'trade_history_v3',
+    'get_trade_history_v3',
+    'get_fill_history_v3',
+    'fill_history_v3',
+]
+
+
 def _rest_fetch_recent_fills(symbol: Optional[str] = None, limit: int = 100) -> Optional[list]:
     # REST recent fills/trades (no orderId filter). Used when the API does not support orderId query.
     client = get_client()
@@ -1983,17 +2965,7 @@ def _rest_fetch_recent_fills(symbol: Optional[str] = None, limit: int = 100) ->
     if lim <= 0:
         lim = 100
 
-    method_names = [
-        'get_fills_v3',
-        'fills_v3',
-        'get_user_fills_v3',
-        'get_trades_v3',
-        'get_user_trades_v3',
-        'trade_history_v3',
-        'get_trade_history_v3',
-        'get_fill_history_v3',
-        'fill_history_v3',
-    ]
+    method_names = _FILL_HISTORY_METHODS
 
     # Try a few common paging args
     paging_variants = [
@@ -2032,8 +3004,252 @@ def _rest_fetch_recent_fills(symbol: Optional[str] = None, limit: int = 100) ->
 
 
 
+def iter_fill_history(
+    symbol: Optional[str] = None,
+    since_ts: Optional[float] = None,
+    page_size: int = 500,
+    max_pages: int = 10_000,
+) -> Iterable[Dict[str, Any]]:
+    """Yield every account fill (parsed, see _parse_fill) newer than since_ts, page by page.
+
+    Uses the same SDK method discovery as _rest_fetch_recent_fills. Pages by page number
+    first; if the SDK ignores `page` (same fills come back) it falls back to walking
+    backwards with endTimeExclusive. Order is whatever the API returns (usually newest
+    first) - callers sort.
+    """
+    client = get_client()
+    fn = None
+    for name in _FILL_HISTORY_METHODS:
+        if hasattr(client, name):
+            fn = getattr(client, name)
+            break
+    if fn is None:
+        raise RuntimeError("no fill history method found on SDK client")
+
+    lim = max(1, int(page_size))
+    begin_ms = int(float(since_ts) * 1000) if since_ts else None
+    seen: Set[str] = set()
+    end_ms: Optional[int] = None
+    by_time = False
+
+    for page in range(int(max_pages)):
+        kwargs: Dict[str, Any] = {"limit": lim, "beginTimeInclusive": begin_ms}
+        if symbol:
+            kwargs["symbol"] = format_symbol(symbol)
+        if by_time:
+            kwargs["endTimeExclusive"] = end_ms
+        else:
+            kwargs["page"] = page
+        res = _safe_call(fn, **kwargs)
+
+        data = res
+        if isinstance(res, dict):
+            data = res.get('data') if res.get('data') is not None else (res.get('list') or res.get('fills') or res.get('trades') or res)
+        if isinstance(data, dict):
+            data = data.get('list') or data.get('orders') or data.get('fills') or []
+        if not isinstance(data, list) or not data:
+            return
+
+        fresh = 0
+        oldest_ms: Optional[int] = None
+        for raw in data:
+            parsed = _parse_fill(raw) if isinstance(raw, dict) else None
+            if not parsed:
+                continue
+            ts_ms = int(parsed["ts"] * 1000)
+            oldest_ms = ts_ms if oldest_ms is None else min(oldest_ms, ts_ms)
+            if parsed["fill_id"] in seen or (begin_ms is not None and ts_ms < begin_ms):
+                continue
+            seen.add(parsed["fill_id"])
+            fresh += 1
+            yield parsed
+
+        if fresh == 0:
+            if by_time or oldest_ms is None:
+                return
+            # `page` was ignored: continue from the oldest fill of this page
+            # (+1 ms: fills sharing that ms are deduped by fill_id)
+            by_time = True
+            end_ms = oldest_ms + 1
+            continue
+        if len(data) < lim:
+            return
+        if by_time:
+            end_ms = oldest_ms + 1
+
+
+# Poll schedule: min-heap of (next_check_ts, seq, orderId). _POLL_NEXT holds each order's
+# current due time; heap entries that no longer match it are stale and skipped. Orders back off
+# exponentially (REST_GAP_SEC doubling up to REST_POLL_MAX_SEC), except orders a get_fill_summary
+# caller is waiting on, which are polled first and every REST_POLL_WAIT_SEC. Orders leave the
+# schedule when they settle or after REST_POLL_MAX_AGE_SEC.
+REST_POLL_MAX_SEC = float(os.getenv("REST_POLL_MAX_SEC", "60"))
+REST_POLL_WAIT_SEC = float(os.getenv("REST_POLL_WAIT_SEC", "1.0"))
+REST_POLL_MAX_AGE_SEC = float(os.getenv("REST_POLL_MAX_AGE_SEC", "900"))
+REST_POLL_BUDGET = int(os.getenv("REST_POLL_BUDGET", "20"))  # REST requests per cycle
+
+_POLL_CV = threading.Condition()
+_POLL_HEAP: List[Tuple[float, int, str]] = []
+_POLL_NEXT: Dict[str, float] = {}
+_POLL_TRIES: Dict[str, int] = {}
+_POLL_FIRST: Dict[str, float] = {}
+_POLL_SEQ = 0
+_POLL_STATS: Dict[str, Any] = {"cycles": 0, "requests": 0, "last": {}}
+
+
+def _poll_push(oid: str, when: float) -> None:
+    global _POLL_SEQ
+    _POLL_SEQ += 1
+    _POLL_NEXT[oid] = when
+    heapq.heappush(_POLL_HEAP, (when, _POLL_SEQ, oid))
+
+
+def _poll_forget(oid: str) -> None:
+    _POLL_NEXT.pop(oid, None)
+    _POLL_TRIES.pop(oid, None)
+    _POLL_FIRST.pop(oid, None)
+
+
+def _poll_enroll(order_id: str, priority: bool = False) -> None:
+    """Schedule an order for REST reconciliation (no-op if already scheduled, unless priority)."""
+    oid = str(order_id)
+    now = time.time()
+    with _POLL_CV:
+        due = _POLL_NEXT.get(oid)
+        if due is None:
+            _POLL_FIRST.setdefault(oid, now)
+            _POLL_TRIES[oid] = 0
+            _poll_push(oid, now + (REST_POLL_WAIT_SEC if priority else float(os.getenv("REST_GAP_SEC", "3"))))
+        elif priority and due > now + REST_POLL_WAIT_SEC:
+            _poll_push(oid, now + REST_POLL_WAIT_SEC)
+        else:
+            return
+        _POLL_CV.notify()
+
+
+def _poll_waited(oid: str) -> bool:
+    with _WAITERS_LOCK:
+        return ("o:" + oid) in _WAITERS
+
+
+def _poll_take_due(now: float) -> List[str]:
+    with _POLL_CV:
+        out = []
+        while _POLL_HEAP and _POLL_HEAP[0][0] <= now:
+            when, _seq, oid = heapq.heappop(_POLL_HEAP)
+            if _POLL_NEXT.get(oid) == when:
+                out.append(oid)
+        return out
+
+
+def _poll_cycle(gap_sec: float) -> Dict[str, int]:
+    """One reconciliation pass over the due orders; returns this cycle's counters."""
+    now = time.time()
+    c = {"due": 0, "polled": 0, "deferred": 0, "settled": 0, "aged_out": 0,
+         "req_fills_batch": 0, "req_order": 0, "req_fills_order": 0}
+    due = []
+    for oid in _poll_take_due(now):
+        c["due"] += 1
+        ps = _ORDERS.poll_state(oid)
+        if ps is None:
+            c["settled"] += 1
+            with _POLL_CV:
+                _poll_forget(oid)
+        elif now - _POLL_FIRST.get(oid, now) > REST_POLL_MAX_AGE_SEC:
+            c["aged_out"] += 1
+            with _POLL_CV:
+                _poll_forget(oid)
+        else:
+            # waited-on orders first (idle=False sorts first), then oldest due
+            due.append((not _poll_waited(oid), _POLL_NEXT.get(oid, now), oid, ps))
+    due.sort()
+
+    # Budget: one order-detail request per order plus one recent-fills request per symbol;
+    # whatever does not fit is retried next cycle.
+    budget = max(1, REST_POLL_BUDGET)
+    batch = []
+    want: Dict[str, Set[str]] = {}
+    for i, item in enumerate(due):
+        _idle, _t, oid, (symbol, has_fills, _st) = item
+        needs_batch = not has_fills and bool(symbol)
+        cost = 1 + (1 if needs_batch and symbol not in want else 0)
+        if cost > budget and batch:
+            with _POLL_CV:
+                for _i, _t2, rest_oid, _ps in due[i:]:
+                    _poll_push(rest_oid, now + gap_sec)
+            c["deferred"] = len(due) - i
+            break
+        budget -= cost
+        batch.append(item)
+        if needs_batch:
+            want.setdefault(symbol, set()).add(oid)
+
+    # One recent-fills call per symbol covers every order in the batch still missing fills.
+    lim = int(os.getenv("REST_RECENT_FILLS_LIMIT", "120"))
+    for symbol, oids in want.items():
+        c["req_fills_batch"] += 1
+        fills = _rest_fetch_recent_fills(symbol=symbol, limit=lim)
+        for raw in fills or ():
+            fill = _parse_fill(raw) if isinstance(raw, dict) else None
+            if not fill or fill["order_id"] not in oids:
+                continue
+            if _dedupe_add(_dedupe_key(fill["order_id"], fill["fill_id"]), float(fill["ts"])):
+                fill["raw_source"] = "rest"
+                _apply_fill(fill)
+
+    for idle, _t, oid, (symbol, _has_fills, _st) in batch:
+        c["polled"] += 1
+        cid = None
+        c["req_order"] += 1
+        od = _rest_fetch_order(oid)
+        if isinstance(od, dict):
+            d = od.get("data") if isinstance(od.get("data"), dict) else od
+            if isinstance(d, dict):
+                upd = _parse_order_update(d)
+                if upd:
+                    upd["order_id"] = oid
+                    cid = _ORDERS.apply_order_update(upd, "rest_order")
+                    symbol = upd.get("symbol") or symbol
+
+        ps = _ORDERS.poll_state(oid)
+        if ps is not None and not ps[1] and ps[2] == "FILLED":
+            # filled per the order endpoint but the recent-fills page did not have it
+            c["req_fills_order"] += 1
+            for raw in _rest_fetch_fills_by_order(oid, symbol=symbol) or ():
+                fill = _parse_fill(raw) if isinstance(raw, dict) else None
+                if fill and _dedupe_add(_dedupe_key(fill["order_id"], fill["fill_id"]), float(fill["ts"])):
+                    fill["raw_source"] = "rest"
+                    _apply_fill(fill)
+            ps = _ORDERS.poll_state(oid)
+
+        _notify_fill_waiters(oid, cid)
+
+        with _POLL_CV:
+            if ps is None:
+                c["settled"] += 1
+                _poll_forget(oid)
+                continue
+            tries = _POLL_TRIES.get(oid, 0) + 1
+            _POLL_TRIES[oid] = tries
+            if not idle:
+                delay = REST_POLL_WAIT_SEC
+            else:
+                delay = min(REST_POLL_MAX_SEC, gap_sec * (2 ** min(tries, 16)))
+            _poll_push(oid, time.time() + delay)
+    return c
+
+
+def get_rest_poller_stats() -> Dict[str, Any]:
+    with _POLL_CV:
+        return {**_POLL_STATS, "scheduled": len(_POLL_NEXT)}
+
+
 def start_order_rest_poller(poll_interval: float = 5.0) -> None:
-    """Background REST reconciliation to fill WS gaps (orders+fills)."""
+    """Background REST reconciliation to fill WS gaps (orders+fills).
+
+    Works through the poll schedule above; poll_interval bounds how long the thread sleeps
+    when nothing is due.
+    """
     global _REST_POLL_STARTED
     with _REST_POLL_LOCK:
         if _REST_POLL_STARTED:
@@ -2043,74 +3259,29 @@ def start_order_rest_poller(poll_interval: float = 5.0) -> None:
     def _loop():
         gap_sec = float(os.getenv("REST_GAP_SEC", "3"))
         while True:
+            with _POLL_CV:
+                wait = poll_interval
+                if _POLL_HEAP:
+                    wait = min(wait, _POLL_HEAP[0][0] - time.time())
+                if wait > 0:
+                    _POLL_CV.wait(timeout=wait)
             try:
-                now = time.time()
-                order_ids = list(_ORDER_STATE.keys())
-                for oid in order_ids:
-                    st = _ORDER_STATE.get(oid) or {}
-                    if now - float(st.get("ts") or 0) < gap_sec:
-                        continue
-
-                    agg = _FILL_AGG.get(oid)
-                    if agg and Decimal(str(agg.get("qty") or "0")) > 0 and str(st.get("status") or "").upper() in {"FILLED", "CANCELED", "CANCELLED", "REJECTED", "EXPIRED"}:
-                        continue
-
-                    od = _rest_fetch_order(oid)
-                    if isinstance(od, dict):
-                        d = od.get("data") if isinstance(od.get("data"), dict) else od
-                        if isinstance(d, dict):
-                            upd = _parse_order_update(d)
-                            if upd:
-                                st.update({
-                                    "status": upd.get("status") or st.get("status"),
-                                    "symbol": upd.get("symbol") or st.get("symbol"),
-                                    "client_order_id": upd.get("client_order_id") or st.get("client_order_id"),
-                                    "ts": time.time(),
-                                })
-                                if upd.get("cum_qty") is not None:
-                                    st["cum_qty"] = Decimal(str(upd.get("cum_qty")))
-                                if upd.get("avg_px") is not None:
-                                    st["avg_px"] = Decimal(str(upd.get("avg_px")))
-                                _ORDER_STATE[oid] = st
-
-                    agg_qty = Decimal(str((agg or {}).get("qty") or "0"))
-                    need_fills = (agg is None) or (agg_qty <= 0)
-                    if need_fills:
-                        fills = _rest_fetch_fills_by_order(oid, symbol=st.get("symbol"))
-                        if isinstance(fills, list) and fills:
-                            for raw in fills:
-                                if not isinstance(raw, dict):
-                                    continue
-                                fill = _parse_fill(raw)
-                                if not fill:
-                                    continue
-                                key = _dedupe_key(fill["order_id"], fill["fill_id"])
-                                if not _dedupe_add(key, float(fill["ts"])):
-                                    continue
-                                fill["ts"] = float(fill.get("ts") or time.time())
-                                fill["raw_source"] = "rest"
-                                _apply_fill(fill)
-
-                    agg2 = _FILL_AGG.get(oid)
-                    if (agg2 is None or Decimal(str(agg2.get("qty") or "0")) <= 0) and st.get("cum_qty") and st.get("avg_px"):
-                        cum_qty = Decimal(str(st.get("cum_qty") or "0"))
-                        avg_px = Decimal(str(st.get("avg_px") or "0"))
-                        if cum_qty > 0 and avg_px > 0:
-                            _FILL_AGG[oid] = {
-                                "order_id": oid,
-                                "symbol": st.get("symbol"),
-                                "client_order_id": st.get("client_order_id"),
-                                "qty": cum_qty,
-                                "notional": cum_qty * avg_px,
-                                "fee": Decimal("0"),
-                                "ts": time.time(),
-                                "source": "rest_order",
-                            }
-
+                c = _poll_cycle(gap_sec)
             except Exception as e:
                 print("[apex_client][REST] poller error:", e)
-
-            time.sleep(max(0.5, poll_interval))
+                time.sleep(1.0)
+                continue
+            if not c["due"]:
+                continue
+            reqs = c["req_fills_batch"] + c["req_order"] + c["req_fills_order"]
+            with _POLL_CV:
+                _POLL_STATS["cycles"] += 1
+                _POLL_STATS["requests"] += reqs
+                _POLL_STATS["last"] = c
+            if reqs:
+                print(f"[apex_client][REST] poll cycle: requests={reqs} {c} scheduled={len(_POLL_NEXT)}")
+            # let more orders come due so they share the batched fills request
+            time.sleep(0.2)
 
     threading.Thread(target=_loop, daemon=True, name="apex-rest-poller").start()
 
@@ -2120,38 +3291,62 @@ def start_order_rest_poller(poll_interval: float = 5.0) -> None:
 # -----------------------------------------------------------------------------
 
 def _agg_summary(order_id: Optional[str], client_order_id: Optional[str]) -> Optional[Dict[str, Any]]:
-    if order_id:
-        agg = _FILL_AGG.get(str(order_id))
-        if agg:
-            qty = Decimal(str(agg.get("qty") or "0"))
-            notional = Decimal(str(agg.get("notional") or "0"))
-            if qty > 0 and notional > 0:
-                return {
-                    "order_id": str(order_id),
-                    "client_order_id": agg.get("client_order_id") or client_order_id,
-                    "filled_qty": qty,
-                    "avg_fill_price": (notional / qty),
-                    "fee": agg.get("fee"),
-                    "source": agg.get("source"),
-                }
-    if client_order_id:
-        cid = str(client_order_id)
-        for oid, agg in list(_FILL_AGG.items())[-200:]:
-            if str(agg.get("client_order_id") or "") == cid:
-                qty = Decimal(str(agg.get("qty") or "0"))
-                notional = Decimal(str(agg.get("notional") or "0"))
-                if qty > 0 and notional > 0:
-                    return {
-                        "order_id": oid,
-                        "client_order_id": cid,
-                        "filled_qty": qty,
-                        "avg_fill_price": (notional / qty),
-                        "fee": agg.get("fee"),
-                        "source": agg.get("source"),
-                    }
+    return _ORDERS.summary(order_id, client_order_id)
+
+
+def _summary_out(symbol: str, summ: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "symbol": format_symbol(symbol),
+        "order_id": str(summ["order_id"]),
+        "client_order_id": summ.get("client_order_id"),
+        "filled_qty": str(summ["filled_qty"]),
+        "avg_fill_price": str(summ["avg_fill_price"]),
+        "fee": str(summ.get("fee")) if summ.get("fee") is not None else None,
+        "source": str(summ.get("source") or ""),
+    }
+
+
+def _waiter_check(w: _FillWaiter, final: bool = False) -> Optional[Dict[str, Any]]:
+    """Cached summary once the order is terminal (or whatever has filled, if final)."""
+    summ = _agg_summary(w.order_id, w.client_order_id)
+    if not summ:
+        return None
+    w.last_source = summ.get("source")
+    if final or summ.get("status") in _TERMINAL_ORDER_STATUSES:
+        return _summary_out(w.symbol, summ)
     return None
 
 
+def _waiter_deadline(w: _FillWaiter) -> None:
+    """Deadline-timer callback: settle the waiter from the cache or the REST fallbacks."""
+    if w.closed or w.done:
+        return
+    res = None
+    try:
+        res = _waiter_check(w, final=True) or _rest_fill_summary(w.symbol, w.order_id, w.client_order_id)
+    except Exception as e:
+        print("[apex_client][FILL] REST fallback error:", e)
+    w.result = res
+    w.done = True
+    w.signal()
+
+
+def _fill_wait_setup(symbol: str, order_id: Optional[str], client_order_id: Optional[str], max_wait_sec: float) -> _FillWaiter:
+    start_private_ws()
+    if _env_bool("ENABLE_REST_POLL", True):
+        try:
+            start_order_rest_poller(poll_interval=float(os.getenv("REST_ORDER_POLL_INTERVAL", "5.0")))
+        except Exception:
+            pass
+    w = _FillWaiter(symbol, order_id, client_order_id)
+    _waiter_add(w)
+    if order_id:
+        _ORDERS.track(str(order_id), client_order_id=client_order_id, symbol=symbol, status="")
+        _poll_enroll(str(order_id), priority=True)
+    _FILL_TIMER.call_at(time.time() + max(0.0, float(max_wait_sec)), lambda: _waiter_deadline(w))
+    return w
+
+
 def get_fill_summary(
     symbol: str,
     order_id: Optional[str] = None,
@@ -2159,46 +3354,55 @@ def get_fill_summary(
     max_wait_sec: float = 25.0,
     poll_interval: float = 0.25,
 ) -> Dict[str, Any]:
-    start_private_ws()
-    if _env_bool("ENABLE_REST_POLL", True):
-        try:
-            start_order_rest_poller(poll_interval=float(os.getenv("REST_ORDER_POLL_INTERVAL", "5.0")))
-        except Exception:
-            pass
+    """Wait for the order's fills; returns once it is terminal, or at max_wait_sec with what has
+    filled / what REST reports. Woken by WS/REST updates, so poll_interval is unused (kept for
+    callers). Raises RuntimeError if nothing filled."""
+    w = _fill_wait_setup(symbol, order_id, client_order_id, max_wait_sec)
+    try:
+        while True:
+            w.event.clear()
+            res = w.result or _waiter_check(w)
+            if res:
+                return res
+            if w.done:
+                break
+            if not w.event.wait(timeout=max_wait_sec + 30.0):
+                _waiter_deadline(w)  # timer thread wedged; settle here
+    finally:
+        _waiter_remove(w)
+    raise RuntimeError(f"fill_summary timeout; last_source={w.last_source}")
 
-    t0 = time.time()
-    last_source = None
-    while True:
-        summ = _agg_summary(order_id, client_order_id)
-        if summ:
-            last_source = summ.get("source")
-            st = _ORDER_STATE.get(str(summ.get("order_id"))) if summ.get("order_id") else None
-            status = str((st or {}).get("status") or "").upper()
-            if status in {"FILLED", "CANCELED", "CANCELLED", "REJECTED", "EXPIRED"}:
-                return {
-                    "symbol": format_symbol(symbol),
-                    "order_id": str(summ["order_id"]),
-                    "client_order_id": summ.get("client_order_id"),
-                    "filled_qty": str(summ["filled_qty"]),
-                    "avg_fill_price": str(summ["avg_fill_price"]),
-                    "fee": str(summ.get("fee")) if summ.get("fee") is not None else None,
-                    "source": str(summ.get("source") or ""),
-                }
-            if time.time() - t0 >= max_wait_sec:
-                return {
-                    "symbol": format_symbol(symbol),
-                    "order_id": str(summ["order_id"]),
-                    "client_order_id": summ.get("client_order_id"),
-                    "filled_qty": str(summ["filled_qty"]),
-                    "avg_fill_price": str(summ["avg_fill_price"]),
-                    "fee": str(summ.get("fee")) if summ.get("fee") is not None else None,
-                    "source": str(summ.get("source") or ""),
-                }
-
-        if time.time() - t0 >= max_wait_sec:
-            break
-        time.sleep(max(0.05, poll_interval))
 
+async def get_fill_summary_async(
+    symbol: str,
+    order_id: Optional[str] = None,
+    client_order_id: Optional[str] = None,
+    max_wait_sec: float = 25.0,
+) -> Dict[str, Any]:
+    """asyncio variant of get_fill_summary: awaits a Future resolved by the same notifications."""
+    loop = asyncio.get_running_loop()
+    w = _fill_wait_setup(symbol, order_id, client_order_id, max_wait_sec)
+    try:
+        while True:
+            fut = loop.create_future()
+            with _WAITERS_LOCK:
+                w.futures.append((loop, fut))
+            res = w.result or _waiter_check(w)
+            if res:
+                return res
+            if w.done:
+                break
+            try:
+                await asyncio.wait_for(fut, timeout=max_wait_sec + 30.0)
+            except asyncio.TimeoutError:
+                await loop.run_in_executor(None, _waiter_deadline, w)
+    finally:
+        _waiter_remove(w)
+    raise RuntimeError(f"fill_summary timeout; last_source={w.last_source}")
+
+
+def _rest_fill_summary(symbol: str, order_id: Optional[str], client_order_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    """REST fallbacks for get_fill_summary, in order; None if none of them finds fills."""
     if order_id:
         # REST fallback #1: direct fills/trades by orderId
         try:
@@ -2309,7 +3513,80 @@ def get_fill_summary(
         except Exception:
             pass
 
-    raise RuntimeError(f"fill_summary timeout; last_source={last_source}")
+    return None
+
+
+def get_fill_summaries(orders: List[Dict[str, Any]], limit: Optional[int] = None) -> List[Optional[Dict[str, Any]]]:
+    """Non-blocking fill lookup for many orders at once.
+
+    orders: [{"symbol", "order_id", "client_order_id"}, ...]. Returns a list aligned with
+    orders holding a get_fill_summary()-shaped dict or None. WS aggregates are used when
+    present; everything else costs one recent-fills REST call per distinct symbol.
+    """
+    out: List[Optional[Dict[str, Any]]] = [None] * len(orders)
+    missing: Dict[str, List[int]] = {}
+    for i, o in enumerate(orders):
+        summ = _agg_summary(o.get("order_id") or None, o.get("client_order_id") or None)
+        if summ:
+            out[i] = {
+                "symbol": format_symbol(o.get("symbol") or ""),
+                "order_id": str(summ["order_id"]),
+                "client_order_id": summ.get("client_order_id"),
+                "filled_qty": str(summ["filled_qty"]),
+                "avg_fill_price": str(summ["avg_fill_price"]),
+                "fee": str(summ.get("fee")) if summ.get("fee") is not None else None,
+                "source": str(summ.get("source") or ""),
+            }
+        else:
+            missing.setdefault(format_symbol(o.get("symbol") or ""), []).append(i)
+
+    lim = int(limit or os.getenv("REST_RECENT_FILLS_LIMIT", "120"))
+    for symbol, idxs in missing.items():
+        try:
+            fills = _rest_fetch_recent_fills(symbol=symbol, limit=lim)
+        except Exception:
+            fills = None
+        if not isinstance(fills, list) or not fills:
+            continue
+
+        # orderId -> [qty, notional, fee, fee_seen, client_order_id]
+        by_oid: Dict[str, List[Any]] = {}
+        oid_by_cid: Dict[str, str] = {}
+        seen: set = set()
+        for f in fills:
+            parsed = _parse_fill(f) if isinstance(f, dict) else None
+            if not parsed or parsed["fill_id"] in seen:
+                continue
+            seen.add(parsed["fill_id"])
+            oid = parsed["order_id"]
+            agg = by_oid.setdefault(oid, [Decimal("0"), Decimal("0"), Decimal("0"), False, None])
+            agg[0] += parsed["qty"]
+            agg[1] += parsed["qty"] * parsed["price"]
+            if parsed.get("fee") is not None:
+                agg[2] += parsed["fee"]
+                agg[3] = True
+            if parsed.get("client_order_id"):
+                agg[4] = parsed["client_order_id"]
+                oid_by_cid[str(parsed["client_order_id"])] = oid
+
+        for i in idxs:
+            o = orders[i]
+            oid = str(o.get("order_id") or "")
+            if oid not in by_oid:
+                oid = oid_by_cid.get(str(o.get("client_order_id") or ""), "")
+            agg = by_oid.get(oid)
+            if not agg or agg[0] <= 0 or agg[1] <= 0:
+                continue
+            out[i] = {
+                "symbol": symbol,
+                "order_id": oid,
+                "client_order_id": agg[4] or o.get("client_order_id"),
+                "filled_qty": str(agg[0]),
+                "avg_fill_price": str(agg[1] / agg[0]),
+                "fee": str(agg[2]) if agg[3] else None,
+                "source": "rest_recent_fills_batch",
+            }
+    return out
 
 
 # ──────────────────────────────────────────────────────────────
@@ -2350,6 +3627,126 @@ def _canon_symbol_from_ws_symbol(raw: str) -> str:
     return s
 
 
+def _num_units(x: Any) -> Tuple[int, int]:
+    """'123.4500' -> (12345, 2): exact integer mantissa + decimals, without Decimal."""
+    t = x if isinstance(x, str) else repr(x)
+    t = t.strip()
+    if "e" in t or "E" in t:
+        t = format(Decimal(t), "f")
+    neg = t.startswith("-")
+    i, _, f = t.lstrip("+-").partition(".")
+    f = f.rstrip("0")
+    v = int(i or "0") * 10 ** len(f) + int(f or "0")
+    return (-v if neg else v), len(f)
+
+
+class _OrderBook:
+    """One topic's depth book.
+
+    Each side is an ascending array of integer prices (units of 10^-px_scale) with a parallel
+    array of integer sizes (10^-sz_scale); bisect keeps them sorted, so the best bid is
+    bid_px[-1] and the best ask ask_px[0]. Scales grow when a level with more decimals
+    arrives. Decimals are only built in the read helpers.
+    """
+    __slots__ = ("px_scale", "sz_scale", "bid_px", "bid_sz", "ask_px", "ask_sz", "u")
+
+    def __init__(self) -> None:
+        self.px_scale = 0
+        self.sz_scale = 0
+        self.bid_px: List[int] = []
+        self.bid_sz: List[int] = []
+        self.ask_px: List[int] = []
+        self.ask_sz: List[int] = []
+        self.u: Optional[int] = None
+
+    def clear(self) -> None:
+        self.bid_px, self.bid_sz, self.ask_px, self.ask_sz = [], [], [], []
+
+    def _grow(self, px_dec: int, sz_dec: int) -> None:
+        if px_dec > self.px_scale:
+            k = 10 ** (px_dec - self.px_scale)
+            self.bid_px = [p * k for p in self.bid_px]
+            self.ask_px = [p * k for p in self.ask_px]
+            self.px_scale = px_dec
+        if sz_dec > self.sz_scale:
+            k = 10 ** (sz_dec - self.sz_scale)
+            self.bid_sz = [q * k for q in self.bid_sz]
+            self.ask_sz = [q * k for q in self.ask_sz]
+            self.sz_scale = sz_dec
+
+    @staticmethod
+    def _levels(val: Any) -> Iterable[Tuple[Any, Any]]:
+        if isinstance(val, dict):  # some feeds use {price: size}
+            return val.items()
+        if isinstance(val, list):
+            return (row[:2] for row in val if isinstance(row, (list, tuple)) and len(row) >= 2)
+        return ()
+
+    def apply(self, bids: Any, asks: Any) -> None:
+        """Set levels (size 0 deletes). Malformed levels are skipped."""
+        for val, px_arr, sz_arr in ((bids, "bid_px", "bid_sz"), (asks, "ask_px", "ask_sz")):
+            for p_raw, s_raw in self._levels(val):
+                try:
+                    p, p_dec = _num_units(p_raw)
+                    q, q_dec = _num_units(s_raw)
+                except Exception:
+                    continue
+                self._grow(p_dec, q_dec)
+                p *= 10 ** (self.px_scale - p_dec)
+                q *= 10 ** (self.sz_scale - q_dec)
+                pa, sa = getattr(self, px_arr), getattr(self, sz_arr)
+                i = bisect_left(pa, p)
+                if i < len(pa) and pa[i] == p:
+                    if q <= 0:
+                        del pa[i]
+                        del sa[i]
+                    else:
+                        sa[i] = q
+                elif q > 0:
+                    pa.insert(i, p)
+                    sa.insert(i, q)
+
+    def best(self) -> Tuple[Optional[int], Optional[int]]:
+        return (self.bid_px[-1] if self.bid_px else None), (self.ask_px[0] if self.ask_px else None)
+
+    def _side(self, side: str) -> Tuple[List[int], List[int]]:
+        """Levels best-first: 'bids'/'sell' walks bids down, 'asks'/'buy' walks asks up."""
+        if str(side).lower() in ("bid", "bids", "sell"):
+            return self.bid_px[::-1], self.bid_sz[::-1]
+        return self.ask_px, self.ask_sz
+
+    def levels(self, side: str, n: int) -> List[Tuple[Decimal, Decimal]]:
+        px, sz = self._side(side)
+        return [
+            (Decimal(p).scaleb(-self.px_scale), Decimal(q).scaleb(-self.sz_scale))
+            for p, q in zip(px[:n], sz[:n])
+        ]
+
+    def cum_size(self, side: str, n: int) -> Decimal:
+        _px, sz = self._side(side)
+        return Decimal(sum(sz[:n])).scaleb(-self.sz_scale)
+
+    def vwap(self, side: str, size: Decimal) -> Optional[Decimal]:
+        """Average price to fill size against side ('buy' takes asks, 'sell' takes bids);
+        None if the book is not deep enough."""
+        px, sz = self._side(side)
+        want, dec = _num_units(str(size))
+        scale = max(dec, self.sz_scale)
+        need = want * 10 ** (scale - dec)
+        k = 10 ** (scale - self.sz_scale)
+        if need <= 0:
+            return None
+        got = 0
+        notional = 0
+        for p, q in zip(px, sz):
+            take = min(q * k, need - got)
+            notional += take * p
+            got += take
+            if got >= need:
+                return (Decimal(notional) / Decimal(got)).scaleb(-self.px_scale)
+        return None
+
+
 def _topics_for_symbol(symbol: str, limit: int = 25, speed: str = "H") -> List[str]:
     """Return one or more candidate topics for a symbol.
 
@@ -2379,13 +3776,94 @@ def get_l1_bid_ask(symbol: str) -> Tuple[Optional[Decimal], Optional[Decimal], f
         row = _L1_CACHE.get(sym)
         if not row:
             return None, None, 0.0
-        return row.get("bid"), row.get("ask"), float(row.get("ts") or 0.0)
+        bid, ask, scale = row["bid"], row["ask"], row["px_scale"]
+        ts = float(row.get("ts") or 0.0)
+    return (
+        Decimal(bid).scaleb(-scale) if bid is not None else None,
+        Decimal(ask).scaleb(-scale) if ask is not None else None,
+        ts,
+    )
+
+
+def get_order_book(symbol: str, levels: int = 25) -> Optional[Dict[str, Any]]:
+    """Top `levels` of the public WS book: {"bids": [(px, size)...], "asks": [...], "ts", "u"}, best first."""
+    sym = format_symbol(symbol)
+    with _L1_LOCK:
+        row = _L1_CACHE.get(sym)
+        if not row:
+            return None
+        book: _OrderBook = row["book"]
+        return {
+            "bids": book.levels("bids", levels),
+            "asks": book.levels("asks", levels),
+            "ts": float(row.get("ts") or 0.0),
+            "u": book.u,
+        }
+
+
+def get_book_depth(symbol: str, side: str, levels: int = 25) -> Decimal:
+    """Cumulative size of the best `levels` levels on side ('bids' or 'asks')."""
+    with _L1_LOCK:
+        row = _L1_CACHE.get(format_symbol(symbol))
+        return row["book"].cum_size(side, levels) if row else Decimal("0")
+
+
+def get_book_vwap(symbol: str, side: str, size: Decimal) -> Optional[Decimal]:
+    """Expected average fill price for a market order of size ('buy' or 'sell'); None if too thin."""
+    with _L1_LOCK:
+        row = _L1_CACHE.get(format_symbol(symbol))
+        return row["book"].vwap(side, size) if row else None
+
+
+def _ticker_topics_for_symbol(symbol: str) -> List[str]:
+    """instrumentInfo (ticker: mark/index/last) topics for a symbol, dash and no-dash like orderBook."""
+    sym_dash = format_symbol(symbol)
+    sym_nodash = format_symbol_for_ticker(symbol)
+    topics = [f"instrumentInfo.H.{sym_nodash}"]
+    if _env_bool("PUBLIC_WS_SUBSCRIBE_NODASH", True) and sym_dash != sym_nodash:
+        topics.append(f"instrumentInfo.H.{sym_dash}")
+    return topics
+
+
+def _apply_ws_ticker(topic: str, payload: Dict[str, Any]) -> None:
+    """Merge an instrumentInfo snapshot/delta into the shared ticker cache."""
+    data = payload.get("data")
+    rows = data if isinstance(data, list) else [data]
+    now = time.time()
+    for d in rows:
+        if not isinstance(d, dict):
+            continue
+        raw_sym = d.get("symbol") or str(topic).split(".")[-1]
+        sym = _canon_symbol_from_ws_symbol(raw_sym)
+        if not sym or sym == "ALL":
+            continue
+        fields = {k: v for k, v in d.items() if v not in (None, "")}
+        with _TICKER_LOCK:
+            hit = _TICKER_CACHE.get(sym)
+            item = dict(hit[2]) if hit else {}
+            item.update(fields)
+            try:
+                price = _ticker_price(item)
+            except Exception:
+                price = None
+            if price is None or price <= 0:
+                continue
+            _TICKER_CACHE[sym] = (price, now, item)
+
+
+def ensure_public_ticker_subscription(symbol: str) -> None:
+    """Ensure the public WS is running and streaming ticker (mark/index/last) for this symbol."""
+    start_public_ws()
+    _want_public_topics(symbol, _ticker_topics_for_symbol(symbol))
 
 
 def ensure_public_depth_subscription(symbol: str, limit: int = 25, speed: str = "H") -> None:
     """Ensure the public WS is running and subscribed to orderBook topics for this symbol."""
     start_public_ws()
-    topics = _topics_for_symbol(symbol, limit=limit, speed=speed)
+    _want_public_topics(symbol, _topics_for_symbol(symbol, limit=limit, speed=speed))
+
+
+def _want_public_topics(symbol: str, topics: List[str]) -> None:
     new_topics: List[str] = []
     with _PUB_WS_TOPICS_LOCK:
         for t in topics:
@@ -2430,43 +3908,12 @@ def start_public_ws() -> None:
     resubscribe_sec = float(os.getenv("PUBLIC_WS_RESUBSCRIBE_SEC", "60"))
     idle_close_without_topics = _env_bool("PUBLIC_WS_IDLE_CLOSE_WITHOUT_TOPICS", False)
 
-    def _parse_levels(val: Any) -> List[Tuple[Decimal, Decimal]]:
-        out: List[Tuple[Decimal, Decimal]] = []
-        if not val:
-            return out
-        if isinstance(val, dict):
-            # Some feeds use {price: size}
-            for pk, sv in val.items():
-                try:
-                    p = Decimal(str(pk))
-                    s = Decimal(str(sv))
-                    out.append((p, s))
-                except Exception:
-                    continue
-            return out
-        if isinstance(val, list):
-            for row in val:
-                if not isinstance(row, (list, tuple)) or len(row) < 2:
-                    continue
-                try:
-                    p = Decimal(str(row[0]))
-                    s = Decimal(str(row[1]))
-                    out.append((p, s))
-                except Exception:
-                    continue
-        return out
-
     def _update_book(topic: str, payload: Dict[str, Any]) -> None:
         # Extract symbol from topic: orderBook25.H.BTC-USDT
         parts = str(topic).split(".")
         ws_sym = parts[-1] if parts else ""
         canon = _canon_symbol_from_ws_symbol(ws_sym)
 
-        book = _BOOKS_BY_TOPIC.get(topic)
-        if book is None:
-            book = {"bids": {}, "asks": {}, "u": None}
-            _BOOKS_BY_TOPIC[topic] = book
-
         # Determine whether snapshot or delta
         mtype = str(payload.get("type") or payload.get("action") or "").lower()
         is_snapshot = mtype in {"snapshot", "partial", "init"} or payload.get("snapshot") is True
@@ -2483,11 +3930,6 @@ def start_public_ws() -> None:
         except Exception:
             u_int = None
 
-        # Basic monotonic check: if u regresses, ignore this update.
-        prev_u = book.get("u")
-        if u_int is not None and isinstance(prev_u, int) and u_int <= prev_u:
-            return
-
         bids_val = None
         asks_val = None
         if isinstance(data, dict):
@@ -2495,49 +3937,36 @@ def start_public_ws() -> None:
             bids_val = data.get("bids") if "bids" in data else data.get("b")
             asks_val = data.get("asks") if "asks" in data else data.get("a")
 
-        bids = _parse_levels(bids_val)
-        asks = _parse_levels(asks_val)
-
-        # Snapshot replaces; delta applies
-        if is_snapshot:
-            book["bids"] = {}
-            book["asks"] = {}
-
-        # Apply updates
-        for p, s in bids:
-            if s <= 0:
-                book["bids"].pop(p, None)
-            else:
-                book["bids"][p] = s
-        for p, s in asks:
-            if s <= 0:
-                book["asks"].pop(p, None)
-            else:
-                book["asks"][p] = s
-
-        if u_int is not None:
-            book["u"] = u_int
+        with _L1_LOCK:
+            book = _BOOKS_BY_TOPIC.get(topic)
+            if book is None:
+                book = _OrderBook()
+                _BOOKS_BY_TOPIC[topic] = book
 
-        # Compute BBO
-        try:
-            best_bid = max(book["bids"].keys()) if book["bids"] else None
-            best_ask = min(book["asks"].keys()) if book["asks"] else None
-        except Exception:
-            best_bid, best_ask = None, None
+            # Basic monotonic check: if u regresses, ignore this update.
+            if u_int is not None and book.u is not None and u_int <= book.u:
+                return
 
-        if best_bid is None or best_ask is None:
-            # Don't overwrite cache with empties.
-            return
+            # Snapshot replaces; delta applies
+            if is_snapshot:
+                book.clear()
+            book.apply(bids_val, asks_val)
+            if u_int is not None:
+                book.u = u_int
 
-        now = time.time()
+            best_bid, best_ask = book.best()
+            if best_bid is None or best_ask is None:
+                # Don't overwrite cache with empties.
+                return
 
-        with _L1_LOCK:
             _L1_CACHE[canon] = {
+                "book": book,
                 "bid": best_bid,
                 "ask": best_ask,
-                "ts": now,
+                "px_scale": book.px_scale,
+                "ts": time.time(),
                 "topic": topic,
-                "u": book.get("u"),
+                "u": book.u,
             }
 
     def _run_forever() -> None:
@@ -2641,7 +4070,10 @@ def start_public_ws() -> None:
 
                 topic = msg.get("topic") or msg.get("stream") or msg.get("channel")
                 if topic:
-                    _update_book(str(topic), msg)
+                    if str(topic).startswith("instrumentInfo"):
+                        _apply_ws_ticker(str(topic), msg)
+                    else:
+                        _update_book(str(topic), msg)
             except Exception:
                 # ignore parse errors (do not kill connection)
                 return
@@ -1,16 +1,20 @@
 # app.py
 import os
+import csv
+import io
+import json
 import time
 import threading
 from decimal import Decimal, ROUND_DOWN, ROUND_UP
 from typing import Dict, Tuple, Optional, Set, Any, List
 
-from flask import Flask, request, jsonify, Response
+from flask import Flask, request, jsonify, Response, stream_with_context
 
 from apex_client import (
     create_market_order,
     get_market_price,
     get_reference_price,
+    get_reference_price_with_age,
     get_l1_bid_ask,
     ensure_public_depth_subscription,
     start_public_ws,
@@ -20,6 +24,10 @@ from apex_client import (
     _snap_quantity,
     start_private_ws,
     start_order_rest_poller,
+    start_http_warmer,
+    start_ticker_refresher,
+    get_cached_mark_price,
+    get_mark_price,
 )
 
 from pnl_store import (
@@ -30,14 +38,23 @@ from pnl_store import (
     get_bot_summary,
     get_bot_open_positions,
     get_symbol_open_directions,
+    get_all_open_positions,
+    get_symbol_holders,
     get_lock_level_pct,
     set_lock_level_pct,
     clear_lock_level_pct,
-    is_signal_processed,
-    mark_signal_processed,
+    claim_signal,
+    read_snapshot,
+    iter_export_rows,
+    export_columns,
+    encode_cursor,
+    parse_cursor,
     record_trade_event,
     list_trade_events,
     realized_pnl_by_window,
+    add_pending_order,
+    set_pending_order_id,
+    mark_pending_failed,
 
 )
 
@@ -51,6 +68,18 @@ ENABLE_WS = str(os.getenv("ENABLE_WS", "0")).strip() == "1"
 ENABLE_RISK_LOOP = str(os.getenv("ENABLE_RISK_LOOP", "0")).strip() == "1"  # run ladder risk loop in this process
 RISK_PRICE_SOURCE = str(os.getenv("RISK_PRICE_SOURCE", "MARK")).upper().strip()  # MARK | LAST | INDEX | L1
 
+# Pre-open the REST keep-alive pool in every process that imports this module (gunicorn
+# workers and worker.py), so the first order after start/idle skips the TLS handshake.
+if str(os.getenv("APEX_HTTP_PREWARM", "1")).strip() == "1":
+    start_http_warmer()
+
+# One all-markets ticker request per interval instead of one /ticker call per symbol.
+# Off by default: worker.py turns it on; web processes fall back to per-symbol lookups
+# instead of each gunicorn worker polling every market.
+MARK_CACHE_MAX_AGE_SEC = float(os.getenv("MARK_CACHE_MAX_AGE_SEC", "2.0"))
+if str(os.getenv("ENABLE_TICKER_REFRESHER", "0")).strip() == "1":
+    start_ticker_refresher()
+
 # 退出互斥窗口（秒）：防止重复平仓
 EXIT_COOLDOWN_SEC = float(os.getenv("EXIT_COOLDOWN_SEC", "2.0"))
 
@@ -141,6 +170,32 @@ def _bot_num(bot_id: str) -> int:
         return 0
 
 
+def _pending_open(bot_id: str, key: str, symbol: str, mode: str, entry_side: str, client_id: str) -> str:
+    """Write the pending_orders row before placing an order; returns its key ("" if the write
+    failed or the key already belongs to a resolved / other-mode row).
+
+    If the inline fill wait below gives up, worker's reconciler records the fill from this row.
+    """
+    direction = "LONG" if str(entry_side).upper() == "BUY" else "SHORT"
+    try:
+        if add_pending_order(bot_id, key, symbol, mode, entry_side, direction, client_id):
+            return key
+        print(f"[PENDING] key in use by a resolved or {mode}-mismatched row; not tracked bot={bot_id} key={key}")
+        return ""
+    except Exception as e:
+        print(f"[PENDING] add_pending_order error bot={bot_id} key={key}: {e}")
+        return ""
+
+
+def _pending_fail(bot_id: str, key: str, note: str) -> None:
+    if not key:
+        return
+    try:
+        mark_pending_failed(bot_id, key, note=note)
+    except Exception as e:
+        print(f"[PENDING] mark_pending_failed error bot={bot_id} key={key}: {e}")
+
+
 def _to_decimal(x: Any, default: Decimal = Decimal("0")) -> Decimal:
     """Best-effort Decimal coercion used by monitor loops.
 
@@ -386,7 +441,20 @@ def _get_mark_price(symbol: str) -> Optional[Decimal]:
     - For ladder SL/TS we only need a reasonable realtime reference price.
     - If the private position payload doesn't include a mark-like price, we fall back to
       the public ticker reference price.
+    - The shared ticker table (public WS ticker stream + bulk refresher) is consulted first;
+      it costs no I/O. get_mark_price() subscribes the WS ticker for symbols not streamed yet.
     """
+    cached = get_cached_mark_price(symbol, max_age_sec=MARK_CACHE_MAX_AGE_SEC)
+    if cached is not None:
+        return cached
+
+    try:
+        mp = get_mark_price(symbol)
+        if mp is not None and mp > 0:
+            return mp
+    except Exception:
+        pass
+
     try:
         pos = get_open_position_for_symbol(symbol)
         if isinstance(pos, dict):
@@ -470,13 +538,13 @@ def _get_l1_risk_price(symbol: str, direction: str) -> Tuple[Optional[Decimal],
                 return cpx, "TICKER_CACHE", bid, ask
             return cpx, "TICKER_CACHE", bid, ask
 
-    # 3) Live ticker (REST)
+    # 3) Live ticker (REST; shared with concurrent callers, reused if younger than the refresh window)
     try:
-        ref = get_reference_price(sym)
+        ref, age = get_reference_price_with_age(sym, max_age_sec=RISK_TICKER_REFRESH_SEC)
         if ref is not None and ref > 0:
             with _RISK_TICKER_LOCK:
-                _RISK_TICKER_CACHE[sym] = (ref, now)
-            return ref, "TICKER_REST", bid, ask
+                _RISK_TICKER_CACHE[sym] = (ref, now - age)
+            return ref, ("TICKER_REST" if age <= 0 else "TICKER_CACHE"), bid, ask
     except Exception:
         pass
 
@@ -830,20 +898,15 @@ def _find_symbol_holders(symbol: str) -> List[Dict[str, Any]]:
         return []
 
     holders: List[Dict[str, Any]] = []
-    bots = list_bots_with_activity()
-    for b in bots:
-        b2 = _canon_bot_id(b)
-        try:
-            opens = get_bot_open_positions(b2)
-        except Exception:
-            continue
-        for d in ("LONG", "SHORT"):
-            try:
-                q = opens.get((sym, d), {}).get("qty", Decimal("0"))
-            except Exception:
-                q = Decimal("0")
-            if q and q > 0:
-                holders.append({"bot_id": b2, "direction": d, "qty": q})
+    try:
+        rows = get_symbol_holders(sym)
+    except Exception:
+        return []
+    for h in rows:
+        d = str(h.get("direction") or "").upper()
+        q = h.get("qty") or Decimal("0")
+        if d in ("LONG", "SHORT") and q > 0:
+            holders.append({"bot_id": _canon_bot_id(h.get("bot_id")), "direction": d, "qty": q})
     return holders
 
 
@@ -924,6 +987,8 @@ def _execute_exit_order(
     bnum = _bot_num(bot_id)
     ts_now = int(time.time())
     exit_client_id = f"{bnum:03d}{ts_now}02"
+    # keyed on the exit's own clientId: a flip's entry that follows reuses sig_id
+    pending_key = _pending_open(bot_id, exit_client_id, symbol, "exit", entry_side, exit_client_id)
 
     try:
         order = create_market_order(
@@ -934,6 +999,7 @@ def _execute_exit_order(
             client_id=exit_client_id,
         )
     except Exception as e:
+        # pending row stays: if the order did reach the exchange, the reconciler finds its fills
         print("[EXIT] create_market_order error:", e)
         return {"status": "order_error", "mode": "exit", "bot_id": bot_id, "symbol": symbol, "signal_id": sig_id, "error": str(e)}
 
@@ -941,6 +1007,7 @@ def _execute_exit_order(
     print(f"[EXIT] order status={status} cancelReason={cancel_reason!r} bot={bot_id} symbol={symbol} reason={reason}")
 
     if status in ("CANCELED", "REJECTED"):
+        _pending_fail(bot_id, pending_key, f"exit_{status.lower()}")
         return {
             "status": "exit_rejected",
             "mode": "exit",
@@ -953,6 +1020,9 @@ def _execute_exit_order(
             "signal_id": sig_id,
         }
 
+    if pending_key and order.get("order_id"):
+        set_pending_order_id(bot_id, pending_key, str(order["order_id"]), wait=False)
+
     try:
         fill = get_fill_summary(
             symbol=symbol,
@@ -976,22 +1046,25 @@ def _execute_exit_order(
             exit_qty=filled_qty,
             exit_price=exit_price,
             reason=reason,
+            pending_signal_id=pending_key,
         )
-        try:
-            direction = "LONG" if str(entry_side).upper() == "BUY" else "SHORT"
-            realized_sum = Decimal(str((out or {}).get("realized_sum", "0")))
-            record_trade_event(
-                bot_id=bot_id,
-                symbol=symbol,
-                direction=direction,
-                event_type="EXIT",
-                qty=filled_qty,
-                exit_price=exit_price,
-                realized_pnl=realized_sum,
-                reason=reason,
-            )
-        except Exception as _e:
-            print("[DASH] record_trade_event EXIT error:", _e)
+        # duplicate: the fill was already recorded (by the reconciler); no second EXIT event
+        if not (out or {}).get("duplicate"):
+            try:
+                direction = "LONG" if str(entry_side).upper() == "BUY" else "SHORT"
+                realized_sum = Decimal(str((out or {}).get("realized_sum", "0")))
+                record_trade_event(
+                    bot_id=bot_id,
+                    symbol=symbol,
+                    direction=direction,
+                    event_type="EXIT",
+                    qty=filled_qty,
+                    exit_price=exit_price,
+                    realized_pnl=realized_sum,
+                    reason=reason,
+                )
+            except Exception as _e:
+                print("[DASH] record_trade_event EXIT error:", _e)
     except Exception as e:
         print("[PNL] record_exit_fifo error:", e)
 
@@ -1361,6 +1434,7 @@ def _ladder_close_position(bot_id: str, symbol: str, direction: str, qty: Decima
     bnum = _bot_num(bot_id)
     ts_now = int(time.time())
     exit_client_id = f"{bnum:03d}{ts_now}90"
+    pending_key = _pending_open(bot_id, exit_client_id, symbol, "exit", entry_side, exit_client_id)
 
     try:
         order = create_market_order(
@@ -1374,6 +1448,9 @@ def _ladder_close_position(bot_id: str, symbol: str, direction: str, qty: Decima
         print(f"[LADDER] close order error bot={bot_id} {direction} {symbol} qty={qty}: {e}")
         return
 
+    if pending_key and order.get("order_id"):
+        set_pending_order_id(bot_id, pending_key, str(order["order_id"]), wait=False)
+
     try:
         fill = get_fill_summary(
             symbol=symbol,
@@ -1397,21 +1474,24 @@ def _ladder_close_position(bot_id: str, symbol: str, direction: str, qty: Decima
             exit_qty=filled_qty,
             exit_price=exit_price,
             reason=reason,
+            pending_signal_id=pending_key,
         )
-        try:
-            realized_sum = Decimal(str((out or {}).get("realized_sum", "0")))
-            record_trade_event(
-                bot_id=bot_id,
-                symbol=symbol,
-                direction=direction,
-                event_type="EXIT",
-                qty=filled_qty,
-                exit_price=exit_price,
-                realized_pnl=realized_sum,
-                reason=reason,
-            )
-        except Exception as _e:
-            print("[DASH] record_trade_event LADDER EXIT error:", _e)
+        # duplicate: the fill was already recorded (by the reconciler); no second EXIT event
+        if not (out or {}).get("duplicate"):
+            try:
+                realized_sum = Decimal(str((out or {}).get("realized_sum", "0")))
+                record_trade_event(
+                    bot_id=bot_id,
+                    symbol=symbol,
+                    direction=direction,
+                    event_type="EXIT",
+                    qty=filled_qty,
+                    exit_price=exit_price,
+                    realized_pnl=realized_sum,
+                    reason=reason,
+                )
+            except Exception as _e:
+                print("[DASH] record_trade_event LADDER EXIT error:", _e)
     except Exception as e:
         print("[LADDER] record_exit_fifo error:", e)
 
@@ -1437,13 +1517,20 @@ def _risk_loop():
     print(f"[LADDER] risk loop started (interval={RISK_POLL_INTERVAL}s)")
     while True:
         # bots that have ladder enabled (across all ladder configs)
-        bots = sorted(_all_ladder_bots())
+        bots = sorted({_canon_bot_id(b) for b in _all_ladder_bots()})
+
+        # one snapshot for all ladder bots instead of one query per bot
+        try:
+            all_opens = get_all_open_positions(bots=bots)
+        except Exception:
+            all_opens = {}
+        opens_by_bot: Dict[str, Dict[Tuple[str, str], Dict[str, Any]]] = {}
+        for (b, sym, d), v in all_opens.items():
+            opens_by_bot.setdefault(b, {})[(sym, d)] = v
 
         for bot_id in bots:
-            try:
-                bot_id = _canon_bot_id(bot_id)
-                opens = get_bot_open_positions(bot_id)
-            except Exception:
+            opens = opens_by_bot.get(bot_id)
+            if not opens:
                 continue
 
             for (symbol, direction), v in list(opens.items()):
@@ -1493,6 +1580,7 @@ def _risk_loop():
                                 stop_price=stop_price,
                                 lock_level_pct=new_lock,
                                 reason="lock_update",
+                                wait=False,
                             )
                     except Exception as _e:
                         if LADDER_DEBUG:
@@ -1577,7 +1665,7 @@ def _ensure_monitor_thread():
                 except Exception as e:
                     print("[SYSTEM] public WS failed to start:", e)
             else:
-                print(f"[SYSTEM] risk price source={RISK_PRICE_SOURCE}; public WS not started")
+                print(f"[SYSTEM] risk price source={RISK_PRICE_SOURCE}; public WS starts on demand for ticker (mark/index) only")
 
             _ensure_risk_thread()
             print("[SYSTEM] ladder risk enabled in this process (ENABLE_RISK_LOOP=1)")
@@ -1601,17 +1689,35 @@ def api_pnl():
 
     _ensure_monitor_thread()
 
-    bots = list_bots_with_activity()
-    only_bot = request.args.get("bot_id")
-    if only_bot:
-        only_bot = _canon_bot_id(only_bot)
-        bots = [b for b in bots if _canon_bot_id(b) == only_bot]
+    # All DB reads in one consistent read-only snapshot; price lookups happen after it closes.
+    with read_snapshot():
+        bots = list_bots_with_activity()
+        only_bot = request.args.get("bot_id")
+        if only_bot:
+            only_bot = _canon_bot_id(only_bot)
+            bots = [b for b in bots if _canon_bot_id(b) == only_bot]
+
+        opens_by_bot: Dict[str, Dict[Tuple[str, str], Dict[str, Any]]] = {}
+        for (b, sym, d), v in get_all_open_positions().items():
+            opens_by_bot.setdefault(_canon_bot_id(b), {})[(sym, d)] = v
+
+        summaries = {_canon_bot_id(b): get_bot_summary(_canon_bot_id(b)) for b in bots}
+
+    # one price lookup per symbol, not per (bot, symbol); only the bots being reported
+    marks: Dict[str, Optional[Decimal]] = {}
+    for b in {_canon_bot_id(b) for b in bots}:
+        for (symbol, _dir) in opens_by_bot.get(b, {}):
+            if symbol not in marks:
+                try:
+                    marks[symbol] = _get_mark_price(symbol)
+                except Exception:
+                    marks[symbol] = None
 
     out = []
     for bot_id in bots:
         bot_id = _canon_bot_id(bot_id)
-        base = get_bot_summary(bot_id)
-        opens = get_bot_open_positions(bot_id)
+        base = summaries[bot_id]
+        opens = opens_by_bot.get(bot_id, {})
 
         unrealized = Decimal("0")
         open_rows = []
@@ -1622,10 +1728,7 @@ def api_pnl():
             if qty <= 0:
                 continue
 
-            try:
-                px = _get_mark_price(symbol)
-            except Exception:
-                continue
+            px = marks.get(symbol)
             if px is None:
                 continue
 
@@ -1667,19 +1770,91 @@ def api_live():
     _ensure_monitor_thread()
 
     bot_id = request.args.get("bot_id")
-    limit = int(request.args.get("limit") or 50)
-    days = int(request.args.get("days") or 7)
+    try:
+        limit = int(request.args.get("limit") or 50)
+        days = int(request.args.get("days") or 7)
+        before = parse_cursor(request.args.get("before_id"))
+        after = parse_cursor(request.args.get("after_id"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     try:
-        events = list_trade_events(
-            bot_id=_canon_bot_id(bot_id) if bot_id else None,
-            limit=limit,
-            days=days,
-        )
+        with read_snapshot():
+            events = list_trade_events(
+                bot_id=_canon_bot_id(bot_id) if bot_id else None,
+                limit=limit,
+                days=days,
+                before_id=before,
+                after_id=after,
+            )
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-    return jsonify({"ts": int(time.time()), "events": events}), 200
+    # "<ts>:<id>" cursors for the next page back / newer rows
+    return jsonify({
+        "ts": int(time.time()),
+        "events": events,
+        "next_before_id": encode_cursor(events[-1]) if events else None,
+        "next_after_id": encode_cursor(events[0]) if events else request.args.get("after_id") or None,
+    }), 200
+
+
+@app.route("/api/export", methods=["GET"])
+def api_export():
+    """Stream exits / trade_events as NDJSON (default) or CSV in constant memory.
+
+    Query: table=exits|trade_events, format=ndjson|csv, bot_id, since, until (unix seconds),
+    after_id ("<ts>:<id>" of the last row received, to resume).
+    """
+    if not _require_token():
+        return jsonify({"error": "forbidden"}), 403
+
+    table = str(request.args.get("table") or "exits").strip().lower()
+    fmt = str(request.args.get("format") or "ndjson").strip().lower()
+    bot_id = request.args.get("bot_id")
+    since = request.args.get("since")
+    until = request.args.get("until")
+    if fmt not in ("ndjson", "csv"):
+        return jsonify({"error": "format must be ndjson or csv"}), 400
+    try:
+        cols = export_columns(table)
+        since_ts = int(since) if since else None
+        until_ts = int(until) if until else None
+        after = parse_cursor(request.args.get("after_id"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    rows = iter_export_rows(
+        table,
+        bot_id=_canon_bot_id(bot_id) if bot_id else None,
+        since_ts=since_ts,
+        until_ts=until_ts,
+        after_id=after,
+    )
+
+    def _ndjson():
+        for r in rows:
+            yield json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+    def _csv():
+        buf = io.StringIO()
+        w = csv.writer(buf)
+        w.writerow(cols)
+        for r in rows:
+            w.writerow([r.get(c) for c in cols])
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate(0)
+        if buf.tell():
+            yield buf.getvalue()
+
+    ext = "csv" if fmt == "csv" else "ndjson"
+    gen = _csv() if fmt == "csv" else _ndjson()
+    return Response(
+        stream_with_context(gen),
+        mimetype="text/csv" if fmt == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f"attachment; filename={table}-{int(time.time())}.{ext}"},
+    )
 
 
 @app.route("/api/pnl_detail", methods=["GET"])
@@ -1701,7 +1876,8 @@ def api_pnl_detail():
     sec = windows.get(window, 7 * 24 * 3600)
 
     try:
-        out = realized_pnl_by_window(sec, bot_id=_canon_bot_id(bot_id) if bot_id else None)
+        with read_snapshot():
+            out = realized_pnl_by_window(sec, bot_id=_canon_bot_id(bot_id) if bot_id else None)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -2739,10 +2915,9 @@ def tv_webhook():
         return "missing or invalid signal_type / action", 400
 
     sig_id = _get_signal_id(body, mode, bot_id, symbol)
-    if is_signal_processed(bot_id, sig_id):
+    if not claim_signal(bot_id, sig_id, kind=f"webhook_{mode}"):
         print(f"[WEBHOOK] dedup: bot={bot_id} symbol={symbol} mode={mode} sig={sig_id}")
         return jsonify({"status": "dedup", "mode": mode, "bot_id": bot_id, "symbol": symbol, "signal_id": sig_id}), 200
-    mark_signal_processed(bot_id, sig_id, kind=f"webhook_{mode}")
 
     # -------------------------
     # ENTRY
@@ -2940,6 +3115,7 @@ def tv_webhook():
         bnum = _bot_num(bot_id)
         ts_now = int(time.time())
         entry_client_id = f"{bnum:03d}{ts_now}01"
+        pending_key = _pending_open(bot_id, sig_id or entry_client_id, symbol, "entry", side_raw, entry_client_id)
 
 
         # Snapshot current position size BEFORE placing the order.
@@ -2979,6 +3155,7 @@ def tv_webhook():
         print(f"[ENTRY] order status={status} cancelReason={cancel_reason!r} orderId={data_brief.get('orderId')} code={code} msg={msg!r}")
 
         if status in ("CANCELED", "REJECTED"):
+            _pending_fail(bot_id, pending_key, f"entry_{status.lower()}")
             return jsonify({
                 "status": "order_rejected",
                 "mode": "entry",
@@ -2999,6 +3176,7 @@ def tv_webhook():
         # If we did not receive an orderId, fail fast instead of waiting for fills.
         # This is the most common case when size step/precision is invalid.
         if not order_id:
+            _pending_fail(bot_id, pending_key, "entry_missing_order_id")
             return jsonify({
                 "status": "order_rejected",
                 "mode": "entry",
@@ -3013,6 +3191,9 @@ def tv_webhook():
                 "signal_id": sig_id,
             }), 200
 
+        if pending_key:
+            set_pending_order_id(bot_id, pending_key, str(order_id), wait=False)
+
         entry_price_dec: Optional[Decimal] = None
         final_qty = snapped_qty
 
@@ -3076,41 +3257,44 @@ def tv_webhook():
             }), 200
 
         # Record entry into PnL DB
+        entry_recorded = True
         try:
-            record_entry(
+            entry_recorded = record_entry(
                 bot_id=bot_id,
                 symbol=symbol,
                 side=side_raw,
                 qty=final_qty,
                 price=entry_price_dec,
+                pending_signal_id=pending_key,
             )
         except Exception as e:
             print("[PNL] record_entry error:", e)
 
-        # Record dashboard event (ENTRY)
-        try:
-            direction = "LONG" if side_raw == "BUY" else "SHORT"
-            cfg = _get_ladder_cfg(bot_id, direction)
-            lock_pct = None
-            stop_price = None
-            if cfg and cfg.get("base_sl_pct") is not None:
-                base_sl = Decimal(str(cfg.get("base_sl_pct")))
-                lock_pct = -base_sl
-                stop_price = _compute_stop_price(direction, entry_price_dec, lock_pct)
-
-            record_trade_event(
-                bot_id=bot_id,
-                symbol=symbol,
-                direction=direction,
-                event_type="ENTRY",
-                qty=final_qty,
-                entry_price=entry_price_dec,
-                stop_price=stop_price,
-                lock_level_pct=lock_pct,
-                reason="webhook_entry",
-            )
-        except Exception as e:
-            print("[DASH] record_trade_event ENTRY error:", e)
+        # Record dashboard event (ENTRY); skipped when the reconciler already recorded this fill
+        if entry_recorded:
+            try:
+                direction = "LONG" if side_raw == "BUY" else "SHORT"
+                cfg = _get_ladder_cfg(bot_id, direction)
+                lock_pct = None
+                stop_price = None
+                if cfg and cfg.get("base_sl_pct") is not None:
+                    base_sl = Decimal(str(cfg.get("base_sl_pct")))
+                    lock_pct = -base_sl
+                    stop_price = _compute_stop_price(direction, entry_price_dec, lock_pct)
+
+                record_trade_event(
+                    bot_id=bot_id,
+                    symbol=symbol,
+                    direction=direction,
+                    event_type="ENTRY",
+                    qty=final_qty,
+                    entry_price=entry_price_dec,
+                    stop_price=stop_price,
+                    lock_level_pct=lock_pct,
+                    reason="webhook_entry",
+                )
+            except Exception as e:
+                print("[DASH] record_trade_event ENTRY error:", e)
 
         # Local cache for speed
         BOT_POSITIONS[(bot_id, symbol)] = {
@@ -0,0 +1,155 @@
+"""Rebuild the PnL ledger (lots / exits / pnl_hourly) from the account's fill history.
+
+Fills are attributed to bots through the deterministic numeric clientIds placed by app.py:
+    BBB + unix_ts + 01   entry   (tv_webhook)
+    BBB + unix_ts + 02   exit    (_execute_exit_order)
+    BBB + unix_ts + 90   exit    (_ladder_close_position)
+Fills with any other clientId (manual trades, exchange-side TP/SL) are skipped.
+
+Resumable: every committed chunk advances a checkpoint in store_meta, and a rerun only
+loads orders newer than it. bulk_load_fills does not dedupe, so without --reset a run is
+refused when the range it would load already has rows: lots/exits recorded live after the
+checkpoint (or with no checkpoint at all), or any rows after an explicit --since. Usage:
+    python backfill_fills.py --reset            # wipe the ledger and rebuild from scratch
+    python backfill_fills.py                    # continue from the checkpoint
+    python backfill_fills.py --dry-run          # fetch + attribute, print the report only
+"""
+import argparse
+import re
+import time
+from decimal import Decimal
+from typing import Any, Dict, List
+
+from pnl_store import (
+    init_db,
+    bulk_load_fills,
+    get_backfill_checkpoint,
+    ledger_rows_after,
+    reset_ledger,
+)
+from apex_client import iter_fill_history
+
+CLIENT_ID_RE = re.compile(r"^(\d{3})(\d{10})(01|02|90)$")
+CLIENT_ID_MODES = {"01": "entry", "02": "exit", "90": "exit"}
+
+# Fills of one order can straddle the checkpoint second; fetch a bit earlier and
+# drop whole orders at or before the checkpoint instead.
+FETCH_OVERLAP_SEC = 3600
+
+# Raw fill fields _parse_fill reads the time from; without one it stamps time.time(),
+# which would put the fill out of FIFO order, so such fills are skipped.
+FILL_TS_KEYS = ("ts", "timestamp", "createdAt", "time")
+
+
+def _aggregate_orders(fills: List[Dict[str, Any]], stats: Dict[str, int]) -> List[Dict[str, Any]]:
+    """Group fills per orderId and turn each attributable order into one ledger fill."""
+    by_oid: Dict[str, Dict[str, Any]] = {}
+    for f in fills:
+        raw = f.get("raw") or {}
+        if all(raw.get(k) in (None, "") for k in FILL_TS_KEYS):
+            stats["skipped_no_ts"] += 1
+            continue
+        o = by_oid.get(f["order_id"])
+        if o is None:
+            o = by_oid[f["order_id"]] = {
+                "client_order_id": str(f.get("client_order_id") or raw.get("clientOrderId") or ""),
+                "symbol": f.get("symbol") or "",
+                "side": str(raw.get("side") or "").upper(),
+                "qty": Decimal("0"),
+                "notional": Decimal("0"),
+                "ts": 0,
+            }
+        o["qty"] += f["qty"]
+        o["notional"] += f["qty"] * f["price"]
+        o["ts"] = max(o["ts"], int(f["ts"]))
+
+    out = []
+    for oid, o in by_oid.items():
+        m = CLIENT_ID_RE.match(o["client_order_id"])
+        if not m or int(m.group(1)) == 0 or o["side"] not in ("BUY", "SELL") or not o["symbol"]:
+            stats["skipped_orders"] += 1
+            continue
+        mode = CLIENT_ID_MODES[m.group(3)]
+        if mode == "entry":
+            entry_side = o["side"]
+        else:
+            entry_side = "BUY" if o["side"] == "SELL" else "SELL"
+        out.append({
+            "order_id": oid,
+            "bot_id": f"BOT_{int(m.group(1))}",
+            "symbol": o["symbol"],
+            "mode": mode,
+            "entry_side": entry_side,
+            "qty": o["qty"],
+            "price": o["notional"] / o["qty"],
+            "ts": o["ts"],
+            "reason": f"backfill_{mode}",
+        })
+    out.sort(key=lambda x: (x["ts"], x["order_id"]))
+    return out
+
+
+def _chunks(orders: List[Dict[str, Any]], size: int):
+    """Chunks of ~size orders that never split one ts (the checkpoint is a ts)."""
+    start = 0
+    while start < len(orders):
+        end = min(len(orders), start + max(1, size))
+        while end < len(orders) and orders[end]["ts"] == orders[end - 1]["ts"]:
+            end += 1
+        yield orders[start:end]
+        start = end
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reset", action="store_true", help="delete lots/exits/pnl_hourly and the checkpoint first")
+    parser.add_argument("--since", type=int, default=None, help="unix ts to start from (overrides the checkpoint)")
+    parser.add_argument("--symbol", action="append", default=None, help="only this symbol (repeatable)")
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--chunk", type=int, default=5000, help="orders per write transaction")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    init_db()
+    t0 = time.time()
+    if not (args.reset or args.dry_run):
+        if args.since is not None:
+            clash = ledger_rows_after(args.since)
+        else:
+            clash = ledger_rows_after(get_backfill_checkpoint(), live_only=True)
+        if clash:
+            raise SystemExit(
+                f"[backfill] {clash} lots/exits already cover the range to load (recorded live or "
+                "by an earlier backfill); replaying would duplicate them. Rerun with --reset to "
+                "rebuild the ledger from fills."
+            )
+    if args.reset and not args.dry_run:
+        reset_ledger()
+    checkpoint = args.since if args.since is not None else (0 if args.reset else get_backfill_checkpoint())
+    since = max(0, checkpoint - FETCH_OVERLAP_SEC) if checkpoint else None
+
+    fills: List[Dict[str, Any]] = []
+    for sym in (args.symbol or [None]):
+        fills.extend(iter_fill_history(symbol=sym, since_ts=since, page_size=args.page_size))
+    t_fetch = time.time() - t0
+
+    stats = {"fills": len(fills), "skipped_no_ts": 0, "skipped_orders": 0,
+             "entries": 0, "exits": 0, "exit_rows": 0, "unmatched": 0, "chunks": 0}
+    orders = [o for o in _aggregate_orders(fills, stats) if o["ts"] > checkpoint]
+    stats["orders"] = len(orders)
+
+    if not args.dry_run:
+        for chunk in _chunks(orders, args.chunk):
+            res = bulk_load_fills(chunk)
+            stats["chunks"] += 1
+            for k in ("entries", "exits", "exit_rows", "unmatched"):
+                stats[k] += int(res.get(k) or 0)
+            print(f"[backfill] chunk {stats['chunks']}: {len(chunk)} orders up to ts={chunk[-1]['ts']}")
+
+    stats["fetch_sec"] = round(t_fetch, 2)
+    stats["total_sec"] = round(time.time() - t0, 2)
+    print(f"[backfill] done checkpoint_was={checkpoint} {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""Load benchmarks for pnl_store against a throwaway SQLite file.
+
+Every table size runs in a fresh process (pnl_store reads PNL_DB_PATH at import):
+    seed          bulk-load N synthetic orders (lots/exits) + N trade_events
+    entry         record_entry latency / rate
+    event         record_trade_event latency (wait=True) and queued rate (wait=False)
+    exit_vs_lots  record_exit_fifo latency with K open lots in the matched position
+    positions     get_bot_open_positions latency, warm book and cold (rebuild)
+    contention    a web-like and a worker-like process writing/reading the same file
+
+Usage:
+    python bench_pnl_store.py                         # 10k / 100k / 1M rows
+    python bench_pnl_store.py --sizes 10000 --out results.json
+Results (p50/p99 in ms) are printed and written as JSON for run-to-run comparison.
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import time
+from decimal import Decimal
+from typing import Any, Dict, List
+
+BOTS = [f"BOT_{i}" for i in range(1, 21)]
+SYMBOLS = ["BTC-USDT", "ETH-USDT", "SOL-USDT", "XRP-USDT", "DOGE-USDT", "BNB-USDT", "ADA-USDT", "AVAX-USDT", "LINK-USDT", "SUI-USDT"]
+T0 = 1_700_000_000
+
+
+def _stats(samples: List[float], wall: float = 0.0) -> Dict[str, Any]:
+    """samples in seconds -> ms percentiles; ops_per_sec from wall (or the sample sum)."""
+    if not samples:
+        return {"n": 0}
+    xs = sorted(samples)
+    n = len(xs)
+    total = wall or sum(xs)
+    return {
+        "n": n,
+        "p50_ms": round(xs[n // 2] * 1000, 3),
+        "p99_ms": round(xs[min(n - 1, int(n * 0.99))] * 1000, 3),
+        "mean_ms": round(total / n * 1000, 3),
+        "max_ms": round(xs[-1] * 1000, 3),
+        "ops_per_sec": round(n / total, 1) if total > 0 else None,
+    }
+
+
+def _timed(fn, iters: int) -> Dict[str, Any]:
+    samples = []
+    t_start = time.perf_counter()
+    for i in range(iters):
+        t = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - t)
+    return _stats(samples, time.perf_counter() - t_start)
+
+
+def _synthetic_orders(n: int, seed: int = 7) -> List[Dict[str, Any]]:
+    """Entries and exits per (bot, symbol, side); ~half the volume is closed again."""
+    rnd = random.Random(seed)
+    held: Dict[Any, Decimal] = {}
+    out = []
+    ts = T0
+    for i in range(n):
+        ts += rnd.randint(0, 2)
+        key = (rnd.choice(BOTS), rnd.choice(SYMBOLS), rnd.choice(("BUY", "SELL")))
+        have = held.get(key, Decimal("0"))
+        if have > 0 and rnd.random() < 0.5:
+            qty = min(have, Decimal(rnd.randint(1, 500)) / 100)
+            mode = "exit"
+            held[key] = have - qty
+        else:
+            qty = Decimal(rnd.randint(1, 500)) / 100
+            mode = "entry"
+            held[key] = have + qty
+        out.append({
+            "bot_id": key[0], "symbol": key[1], "mode": mode, "entry_side": key[2],
+            "qty": qty, "price": Decimal(rnd.randint(100_000, 9_000_000)) / 100, "ts": ts,
+        })
+    return out
+
+
+def _seed(ps, n: int) -> Dict[str, Any]:
+    t = time.perf_counter()
+    orders = _synthetic_orders(n)
+    for i in range(0, n, 20_000):
+        ps.bulk_load_fills(orders[i:i + 20_000], key="bench_seed_ts")
+    rows = [
+        (o["bot_id"], o["symbol"], "LONG" if o["entry_side"] == "BUY" else "SHORT",
+         "ENTRY" if o["mode"] == "entry" else "EXIT", str(o["qty"]), str(o["price"]), None, None, None, None, "bench", o["ts"])
+        for o in orders
+    ]
+    ps._submit_write(lambda conn: conn.executemany("""
+        INSERT INTO trade_events (bot_id, symbol, direction, event_type, qty, entry_price, stop_price,
+                                  lock_level_pct, exit_price, realized_pnl, reason, ts)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows).rowcount)
+    conn = ps._read_conn()
+    counts = {t: int(conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]) for t in ("lots", "exits", "trade_events")}
+    return {"sec": round(time.perf_counter() - t, 2), "rows": counts, "db_mb": round(os.path.getsize(ps.DB_PATH) / 1e6, 1)}
+
+
+def _bench_exit_vs_lots(ps, iters: int) -> Dict[str, Any]:
+    out = {}
+    for k in (1, 10, 100, 1000):
+        bot, symbol = f"BENCH_EXIT_{k}", "BTC-USDT"
+        for _ in range(k):
+            ps.record_entry(bot, symbol, "BUY", Decimal("1000"), Decimal("50000"), reason="bench")
+        # each exit takes a sliver of the first lot, so the open-lot count stays at k
+        out[str(k)] = _timed(lambda i: ps.record_exit_fifo(bot, symbol, "BUY", Decimal("0.001"), Decimal("50100"), reason="bench"), iters)
+    return out
+
+
+def _bench_positions(ps, iters: int) -> Dict[str, Any]:
+    warm = _timed(lambda i: ps.get_bot_open_positions(BOTS[i % len(BOTS)]), iters * 5)
+
+    def _cold(i):
+        ps._book_invalidate()
+        ps.get_bot_open_positions(BOTS[i % len(BOTS)])
+
+    return {"warm": warm, "cold_rebuild": _timed(_cold, max(5, iters // 50))}
+
+
+def _run_size(size: int, db_path: str, iters: int, queue) -> None:
+    os.environ["PNL_DB_PATH"] = db_path
+    import pnl_store as ps
+
+    ps.init_db()
+    res: Dict[str, Any] = {"seed": _seed(ps, size)}
+    res["entry"] = _timed(lambda i: ps.record_entry("BENCH_ENTRY", SYMBOLS[i % 10], "BUY", Decimal("0.5"), Decimal("123.45"), reason="bench"), iters)
+    res["event"] = _timed(lambda i: ps.record_trade_event("BENCH_EVT", "BTC-USDT", "LONG", "STOP_UPDATE", stop_price=Decimal("1"), reason="bench"), iters)
+
+    t = time.perf_counter()
+    for i in range(iters * 5):
+        ps.record_trade_event("BENCH_EVT", "BTC-USDT", "LONG", "STOP_UPDATE", stop_price=Decimal("1"), reason="bench", wait=False)
+    ps.flush_writes(timeout=120)
+    wall = time.perf_counter() - t
+    res["event_nowait"] = {"n": iters * 5, "sec": round(wall, 3), "ops_per_sec": round(iters * 5 / wall, 1)}
+
+    res["exit_vs_lots"] = _bench_exit_vs_lots(ps, iters)
+    res["positions"] = _bench_positions(ps, iters)
+    ps.stop_writer()
+    ps.close_all_connections()
+    queue.put(res)
+
+
+def _contender(role: str, db_path: str, seconds: float, queue) -> None:
+    os.environ["PNL_DB_PATH"] = db_path
+    import pnl_store as ps
+
+    samples: Dict[str, List[float]] = {}
+    errors = 0
+    rnd = random.Random(role)
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        bot = rnd.choice(BOTS)
+        if role == "web":
+            op = rnd.choice(("event", "summary", "positions"))
+        else:
+            op = rnd.choice(("entry", "exit"))
+        t = time.perf_counter()
+        try:
+            if op == "event":
+                ps.record_trade_event(bot, "BTC-USDT", "LONG", "STOP_UPDATE", stop_price=Decimal("1"), reason="bench")
+            elif op == "summary":
+                ps.get_bot_summary(bot)
+            elif op == "positions":
+                ps.get_bot_open_positions(bot)
+            elif op == "entry":
+                ps.record_entry(bot, "ETH-USDT", "BUY", Decimal("0.1"), Decimal("2000"), reason="bench")
+            else:
+                ps.record_exit_fifo(bot, "ETH-USDT", "BUY", Decimal("0.05"), Decimal("2010"), reason="bench")
+        except Exception:
+            errors += 1
+            continue
+        samples.setdefault(op, []).append(time.perf_counter() - t)
+    ps.stop_writer()
+    queue.put((role, {op: _stats(xs) for op, xs in samples.items()}, errors))
+
+
+def _run_contention(db_path: str, seconds: float) -> Dict[str, Any]:
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    procs = [ctx.Process(target=_contender, args=(role, db_path, seconds, queue)) for role in ("web", "worker")]
+    for p in procs:
+        p.start()
+    out = {}
+    for _ in procs:
+        role, stats, errors = queue.get()
+        out[role] = {"ops": stats, "errors": errors}
+    for p in procs:
+        p.join()
+    return out
+
+
+def _print(size: int, res: Dict[str, Any]) -> None:
+    def line(name, s):
+        if s.get("p50_ms") is not None:
+            print(f"  {name:<28} p50={s['p50_ms']:>8.3f}ms  p99={s['p99_ms']:>8.3f}ms  {s.get('ops_per_sec') or '':>10} ops/s  n={s['n']}")
+
+    print(f"\n== {size:,} rows  seed={res['seed']['sec']}s  db={res['seed']['db_mb']}MB")
+    line("record_entry", res["entry"])
+    line("record_trade_event", res["event"])
+    print(f"  {'record_trade_event nowait':<28} {res['event_nowait']['ops_per_sec']} ops/s")
+    for k, s in res["exit_vs_lots"].items():
+        line(f"record_exit_fifo lots={k}", s)
+    line("get_bot_open_positions warm", res["positions"]["warm"])
+    line("get_bot_open_positions cold", res["positions"]["cold_rebuild"])
+    for role, r in res.get("contention", {}).items():
+        for op, s in r["ops"].items():
+            line(f"contention {role}.{op}", s)
+        print(f"  {'contention ' + role + ' errors':<28} {r['errors']}")
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return ""
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="pnl_store load benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--iters", type=int, default=500, help="timed calls per latency benchmark")
+    parser.add_argument("--contention-sec", type=float, default=10.0)
+    parser.add_argument("--out", default=f"bench-pnl_store-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    parser.add_argument("--keep", action="store_true", help="keep the temp databases")
+    args = parser.parse_args()
+
+    report: Dict[str, Any] = {
+        "ts": int(time.time()),
+        "git": _git_rev(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "env": {k: os.environ[k] for k in sorted(os.environ) if k.startswith(("PNL_", "SQLITE_"))},
+        "iters": args.iters,
+        "sizes": {},
+    }
+    ctx = mp.get_context("spawn")
+    tmp = tempfile.mkdtemp(prefix="bench-pnl-")
+    try:
+        for size in args.sizes:
+            db_path = os.path.join(tmp, f"pnl-{size}.sqlite3")
+            queue = ctx.Queue()
+            p = ctx.Process(target=_run_size, args=(size, db_path, args.iters, queue))
+            p.start()
+            res = queue.get()
+            p.join()
+            if args.contention_sec > 0:
+                res["contention"] = _run_contention(db_path, args.contention_sec)
+            report["sizes"][str(size)] = res
+            _print(size, res)
+    finally:
+        if not args.keep:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nsaved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
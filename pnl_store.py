@@ -1,8 +1,15 @@
 import os
+import atexit
+import gzip
+import json
+import queue
 import sqlite3
+import threading
 import time
-from decimal import Decimal
-from typing import Dict, Tuple, Any, List, Callable, Optional, Set
+from collections import OrderedDict, deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from decimal import Decimal, ROUND_HALF_EVEN
+from typing import Dict, Tuple, Any, List, Callable, Optional, Set, Deque
 
 # ✅ 修改：使用绝对路径，避免不同运行环境找不到文件
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -13,6 +20,8 @@ print(f"[PNL] Database path set to: {DB_PATH}")
 SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
 SQLITE_WRITE_RETRY = int(os.getenv("SQLITE_WRITE_RETRY", "5"))
 SQLITE_WRITE_RETRY_SLEEP = float(os.getenv("SQLITE_WRITE_RETRY_SLEEP", "0.15"))
+# Per-connection prepared statement cache (sqlite3 `cached_statements`)
+SQLITE_CACHED_STATEMENTS = int(os.getenv("SQLITE_CACHED_STATEMENTS", "256"))
 
 
 def _now() -> int:
@@ -27,10 +36,122 @@ def _d(x) -> Decimal:
     return Decimal(str(x))
 
 
-def _connect():
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False, timeout=max(1, SQLITE_BUSY_TIMEOUT_MS // 1000))
+# ---------------------------
+# Fixed-point units
+# ---------------------------
+# lots/exits 的数量、价格存整数定点列（每个 symbol 一组 scale，见 symbol_scales 表），
+# realized pnl 统一用 PNL_SCALE，便于跨 symbol 求和。TEXT 列保留做审计。
+QTY_SCALE_DEFAULT = 8
+PX_SCALE_DEFAULT = 8
+SCALE_MAX = 12
+PNL_SCALE = 10
+
+
+def _decimals(x) -> int:
+    try:
+        x = _d(x)
+    except Exception:
+        return 0
+    if not x.is_finite():
+        return 0
+    return max(0, -x.normalize().as_tuple().exponent)
+
+
+def _to_units(x: Decimal, scale: int) -> int:
+    return int(_d(x).scaleb(scale).to_integral_value(rounding=ROUND_HALF_EVEN))
+
+
+def _trim(d: Decimal) -> Decimal:
+    """Drop trailing zeros without switching to exponent notation for integers."""
+    if d == d.to_integral_value():
+        return d.quantize(Decimal(1))
+    return d.normalize()
+
+
+def _from_units(u: Optional[int], scale: int) -> Decimal:
+    return _trim(Decimal(int(u or 0)).scaleb(-int(scale)))
+
+
+def _symbol_scales(cur: sqlite3.Cursor, symbol: str, qtys=(), pxs=()) -> Tuple[int, int]:
+    """Return (qty_scale, px_scale) for symbol, growing them to fit the given values.
+
+    Must run inside a write transaction: growing a scale rescales every stored row of
+    that symbol so existing units stay exact.
+    """
+    need_q = min(SCALE_MAX, max([_decimals(v) for v in qtys] or [0]))
+    need_p = min(SCALE_MAX, max([_decimals(v) for v in pxs] or [0]))
+
+    row = cur.execute(
+        "SELECT qty_scale, px_scale FROM symbol_scales WHERE symbol=?", (symbol,)
+    ).fetchone()
+    if row is None:
+        qs = max(QTY_SCALE_DEFAULT, need_q)
+        ps = max(PX_SCALE_DEFAULT, need_p)
+        cur.execute(
+            "INSERT INTO symbol_scales (symbol, qty_scale, px_scale, updated_ts) VALUES (?, ?, ?, ?)",
+            (symbol, qs, ps, _now()),
+        )
+        return qs, ps
+
+    qs, ps = int(row[0]), int(row[1])
+    if need_q <= qs and need_p <= ps:
+        return qs, ps
+
+    if need_q > qs:
+        k = 10 ** (need_q - qs)
+        cur.execute(
+            "UPDATE lots SET qty_units=qty_units*?, remaining_units=remaining_units*? WHERE symbol=?",
+            (k, k, symbol),
+        )
+        cur.execute("UPDATE exits SET exit_qty_units=exit_qty_units*? WHERE symbol=?", (k, symbol))
+        qs = need_q
+    if need_p > ps:
+        k = 10 ** (need_p - ps)
+        cur.execute("UPDATE lots SET entry_px_units=entry_px_units*? WHERE symbol=?", (k, symbol))
+        cur.execute(
+            "UPDATE exits SET entry_px_units=entry_px_units*?, exit_px_units=exit_px_units*? WHERE symbol=?",
+            (k, k, symbol),
+        )
+        ps = need_p
+    cur.execute(
+        "UPDATE symbol_scales SET qty_scale=?, px_scale=?, updated_ts=? WHERE symbol=?",
+        (qs, ps, _now(), symbol),
+    )
+    # every key of the symbol changed units; the next _book_sync reloads just those
+    _bump_lots_rev(cur, (None, symbol, None))
+    print(f"[PNL] rescaled {symbol}: qty_scale={qs} px_scale={ps}")
+    return qs, ps
+
+
+# ---------------------------
+# Connection pool
+# ---------------------------
+# 每个线程一条长连接：PRAGMA 只在打开时执行一次，语句缓存随连接复用。
+# Connections remember the pid/path they were opened with, so a forked gunicorn
+# worker (or a test that swaps DB_PATH) never reuses a stale handle.
+# Two kinds per thread: "rw" (writes + write-path reads) and "ro" (query_only, dashboard reads).
+SQLITE_READ_MMAP_BYTES = int(os.getenv("SQLITE_READ_MMAP_BYTES", str(256 * 1024 * 1024)))
+SQLITE_READ_CACHE_KB = int(os.getenv("SQLITE_READ_CACHE_KB", str(64 * 1024)))
+
+_POOL_LOCAL = threading.local()
+_POOL_LOCK = threading.Lock()
+# (thread ident, kind) -> (thread, conn, pid)
+_POOL_CONNS: Dict[Tuple[int, str], Tuple[threading.Thread, sqlite3.Connection, int]] = {}
+
+
+def _open_connection() -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        DB_PATH,
+        check_same_thread=False,
+        timeout=max(1, SQLITE_BUSY_TIMEOUT_MS // 1000),
+        isolation_level=None,  # explicit BEGIN/COMMIT in _write_with_retry
+        cached_statements=SQLITE_CACHED_STATEMENTS,
+    )
     conn.row_factory = sqlite3.Row
     try:
+        # only takes effect on a brand-new file (before WAL writes page 1); older files
+        # switch offline with `python pnl_store.py vacuum`
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL;")
         conn.execute("PRAGMA journal_mode=WAL;")
         conn.execute("PRAGMA synchronous=NORMAL;")
         conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS};")
@@ -39,30 +160,344 @@ def _connect():
     return conn
 
 
+def _open_read_connection() -> sqlite3.Connection:
+    """Read-only connection: query_only (can never take the write lock), big mmap + page cache."""
+    conn = _open_connection()
+    try:
+        conn.execute("PRAGMA query_only=1;")
+        conn.execute(f"PRAGMA mmap_size={SQLITE_READ_MMAP_BYTES};")
+        conn.execute(f"PRAGMA cache_size=-{SQLITE_READ_CACHE_KB};")
+    except Exception:
+        pass
+    return conn
+
+
+def _close_quietly(conn: Optional[sqlite3.Connection]) -> None:
+    if conn is None:
+        return
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+def _pooled(kind: str, opener: Callable[[], sqlite3.Connection]) -> sqlite3.Connection:
+    conn = getattr(_POOL_LOCAL, kind, None)
+    if conn is not None and getattr(_POOL_LOCAL, kind + "_owner", None) == (os.getpid(), DB_PATH):
+        return conn
+
+    conn = opener()
+    setattr(_POOL_LOCAL, kind, conn)
+    setattr(_POOL_LOCAL, kind + "_owner", (os.getpid(), DB_PATH))
+
+    me = threading.current_thread()
+    pid = os.getpid()
+    with _POOL_LOCK:
+        # Drop connections owned by threads that have exited (bounded by live threads).
+        for key, (t, c, c_pid) in list(_POOL_CONNS.items()):
+            if key == (me.ident, kind) or not t.is_alive() or c_pid != pid:
+                _POOL_CONNS.pop(key, None)
+                if c is not conn and c_pid == pid:
+                    _close_quietly(c)
+        _POOL_CONNS[(me.ident, kind)] = (me, conn, pid)
+    return conn
+
+
+def _connect() -> sqlite3.Connection:
+    """Return this thread's pooled read/write connection (opened lazily). Callers must NOT close it."""
+    return _pooled("rw", _open_connection)
+
+
+def _read_conn() -> sqlite3.Connection:
+    """Connection for pure reads: the active read_snapshot() if any, else this thread's "ro" connection."""
+    snap = getattr(_POOL_LOCAL, "snapshot", None)
+    if snap is not None:
+        return snap
+    return _pooled("ro", _open_read_connection)
+
+
+class read_snapshot:
+    """Run every pnl_store read inside one consistent read transaction on the "ro" connection.
+
+        with read_snapshot():
+            summary = get_bot_summary(bot)
+            events = list_trade_events(bot_id=bot)
+
+    Re-entrant; never takes write locks, so dashboard polling cannot stall the worker.
+    The position book and lock cache are synced on the live connection before BEGIN, so
+    they are never rolled back to the (possibly older) snapshot; sync=False is for those
+    syncs' own reads.
+    """
+
+    def __init__(self, *, sync: bool = True):
+        self._sync = sync
+
+    def __enter__(self) -> sqlite3.Connection:
+        self._outer = getattr(_POOL_LOCAL, "snapshot", None) is None
+        if self._outer:
+            if self._sync:
+                _book_sync()
+                _locks_sync()
+            conn = _pooled("ro", _open_read_connection)
+            conn.execute("BEGIN")
+            _POOL_LOCAL.snapshot = conn
+        return _POOL_LOCAL.snapshot
+
+    def __exit__(self, *exc) -> None:
+        if self._outer:
+            conn = _POOL_LOCAL.snapshot
+            _POOL_LOCAL.snapshot = None
+            _rollback_quietly(conn)
+
+
+def _discard_connection() -> None:
+    """Forget (and close) this thread's pooled rw connection; the next _connect() reopens."""
+    conn = getattr(_POOL_LOCAL, "rw", None)
+    _POOL_LOCAL.rw = None
+    _POOL_LOCAL.rw_owner = None
+    with _POOL_LOCK:
+        key = (threading.get_ident(), "rw")
+        ent = _POOL_CONNS.get(key)
+        if ent is not None and ent[1] is conn:
+            _POOL_CONNS.pop(key, None)
+    _close_quietly(conn)
+
+
+def close_all_connections() -> None:
+    """Close every pooled connection opened by this process (registered with atexit)."""
+    with _POOL_LOCK:
+        items = list(_POOL_CONNS.values())
+        _POOL_CONNS.clear()
+    pid = os.getpid()
+    for _t, c, c_pid in items:
+        # Never close handles inherited from a parent process.
+        if c_pid == pid:
+            _close_quietly(c)
+    for kind in ("rw", "ro"):
+        setattr(_POOL_LOCAL, kind, None)
+        setattr(_POOL_LOCAL, kind + "_owner", None)
+
+
+atexit.register(close_all_connections)
+
+
+def _rollback_quietly(conn: sqlite3.Connection) -> None:
+    try:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+    except Exception:
+        pass
+
+
+def _after_commit(cb: Callable[[], None]) -> None:
+    """Run cb once the current write transaction commits (dropped on rollback)."""
+    hooks = getattr(_POOL_LOCAL, "after_commit", None)
+    if hooks is None:
+        cb()
+    else:
+        hooks.append(cb)
+
+
 def _write_with_retry(fn: Callable[[sqlite3.Connection], Any]) -> Any:
+    """Run fn inside one BEGIN IMMEDIATE transaction on the pooled connection.
+
+    The write lock is taken up-front, so contention with the other process surfaces at
+    BEGIN (after busy_timeout) instead of as a lock upgrade failure halfway through fn.
+    """
     last_err = None
     for i in range(SQLITE_WRITE_RETRY):
+        conn = _connect()
         try:
-            conn = _connect()
-            try:
-                out = fn(conn)
-                conn.commit()
-                return out
-            finally:
-                conn.close()
+            _POOL_LOCAL.after_commit = []
+            conn.execute("BEGIN IMMEDIATE")
+            out = fn(conn)
+            conn.execute("COMMIT")
+            hooks, _POOL_LOCAL.after_commit = _POOL_LOCAL.after_commit, None
+            for cb in hooks:
+                try:
+                    cb()
+                except Exception as e:
+                    print(f"[PNL] after-commit hook error: {e!r}")
+            return out
         except sqlite3.OperationalError as e:
+            _POOL_LOCAL.after_commit = None
+            _rollback_quietly(conn)
             last_err = e
             msg = str(e).lower()
             if "locked" in msg or "busy" in msg:
                 time.sleep(SQLITE_WRITE_RETRY_SLEEP * (i + 1))
                 continue
+            _discard_connection()
             raise
         except Exception as e:
+            _POOL_LOCAL.after_commit = None
+            _rollback_quietly(conn)
             last_err = e
             raise
     raise RuntimeError(f"[PNL] sqlite write failed after retries: {last_err!r}")
 
 
+# ---------------------------
+# Write pipeline (single writer thread + group commit)
+# ---------------------------
+# 所有账本写入都交给每个进程唯一的 writer 线程：它一次取走队列里所有待写任务，
+# 在一个 BEGIN IMMEDIATE 事务里执行（每个任务一个 SAVEPOINT，互不影响），只提交一次。
+# wait=True 的调用方阻塞到事务提交；wait=False 立即返回（仪表盘事件等）。
+PNL_WRITER_ENABLED = str(os.getenv("PNL_WRITER_ENABLED", "1")).strip().lower() in ("1", "true", "yes", "on")
+PNL_WRITE_BATCH_MAX = int(os.getenv("PNL_WRITE_BATCH_MAX", "256"))
+PNL_WRITE_WAIT_TIMEOUT = float(os.getenv("PNL_WRITE_WAIT_TIMEOUT", "30"))
+
+_WRITER_LOCK = threading.Lock()
+_WRITER_Q: Optional["queue.Queue"] = None
+_WRITER_THREAD: Optional[threading.Thread] = None
+_WRITER_PID: Optional[int] = None
+_WRITER_STOP = object()
+
+
+def _writer_batch(jobs: List[Tuple[Callable[[sqlite3.Connection], Any], Future, str]]) -> List[Tuple[bool, Any]]:
+    def _apply(conn: sqlite3.Connection) -> List[Tuple[bool, Any]]:
+        results: List[Tuple[bool, Any]] = []
+        hooks = _POOL_LOCAL.after_commit
+        for fn, _fut, _label in jobs:
+            n_hooks = len(hooks)
+            conn.execute("SAVEPOINT pnl_job")
+            try:
+                val = fn(conn)
+                conn.execute("RELEASE SAVEPOINT pnl_job")
+                results.append((True, val))
+            except sqlite3.OperationalError as e:
+                msg = str(e).lower()
+                if "locked" in msg or "busy" in msg:
+                    raise  # retry the whole batch
+                conn.execute("ROLLBACK TO SAVEPOINT pnl_job")
+                conn.execute("RELEASE SAVEPOINT pnl_job")
+                del hooks[n_hooks:]
+                results.append((False, e))
+            except Exception as e:
+                conn.execute("ROLLBACK TO SAVEPOINT pnl_job")
+                conn.execute("RELEASE SAVEPOINT pnl_job")
+                del hooks[n_hooks:]
+                results.append((False, e))
+        return results
+
+    return _write_with_retry(_apply)
+
+
+def _writer_loop(q: "queue.Queue") -> None:
+    while True:
+        item = q.get()
+        stop = item is _WRITER_STOP
+        jobs = [] if stop else [item]
+        while len(jobs) < PNL_WRITE_BATCH_MAX:
+            try:
+                nxt = q.get_nowait()
+            except queue.Empty:
+                break
+            if nxt is _WRITER_STOP:
+                stop = True
+                continue
+            jobs.append(nxt)
+
+        jobs = _claim_jobs(jobs)
+        if jobs:
+            try:
+                results = _writer_batch(jobs)
+            except Exception as e:
+                results = [(False, e)] * len(jobs)
+                print(f"[PNL] writer batch failed ({len(jobs)} jobs): {e!r}")
+
+            for (fn, fut, label), (ok, val) in zip(jobs, results):
+                if ok:
+                    fut.set_result(val)
+                else:
+                    fut.set_exception(val)
+                    if label:
+                        print(f"[PNL] async write {label} failed: {val!r}")
+
+        if stop:
+            return
+
+
+def _claim_jobs(jobs: List[Tuple[Callable[[sqlite3.Connection], Any], Future, str]]):
+    """Mark jobs running; drops the ones their caller already cancelled after a timeout."""
+    return [j for j in jobs if j[1].set_running_or_notify_cancel()]
+
+
+def _ensure_writer() -> "queue.Queue":
+    global _WRITER_Q, _WRITER_THREAD, _WRITER_PID
+    pid = os.getpid()
+    with _WRITER_LOCK:
+        if _WRITER_Q is None or _WRITER_PID != pid or _WRITER_THREAD is None or not _WRITER_THREAD.is_alive():
+            _WRITER_Q = queue.Queue()
+            _WRITER_PID = pid
+            _WRITER_THREAD = threading.Thread(target=_writer_loop, args=(_WRITER_Q,), name="pnl-writer", daemon=True)
+            _WRITER_THREAD.start()
+        return _WRITER_Q
+
+
+def _submit_write(fn: Callable[[sqlite3.Connection], Any], *, wait: bool = True, label: str = "") -> Any:
+    """Run a write on the writer thread.
+
+    wait=True blocks until the batch holding fn has committed and returns fn's result
+    (or re-raises its exception). wait=False returns immediately; failures are logged.
+
+    If the writer has not picked fn up within PNL_WRITE_WAIT_TIMEOUT, the job is cancelled
+    and TimeoutError is raised: fn never runs, so the caller may safely retry. If it was
+    already picked up, this keeps waiting for the real outcome instead (a started batch
+    finishes or fails within the busy retries), so a write is never left in doubt.
+    """
+    if not PNL_WRITER_ENABLED:
+        return _write_with_retry(fn)
+
+    if threading.current_thread() is _WRITER_THREAD:
+        # Called from inside a job: join the open batch transaction.
+        conn = _connect()
+        if conn.in_transaction:
+            return fn(conn)
+        return _write_with_retry(fn)
+
+    fut: Future = Future()
+    _ensure_writer().put((fn, fut, "" if wait else (label or getattr(fn, "__qualname__", "job"))))
+    if not wait:
+        return None
+    try:
+        return fut.result(timeout=PNL_WRITE_WAIT_TIMEOUT)
+    except FutureTimeout:
+        if fut.cancel():
+            raise TimeoutError(
+                f"[PNL] write not started within {PNL_WRITE_WAIT_TIMEOUT}s; cancelled, nothing written"
+            ) from None
+        return fut.result()
+
+
+def flush_writes(timeout: float = 5.0) -> bool:
+    """Block until every write queued so far has been committed."""
+    if not PNL_WRITER_ENABLED or _WRITER_Q is None or _WRITER_PID != os.getpid():
+        return True
+    fut: Future = Future()
+    _ensure_writer().put((lambda conn: True, fut, ""))
+    try:
+        fut.result(timeout=timeout)
+        return True
+    except Exception:
+        return False
+
+
+def stop_writer(timeout: float = 5.0) -> None:
+    """Drain the queue and stop the writer thread (registered with atexit)."""
+    global _WRITER_THREAD
+    t = _WRITER_THREAD
+    if t is None or _WRITER_PID != os.getpid() or not t.is_alive():
+        return
+    _WRITER_Q.put(_WRITER_STOP)
+    t.join(timeout)
+    _WRITER_THREAD = None
+
+
+# Runs before close_all_connections (atexit is LIFO).
+atexit.register(stop_writer)
+
+
 def init_db():
     """
     ✅ 迁移策略：
@@ -168,6 +603,14 @@ def init_db():
         )
         """)
 
+        # store_meta: 版本计数（lots_rev 等），内存缓存靠它发现另一个进程的写入
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS store_meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+        """)
+
         cur.execute("CREATE INDEX IF NOT EXISTS idx_lots_bot_symbol ON lots(bot_id, symbol, direction, ts)")
         cur.execute("CREATE INDEX IF NOT EXISTS idx_exits_bot_ts ON exits(bot_id, ts)")
         cur.execute("CREATE INDEX IF NOT EXISTS idx_ps_bot_ts ON processed_signals(bot_id, ts)")
@@ -176,13 +619,238 @@ def init_db():
         cur.execute("CREATE INDEX IF NOT EXISTS idx_te_bot_ts ON trade_events(bot_id, ts)")
         cur.execute("CREATE INDEX IF NOT EXISTS idx_te_symbol_ts ON trade_events(symbol, ts)")
 
-        conn.commit()
-        conn.close()
+        _run_migrations(conn)
+        _book_rebuild()
+        _locks_rebuild()
         print("[PNL] Database initialized/migrated successfully.")
     except Exception as e:
         print(f"[PNL] CRITICAL ERROR initializing database at {DB_PATH}: {e}")
 
 
+# ---------------------------
+# Versioned migrations (PRAGMA user_version)
+# ---------------------------
+MIGRATION_BATCH = int(os.getenv("PNL_MIGRATION_BATCH", "2000"))
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> Set[str]:
+    return {r[1] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+
+
+def _add_columns(conn: sqlite3.Connection, table: str, cols: List[Tuple[str, str]]) -> None:
+    have = _table_columns(conn, table)
+    for name, decl in cols:
+        if name in have:
+            continue
+        try:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+        except sqlite3.OperationalError as e:
+            # the other process may have migrated concurrently
+            if "duplicate column" not in str(e).lower():
+                raise
+
+
+def _units_or_zero(x, scale: int) -> int:
+    try:
+        return _to_units(_d(x), scale)
+    except Exception:
+        return 0
+
+
+def _backfill_batches(conn: sqlite3.Connection, select_sql: str, convert) -> int:
+    """Convert rows in MIGRATION_BATCH-sized write transactions so the other process is never blocked long."""
+    total = 0
+    while True:
+        def _w(c: sqlite3.Connection) -> int:
+            cur = c.cursor()
+            rows = cur.execute(select_sql, (MIGRATION_BATCH,)).fetchall()
+            if rows:
+                convert(cur, rows)
+            return len(rows)
+
+        n = _write_with_retry(_w)
+        total += n
+        if n < MIGRATION_BATCH:
+            return total
+
+
+def _migrate_v1_fixed_point(conn: sqlite3.Connection) -> None:
+    """Integer fixed-point columns + is_open flag for lots/exits (TEXT columns stay for audit)."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS symbol_scales (
+        symbol TEXT PRIMARY KEY,
+        qty_scale INTEGER NOT NULL,
+        px_scale INTEGER NOT NULL,
+        updated_ts INTEGER NOT NULL
+    )
+    """)
+    _add_columns(conn, "lots", [
+        ("qty_units", "INTEGER"),
+        ("entry_px_units", "INTEGER"),
+        ("remaining_units", "INTEGER"),
+        ("is_open", "INTEGER NOT NULL DEFAULT 0"),
+    ])
+    _add_columns(conn, "exits", [
+        ("exit_qty_units", "INTEGER"),
+        ("entry_px_units", "INTEGER"),
+        ("exit_px_units", "INTEGER"),
+        ("pnl_units", "INTEGER"),
+    ])
+
+    def _convert_lots(cur: sqlite3.Cursor, rows) -> None:
+        by_symbol: Dict[str, list] = {}
+        for r in rows:
+            by_symbol.setdefault(r["symbol"], []).append(r)
+        params = []
+        for symbol, rs in by_symbol.items():
+            qs, ps = _symbol_scales(
+                cur, symbol,
+                [x for r in rs for x in (r["qty"], r["remaining_qty"]) if x],
+                [r["entry_price"] for r in rs if r["entry_price"]],
+            )
+            for r in rs:
+                rem_u = _units_or_zero(r["remaining_qty"], qs)
+                params.append((
+                    _units_or_zero(r["qty"], qs), _units_or_zero(r["entry_price"], ps),
+                    rem_u, 1 if rem_u > 0 else 0, r["id"],
+                ))
+        cur.executemany(
+            "UPDATE lots SET qty_units=?, entry_px_units=?, remaining_units=?, is_open=? WHERE id=?",
+            params,
+        )
+
+    def _convert_exits(cur: sqlite3.Cursor, rows) -> None:
+        by_symbol: Dict[str, list] = {}
+        for r in rows:
+            by_symbol.setdefault(r["symbol"], []).append(r)
+        params = []
+        for symbol, rs in by_symbol.items():
+            qs, ps = _symbol_scales(
+                cur, symbol,
+                [r["exit_qty"] for r in rs if r["exit_qty"]],
+                [x for r in rs for x in (r["entry_price"], r["exit_price"]) if x],
+            )
+            for r in rs:
+                params.append((
+                    _units_or_zero(r["exit_qty"], qs), _units_or_zero(r["entry_price"], ps),
+                    _units_or_zero(r["exit_price"], ps), _units_or_zero(r["realized_pnl"], PNL_SCALE),
+                    r["id"],
+                ))
+        cur.executemany(
+            "UPDATE exits SET exit_qty_units=?, entry_px_units=?, exit_px_units=?, pnl_units=? WHERE id=?",
+            params,
+        )
+
+    n_lots = _backfill_batches(
+        conn,
+        "SELECT id, symbol, qty, entry_price, remaining_qty FROM lots WHERE remaining_units IS NULL ORDER BY id LIMIT ?",
+        _convert_lots,
+    )
+    n_exits = _backfill_batches(
+        conn,
+        "SELECT id, symbol, exit_qty, entry_price, exit_price, realized_pnl FROM exits WHERE pnl_units IS NULL ORDER BY id LIMIT ?",
+        _convert_exits,
+    )
+
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_lots_open ON lots(bot_id, symbol, direction, ts, id) WHERE is_open=1")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_lots_open_symbol ON lots(symbol, direction) WHERE is_open=1")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_exits_bot_ts_pnl ON exits(bot_id, ts, pnl_units)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_exits_ts_pnl ON exits(ts, pnl_units)")
+    print(f"[PNL] migration v1: backfilled lots={n_lots} exits={n_exits}")
+
+
+def _migrate_v2_signal_ttl(conn: sqlite3.Connection) -> None:
+    """ts index so TTL pruning of processed_signals doesn't scan the table."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ps_ts ON processed_signals(ts)")
+
+
+def _migrate_v3_pnl_hourly(conn: sqlite3.Connection) -> None:
+    """Hourly realized-pnl rollups per (bot, symbol), backfilled from exits."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS pnl_hourly (
+        bot_id TEXT NOT NULL,
+        symbol TEXT NOT NULL,
+        hour_ts INTEGER NOT NULL,          -- ts // 3600 * 3600
+        pnl_units INTEGER NOT NULL DEFAULT 0,
+        trades INTEGER NOT NULL DEFAULT 0,
+        wins INTEGER NOT NULL DEFAULT 0,
+        losses INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (bot_id, symbol, hour_ts)
+    ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_pnl_hourly_hour ON pnl_hourly(hour_ts)")
+    n = _write_with_retry(_rebuild_pnl_hourly)
+    print(f"[PNL] migration v3: pnl_hourly buckets={n}")
+
+
+def _migrate_v4_retention(conn: sqlite3.Connection) -> None:
+    """ts index for trade_events retention (auto_vacuum is switched offline: pnl_store.py vacuum)."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_te_ts ON trade_events(ts)")
+
+
+def _migrate_v5_pending_orders(conn: sqlite3.Connection) -> None:
+    """Outbox of placed orders whose fills are not recorded yet (see pending orders below)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS pending_orders (
+            bot_id TEXT NOT NULL,
+            signal_id TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            mode TEXT NOT NULL,
+            side TEXT NOT NULL,
+            direction TEXT NOT NULL,
+            order_id TEXT,
+            client_order_id TEXT,
+            status TEXT NOT NULL DEFAULT 'PENDING',
+            tries INTEGER NOT NULL DEFAULT 0,
+            next_retry_ts INTEGER NOT NULL,
+            last_try_ts INTEGER,
+            note TEXT,
+            ts INTEGER NOT NULL,
+            updated_ts INTEGER NOT NULL,
+            PRIMARY KEY (bot_id, signal_id)
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_pending_due
+        ON pending_orders(next_retry_ts) WHERE status='PENDING'
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_pending_ts ON pending_orders(ts)")
+
+
+def _migrate_v6_lots_changes(conn: sqlite3.Connection) -> None:
+    """Changed-keys log behind lots_rev, so the position book can reload single keys."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS lots_changes (
+            rev INTEGER NOT NULL,
+            bot_id TEXT,
+            symbol TEXT,
+            direction TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_lots_changes_rev ON lots_changes(rev)")
+
+
+_MIGRATIONS: List[Tuple[int, Callable[[sqlite3.Connection], None]]] = [
+    (1, _migrate_v1_fixed_point),
+    (2, _migrate_v2_signal_ttl),
+    (3, _migrate_v3_pnl_hourly),
+    (4, _migrate_v4_retention),
+    (5, _migrate_v5_pending_orders),
+    (6, _migrate_v6_lots_changes),
+]
+
+
+def _run_migrations(conn: sqlite3.Connection) -> None:
+    current = int(conn.execute("PRAGMA user_version").fetchone()[0])
+    for version, fn in _MIGRATIONS:
+        if version <= current:
+            continue
+        fn(conn)
+        conn.execute(f"PRAGMA user_version={int(version)}")
+        current = version
+        print(f"[PNL] schema migrated to v{version}")
+
+
 def _side_to_direction(entry_side: str) -> str:
     s = str(entry_side).upper()
     return "LONG" if s == "BUY" else "SHORT"
@@ -191,24 +859,71 @@ def _side_to_direction(entry_side: str) -> str:
 # ---------------------------
 # Idempotency helpers
 # ---------------------------
+# 最近认领过的 signal 放在有界 LRU 里：TradingView 重放直接在内存拒绝，不碰磁盘。
+SIGNAL_LRU_MAX = int(os.getenv("SIGNAL_LRU_MAX", "4096"))
+PROCESSED_SIGNAL_TTL_SEC = int(os.getenv("PROCESSED_SIGNAL_TTL_SEC", str(7 * 86400)))
+
+_SIGNAL_LRU: "OrderedDict[Tuple[str, str], None]" = OrderedDict()
+_SIGNAL_LRU_LOCK = threading.Lock()
+
+
+def _signal_seen(key: Tuple[str, str]) -> bool:
+    with _SIGNAL_LRU_LOCK:
+        if key in _SIGNAL_LRU:
+            _SIGNAL_LRU.move_to_end(key)
+            return True
+        return False
+
+
+def _signal_remember(key: Tuple[str, str]) -> None:
+    with _SIGNAL_LRU_LOCK:
+        _SIGNAL_LRU[key] = None
+        _SIGNAL_LRU.move_to_end(key)
+        while len(_SIGNAL_LRU) > SIGNAL_LRU_MAX:
+            _SIGNAL_LRU.popitem(last=False)
+
+
+def claim_signal(bot_id: str, signal_id: str, kind: str = "") -> bool:
+    """Atomically claim a signal id. True = this caller won and should process it.
+
+    INSERT OR IGNORE on the (bot_id, signal_id) primary key makes the claim race-free
+    across processes; a bounded LRU rejects recent replays without touching disk.
+    """
+    if not bot_id or not signal_id:
+        return True
+    key = (str(bot_id), str(signal_id))
+    if _signal_seen(key):
+        return False
+
+    def _w(conn: sqlite3.Connection):
+        cur = conn.execute("""
+            INSERT OR IGNORE INTO processed_signals (bot_id, signal_id, kind, ts)
+            VALUES (?, ?, ?, ?)
+        """, (key[0], key[1], str(kind or ""), _now()))
+        return cur.rowcount == 1
+
+    won = bool(_submit_write(_w))
+    _signal_remember(key)
+    return won
+
+
 def is_signal_processed(bot_id: str, signal_id: str) -> bool:
     if not bot_id or not signal_id:
         return False
-    conn = _connect()
-    try:
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT 1 FROM processed_signals
-            WHERE bot_id=? AND signal_id=?
-            LIMIT 1
-        """, (str(bot_id), str(signal_id)))
-        row = cur.fetchone()
-        return row is not None
-    finally:
-        conn.close()
+    if _signal_seen((str(bot_id), str(signal_id))):
+        return True
+    conn = _read_conn()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT 1 FROM processed_signals
+        WHERE bot_id=? AND signal_id=?
+        LIMIT 1
+    """, (str(bot_id), str(signal_id)))
+    row = cur.fetchone()
+    return row is not None
 
 
-def mark_signal_processed(bot_id: str, signal_id: str, kind: str = ""):
+def mark_signal_processed(bot_id: str, signal_id: str, kind: str = "", *, wait: bool = True):
     if not bot_id or not signal_id:
         return
 
@@ -220,7 +935,372 @@ def mark_signal_processed(bot_id: str, signal_id: str, kind: str = ""):
         """, (str(bot_id), str(signal_id), str(kind or ""), _now()))
         return True
 
-    _write_with_retry(_w)
+    _submit_write(_w, wait=wait, label="mark_signal_processed")
+    _signal_remember((str(bot_id), str(signal_id)))
+
+
+# ---------------------------
+# Hourly PnL rollups
+# ---------------------------
+# pnl_hourly 在 exits 的同一个写事务里增量维护；窗口查询 = 整小时桶求和 + 边界小时扫 exits。
+ROLLUP_BUCKET_SEC = 3600
+
+
+def _rollup_add(cur: sqlite3.Cursor, bot_id: str, symbol: str, ts: int, pnl_units_list: List[int]) -> None:
+    """Fold exit rows (same bot/symbol/ts) into their hourly bucket."""
+    if not pnl_units_list:
+        return
+    cur.execute("""
+        INSERT INTO pnl_hourly (bot_id, symbol, hour_ts, pnl_units, trades, wins, losses)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(bot_id, symbol, hour_ts) DO UPDATE SET
+            pnl_units = pnl_units + excluded.pnl_units,
+            trades = trades + excluded.trades,
+            wins = wins + excluded.wins,
+            losses = losses + excluded.losses
+    """, (
+        bot_id, symbol, int(ts) // ROLLUP_BUCKET_SEC * ROLLUP_BUCKET_SEC,
+        sum(pnl_units_list), len(pnl_units_list),
+        sum(1 for u in pnl_units_list if u > 0), sum(1 for u in pnl_units_list if u < 0),
+    ))
+
+
+def _rebuild_pnl_hourly(conn: sqlite3.Connection) -> int:
+    conn.execute("DELETE FROM pnl_hourly")
+    conn.execute(f"""
+        INSERT INTO pnl_hourly (bot_id, symbol, hour_ts, pnl_units, trades, wins, losses)
+        SELECT bot_id, symbol, (ts / {ROLLUP_BUCKET_SEC}) * {ROLLUP_BUCKET_SEC},
+               COALESCE(SUM(pnl_units), 0), COUNT(*),
+               SUM(CASE WHEN pnl_units > 0 THEN 1 ELSE 0 END),
+               SUM(CASE WHEN pnl_units < 0 THEN 1 ELSE 0 END)
+        FROM exits
+        GROUP BY bot_id, symbol, (ts / {ROLLUP_BUCKET_SEC})
+    """)
+    return int(conn.execute("SELECT COUNT(*) FROM pnl_hourly").fetchone()[0])
+
+
+def rebuild_pnl_hourly() -> int:
+    """Recompute pnl_hourly from exits (backfill for existing databases). Returns bucket count."""
+    return int(_submit_write(_rebuild_pnl_hourly))
+
+
+def _rollup_window(cur: sqlite3.Cursor, since_ts: Optional[int], bot_id: Optional[str] = None) -> Dict[str, int]:
+    """Exact sums since since_ts (None = all time): full buckets + a scan of the partial boundary hour."""
+    bot_sql = " AND bot_id=?" if bot_id else ""
+    bot_args: Tuple[Any, ...] = (bot_id,) if bot_id else ()
+
+    first_full = 0
+    if since_ts is not None:
+        first_full = -(-int(since_ts) // ROLLUP_BUCKET_SEC) * ROLLUP_BUCKET_SEC
+
+    r = cur.execute(f"""
+        SELECT COALESCE(SUM(pnl_units), 0), COALESCE(SUM(trades), 0),
+               COALESCE(SUM(wins), 0), COALESCE(SUM(losses), 0)
+        FROM pnl_hourly
+        WHERE hour_ts >= ?{bot_sql}
+    """, (first_full,) + bot_args).fetchone()
+    out = {"pnl_units": int(r[0]), "trades": int(r[1]), "wins": int(r[2]), "losses": int(r[3])}
+
+    if since_ts is not None and int(since_ts) < first_full:
+        r = cur.execute(f"""
+            SELECT COALESCE(SUM(pnl_units), 0), COUNT(*),
+                   COALESCE(SUM(CASE WHEN pnl_units > 0 THEN 1 ELSE 0 END), 0),
+                   COALESCE(SUM(CASE WHEN pnl_units < 0 THEN 1 ELSE 0 END), 0)
+            FROM exits
+            WHERE ts >= ? AND ts < ?{bot_sql}
+        """, (int(since_ts), first_full) + bot_args).fetchone()
+        out["pnl_units"] += int(r[0])
+        out["trades"] += int(r[1])
+        out["wins"] += int(r[2])
+        out["losses"] += int(r[3])
+    return out
+
+
+# ---------------------------
+# Revision counters + change detection
+# ---------------------------
+def _bump_rev(cur: sqlite3.Cursor, key: str) -> Tuple[int, int]:
+    """Increment store_meta[key] inside the current write transaction; return (old, new)."""
+    row = cur.execute("SELECT value FROM store_meta WHERE key=?", (key,)).fetchone()
+    old = int(row[0]) if row else 0
+    cur.execute(
+        "INSERT INTO store_meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+        (key, old + 1),
+    )
+    return old, old + 1
+
+
+# lots_changes rows kept behind lots_rev; a book further behind than this rebuilds fully
+LOTS_CHANGES_KEEP = int(os.getenv("PNL_LOTS_CHANGES_KEEP", "4096"))
+
+LotsScope = Tuple[Optional[str], Optional[str], Optional[str]]
+
+
+def _bump_lots_rev(cur: sqlite3.Cursor, *scopes: LotsScope) -> Tuple[int, int]:
+    """Bump lots_rev and log which (bot_id, symbol, direction) keys the write touched.
+
+    (None, symbol, None) means every key of symbol; no scope at all means everything.
+    """
+    old, new = _bump_rev(cur, "lots_rev")
+    cur.executemany(
+        "INSERT INTO lots_changes (rev, bot_id, symbol, direction) VALUES (?, ?, ?, ?)",
+        [(new, b, s, d) for b, s, d in (scopes or ((None, None, None),))],
+    )
+    if new % 256 == 0:
+        cur.execute("DELETE FROM lots_changes WHERE rev <= ?", (new - LOTS_CHANGES_KEEP,))
+    return old, new
+
+
+_WATCH_LOCK = threading.Lock()
+_WATCH_CONN: Optional[sqlite3.Connection] = None
+_WATCH_OWNER: Optional[Tuple[int, str]] = None
+
+
+def _watch_conn() -> sqlite3.Connection:
+    """Dedicated connection for change detection; caller must hold _WATCH_LOCK."""
+    global _WATCH_CONN, _WATCH_OWNER
+    owner = (os.getpid(), DB_PATH)
+    if _WATCH_CONN is None or _WATCH_OWNER != owner:
+        _WATCH_CONN = _open_connection()
+        _WATCH_OWNER = owner
+    return _WATCH_CONN
+
+
+def _data_version() -> int:
+    """PRAGMA data_version changes whenever any *other* connection commits (no disk read)."""
+    with _WATCH_LOCK:
+        return int(_watch_conn().execute("PRAGMA data_version").fetchone()[0])
+
+
+def _read_rev(key: str) -> int:
+    row = _read_conn().execute("SELECT value FROM store_meta WHERE key=?", (key,)).fetchone()
+    return int(row[0]) if row else 0
+
+
+# ---------------------------
+# In-memory position book
+# ---------------------------
+# bot_id -> {(symbol, direction): _BookEntry}，读路径只做字典查找。
+# 每个 entry 还带一个按 FIFO 顺序排列的 open lots deque，record_exit_fifo 直接在内存里撮合。
+# 本进程的写入在提交后直接更新；另一个进程的写入通过 data_version + lots_rev 发现后，
+# 按 lots_changes 里记录的 key 只重载变动的 (bot_id, symbol, direction)，记录不全时才整表重建。
+class _BookEntry:
+    __slots__ = ("qty_u", "notional_u", "qs", "ps", "lots")
+
+    def __init__(self, qs: int, ps: int):
+        self.qty_u = 0
+        self.notional_u = 0      # sum(remaining_units * entry_px_units)
+        self.qs = qs
+        self.ps = ps
+        self.lots: Deque[List[Any]] = deque()  # [lot_id, remaining_units, entry_px_units, entry_price_text]
+
+    def push(self, lot_id: int, rem_u: int, px_u: int, entry_price: str) -> None:
+        self.lots.append([lot_id, rem_u, px_u, entry_price])
+        self.qty_u += rem_u
+        self.notional_u += rem_u * px_u
+
+
+_BOOK_LOCK = threading.RLock()
+_BOOK: Dict[str, Dict[Tuple[str, str], _BookEntry]] = {}
+# 反向索引：SYMBOL -> {(bot_id, symbol, direction): 同一个 _BookEntry}
+_BOOK_BY_SYMBOL: Dict[str, Dict[Tuple[str, str, str], _BookEntry]] = {}
+_BOOK_REV: Optional[int] = None          # lots_rev the book reflects (None = stale)
+_BOOK_DV: Optional[int] = None           # data_version seen at the last check
+_BOOK_PID: Optional[int] = None
+
+
+def _book_invalidate() -> None:
+    global _BOOK_REV
+    with _BOOK_LOCK:
+        _BOOK_REV = None
+
+
+_BOOK_LOTS_SQL = """
+    SELECT l.id, l.bot_id, l.symbol, l.direction, l.remaining_units, l.entry_px_units,
+           l.entry_price, s.qty_scale, s.px_scale
+    FROM lots l
+    JOIN symbol_scales s ON s.symbol = l.symbol
+    WHERE l.is_open=1{where}
+    ORDER BY l.ts ASC, l.id ASC
+"""
+
+
+def _book_load(rows, book: Dict[str, Dict[Tuple[str, str], _BookEntry]],
+               by_symbol: Dict[str, Dict[Tuple[str, str, str], _BookEntry]]) -> None:
+    for r in rows:
+        per_bot = book.setdefault(r["bot_id"], {})
+        e = per_bot.get((r["symbol"], r["direction"]))
+        if e is None:
+            e = per_bot[(r["symbol"], r["direction"])] = _BookEntry(int(r["qty_scale"]), int(r["px_scale"]))
+            by_symbol.setdefault(str(r["symbol"]).upper(), {})[(r["bot_id"], r["symbol"], r["direction"])] = e
+        e.push(int(r["id"]), int(r["remaining_units"] or 0), int(r["entry_px_units"] or 0), r["entry_price"])
+
+
+def _book_rebuild() -> None:
+    global _BOOK, _BOOK_BY_SYMBOL, _BOOK_REV, _BOOK_PID
+    with _BOOK_LOCK:
+        with read_snapshot(sync=False) as conn:
+            rev = _read_rev("lots_rev")
+            rows = conn.execute(_BOOK_LOTS_SQL.format(where="")).fetchall()
+
+        book: Dict[str, Dict[Tuple[str, str], _BookEntry]] = {}
+        by_symbol: Dict[str, Dict[Tuple[str, str, str], _BookEntry]] = {}
+        _book_load(rows, book, by_symbol)
+
+        _BOOK = book
+        _BOOK_BY_SYMBOL = by_symbol
+        _BOOK_REV = rev
+        _BOOK_PID = os.getpid()
+
+
+def _book_catch_up() -> bool:
+    """Bring the book from _BOOK_REV to the current lots_rev by reloading only the keys
+    logged in lots_changes. False (book untouched) when a full rebuild is needed instead:
+    the log has been pruned past _BOOK_REV, misses a revision, or has a whole-book entry.
+    """
+    global _BOOK_REV
+    with read_snapshot(sync=False) as conn:
+        rev = _read_rev("lots_rev")
+        if _BOOK_REV is None:
+            return False
+        if rev <= _BOOK_REV:
+            return True  # never move the book back to an older revision
+        if rev - _BOOK_REV > LOTS_CHANGES_KEEP:
+            return False
+        changes = conn.execute(
+            "SELECT rev, bot_id, symbol, direction FROM lots_changes WHERE rev > ? AND rev <= ?",
+            (_BOOK_REV, rev),
+        ).fetchall()
+        if len({int(c[0]) for c in changes}) != rev - _BOOK_REV or any(c[2] is None for c in changes):
+            return False
+
+        symbols = {c[2] for c in changes if c[1] is None}
+        keys = {(c[1], c[2], c[3]) for c in changes if c[1] is not None and c[2] not in symbols}
+        rows = []
+        for sym in symbols:
+            rows += conn.execute(_BOOK_LOTS_SQL.format(where=" AND l.symbol=?"), (sym,)).fetchall()
+        for bot_id, sym, direction in keys:
+            rows += conn.execute(
+                _BOOK_LOTS_SQL.format(where=" AND l.bot_id=? AND l.symbol=? AND l.direction=?"),
+                (bot_id, sym, direction),
+            ).fetchall()
+
+    for sym in symbols:
+        for bot_id, s, direction in list(_BOOK_BY_SYMBOL.get(str(sym).upper(), {})):
+            if s == sym:
+                _book_entry_drop(bot_id, s, direction)
+    for bot_id, sym, direction in keys:
+        _book_entry_drop(bot_id, sym, direction)
+    # rows of each key come back in FIFO order, and keys never span two queries
+    _book_load(rows, _BOOK, _BOOK_BY_SYMBOL)
+    _BOOK_REV = rev
+    return True
+
+
+def _book_sync() -> None:
+    """Make sure the book reflects every committed write (ours and the other process's).
+
+    Inside a read_snapshot() the book was synced when the snapshot began; it is only
+    (re)built here if it has no valid state at all, and then _BOOK_DV is left alone so
+    the next sync outside the snapshot catches up to the live revision.
+    """
+    global _BOOK_DV
+    with _BOOK_LOCK:
+        valid = _BOOK_REV is not None and _BOOK_PID == os.getpid()
+        if getattr(_POOL_LOCAL, "snapshot", None) is not None:
+            if not valid:
+                _book_rebuild()
+                _BOOK_DV = None
+            return
+        dv = _data_version()
+        if valid and dv == _BOOK_DV:
+            return
+        if not valid or not _book_catch_up():
+            _book_rebuild()
+        _BOOK_DV = dv
+
+
+def _book_entry_drop(bot_id: str, symbol: str, direction: str) -> None:
+    per_bot = _BOOK.get(bot_id, {})
+    per_bot.pop((symbol, direction), None)
+    if not per_bot:
+        _BOOK.pop(bot_id, None)
+    holders = _BOOK_BY_SYMBOL.get(str(symbol).upper())
+    if holders is not None:
+        holders.pop((bot_id, symbol, direction), None)
+        if not holders:
+            _BOOK_BY_SYMBOL.pop(str(symbol).upper(), None)
+
+
+def _book_add_lot(rev: Tuple[int, int], bot_id: str, symbol: str, direction: str, qs: int, ps: int,
+                  lot_id: int, q_u: int, px_u: int, entry_price: str) -> None:
+    """After-commit: append a new lot. If the book missed an intermediate revision it is left
+    behind; the next _book_sync reloads the logged keys, this one included."""
+    global _BOOK_REV
+    old, new = rev
+    with _BOOK_LOCK:
+        if _BOOK_REV != old or _BOOK_PID != os.getpid():
+            return
+        per_bot = _BOOK.setdefault(bot_id, {})
+        e = per_bot.get((symbol, direction))
+        if e is None:
+            e = per_bot[(symbol, direction)] = _BookEntry(qs, ps)
+            _BOOK_BY_SYMBOL.setdefault(str(symbol).upper(), {})[(bot_id, symbol, direction)] = e
+        e.push(lot_id, q_u, px_u, entry_price)
+        _BOOK_REV = new
+
+
+def _book_consume(rev: Tuple[int, int], bot_id: str, symbol: str, direction: str,
+                  consumed: List[Tuple[int, int]]) -> None:
+    """After-commit: take (lot_id, take_units) off the FIFO head in order (left behind, like
+    _book_add_lot, when a revision was missed)."""
+    global _BOOK_REV
+    old, new = rev
+    with _BOOK_LOCK:
+        if _BOOK_REV != old or _BOOK_PID != os.getpid():
+            return
+        e = _BOOK.get(bot_id, {}).get((symbol, direction))
+        for lot_id, take_u in consumed:
+            if e is None or not e.lots or e.lots[0][0] != lot_id:
+                _BOOK_REV = None
+                return
+            head = e.lots[0]
+            head[1] -= take_u
+            e.qty_u -= take_u
+            e.notional_u -= take_u * head[2]
+            if head[1] <= 0:
+                e.lots.popleft()
+        if e is not None and e.qty_u <= 0:
+            _book_entry_drop(bot_id, symbol, direction)
+        _BOOK_REV = new
+
+
+def _book_open_lots(cur: sqlite3.Cursor, bot_id: str, symbol: str, direction: str) -> List[List[Any]]:
+    """FIFO-ordered open lots for one key, inside the current write transaction.
+
+    Served from the book when it is exactly at the transaction's lots_rev; otherwise
+    (other process wrote, or an earlier job in this batch is not applied yet) read from SQLite.
+    """
+    row = cur.execute("SELECT value FROM store_meta WHERE key='lots_rev'").fetchone()
+    db_rev = int(row[0]) if row else 0
+    with _BOOK_LOCK:
+        if _BOOK_REV is not None and _BOOK_REV == db_rev and _BOOK_PID == os.getpid():
+            e = _BOOK.get(bot_id, {}).get((symbol, direction))
+            return [list(l) for l in e.lots] if e is not None else []
+
+    rows = cur.execute("""
+        SELECT id, remaining_units, entry_px_units, entry_price FROM lots
+        WHERE bot_id=? AND symbol=? AND direction=? AND is_open=1
+        ORDER BY ts ASC, id ASC
+    """, (bot_id, symbol, direction)).fetchall()
+    return [[int(r[0]), int(r[1] or 0), int(r[2] or 0), r[3]] for r in rows]
+
+
+def _book_position(e: _BookEntry) -> Dict[str, Any]:
+    return {
+        "qty": _from_units(e.qty_u, e.qs),
+        "weighted_entry": _trim((Decimal(e.notional_u) / Decimal(e.qty_u)).scaleb(-e.ps)),
+    }
 
 
 # ---------------------------
@@ -233,7 +1313,15 @@ def record_entry(
     qty: Decimal,
     price: Decimal,
     reason: str = "strategy_entry",
-):
+    *,
+    pending_signal_id: str = "",
+) -> bool:
+    """Insert one open lot.
+
+    With pending_signal_id, the matching pending_orders row is resolved in the same
+    transaction; if it was already resolved (by the other process) nothing is written
+    and False is returned.
+    """
     direction = _side_to_direction(side)
     q = _d(qty)
     p = _d(price)
@@ -243,17 +1331,32 @@ def record_entry(
 
     def _w(conn: sqlite3.Connection):
         cur = conn.cursor()
+        if pending_signal_id and not _pending_resolve(cur, bot_id, pending_signal_id, f"entry qty={q} px={p}"):
+            return False
+        qs, ps = _symbol_scales(cur, symbol, (q,), (p,))
+        q_u = _to_units(q, qs)
         cur.execute("""
-            INSERT INTO lots (bot_id, symbol, direction, entry_side, qty, entry_price, remaining_qty, reason, ts)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO lots (
+                bot_id, symbol, direction, entry_side, qty, entry_price, remaining_qty, reason, ts,
+                qty_units, entry_px_units, remaining_units, is_open
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
         """, (
             bot_id, symbol, direction, str(side).upper(),
-            str(q), str(p), str(q), reason, _now()
+            str(q), str(p), str(q), reason, _now(),
+            q_u, _to_units(p, ps), q_u,
         ))
+        lot_id = int(cur.lastrowid)
+        rev = _bump_lots_rev(cur, (bot_id, symbol, direction))
+        px_u = _to_units(p, ps)
+        _after_commit(lambda: _book_add_lot(rev, bot_id, symbol, direction, qs, ps, lot_id, q_u, px_u, str(p)))
         return True
 
-    _write_with_retry(_w)
+    if not _submit_write(_w):
+        print(f"[PNL] record_entry skipped (pending already resolved): bot={bot_id} sig={pending_signal_id}")
+        return False
     print(f"[PNL] record_entry SUCCESS: bot={bot_id} {direction} {symbol} qty={q} @ {p}")
+    return True
 
 
 def record_exit_fifo(
@@ -263,7 +1366,11 @@ def record_exit_fifo(
     exit_qty: Decimal,
     exit_price: Decimal,
     reason: str = "strategy_exit",
+    *,
+    pending_signal_id: str = "",
 ):
+    """FIFO-match exit_qty against open lots. pending_signal_id works as in record_entry;
+    an already-resolved pending returns {"duplicate": True, ...} without writing."""
     direction = _side_to_direction(entry_side)
     exit_side = "SELL" if direction == "LONG" else "BUY"
 
@@ -275,113 +1382,256 @@ def record_exit_fifo(
 
     def _w(conn: sqlite3.Connection):
         cur = conn.cursor()
-        cur.execute("""
-            SELECT * FROM lots
-            WHERE bot_id=? AND symbol=? AND direction=? AND CAST(remaining_qty AS REAL) > 0
-            ORDER BY ts ASC, id ASC
-        """, (bot_id, symbol, direction))
-
-        rows = cur.fetchall()
-        if not rows:
+        if pending_signal_id and not _pending_resolve(cur, bot_id, pending_signal_id, f"exit qty={need} px={px_exit}"):
+            return {"remaining_need": str(need), "realized_sum": "0", "matches": [], "duplicate": True}
+        qs, ps = _symbol_scales(cur, symbol, (need,), (px_exit,))
+        lots = _book_open_lots(cur, bot_id, symbol, direction)
+        if not lots:
             print(f"[PNL] WARNING: record_exit_fifo found NO open lots for {bot_id} {symbol}")
-            return {"remaining_need": str(need)}
+            return {"remaining_need": str(need), "realized_sum": "0", "matches": []}
 
+        # 一次遍历完成 FIFO 撮合，精确计算每个 lot 的 realized pnl
         ts = _now()
-        remaining_need = need
+        need_u = _to_units(need, qs)
+        exit_px_u = _to_units(px_exit, ps)
         realized_sum = Decimal("0")
+        consumed: List[Tuple[int, int]] = []
+        lot_updates: List[Tuple[Any, ...]] = []
+        exit_rows: List[Tuple[Any, ...]] = []
+        matches: List[Dict[str, str]] = []
 
-
-        for r in rows:
-            if remaining_need <= 0:
+        for lot_id, rem_u, px_u, entry_price_text in lots:
+            if need_u <= 0:
                 break
-
-            lot_id = r["id"]
-            rem = _d(r["remaining_qty"])
-            entry_price = _d(r["entry_price"])
-
-            if rem <= 0:
+            if rem_u <= 0:
                 continue
 
-            take = rem if rem <= remaining_need else remaining_need
+            take_u = rem_u if rem_u <= need_u else need_u
+            take = _from_units(take_u, qs)
+            entry_price = _d(entry_price_text)
 
-            # realized pnl
             if direction == "LONG":
                 pnl = (px_exit - entry_price) * take
-
             else:
                 pnl = (entry_price - px_exit) * take
+            realized_sum += pnl
 
-
-            new_rem = rem - take
-
-            # update lot remaining
-            cur.execute("""
-                UPDATE lots SET remaining_qty=?
-                WHERE id=?
-            """, (str(new_rem), lot_id))
-
-            # write exit record
-            cur.execute("""
-                INSERT INTO exits (
-                    bot_id, symbol, direction, entry_side, exit_side,
-                    exit_qty, entry_price, exit_price, realized_pnl, reason, ts
-                )
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
+            new_rem_u = rem_u - take_u
+            lot_updates.append((str(_from_units(new_rem_u, qs)), new_rem_u, 1 if new_rem_u > 0 else 0, lot_id))
+            exit_rows.append((
                 bot_id, symbol, direction, str(entry_side).upper(), exit_side,
-                str(take), str(entry_price), str(px_exit), str(pnl), reason, ts
+                str(take), str(entry_price), str(px_exit), str(pnl), reason, ts,
+                take_u, px_u, exit_px_u, _to_units(pnl, PNL_SCALE),
             ))
+            matches.append({
+                "lot_id": str(lot_id),
+                "qty": str(take),
+                "entry_price": str(entry_price),
+                "exit_price": str(px_exit),
+                "realized_pnl": str(pnl),
+            })
+            consumed.append((lot_id, take_u))
+            need_u -= take_u
+
+        cur.executemany("""
+            UPDATE lots SET remaining_qty=?, remaining_units=?, is_open=?
+            WHERE id=?
+        """, lot_updates)
+        cur.executemany("""
+            INSERT INTO exits (
+                bot_id, symbol, direction, entry_side, exit_side,
+                exit_qty, entry_price, exit_price, realized_pnl, reason, ts,
+                exit_qty_units, entry_px_units, exit_px_units, pnl_units
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, exit_rows)
+        _rollup_add(cur, bot_id, symbol, ts, [row[-1] for row in exit_rows])
 
-            remaining_need -= take
-
-        return {"remaining_need": str(remaining_need), "realized_sum": str(realized_sum)}
+        rev = _bump_lots_rev(cur, (bot_id, symbol, direction))
+        _after_commit(lambda: _book_consume(rev, bot_id, symbol, direction, consumed))
+        return {
+            "remaining_need": str(_from_units(need_u, qs)),
+            "realized_sum": str(realized_sum),
+            "matches": matches,
+        }
 
-    out = _write_with_retry(_w)
+    out = _submit_write(_w)
+    if out.get("duplicate"):
+        print(f"[PNL] record_exit_fifo skipped (pending already resolved): bot={bot_id} sig={pending_signal_id}")
+        return out
     print(f"[PNL] record_exit_fifo DONE for {bot_id} {symbol}. Remaining need={out.get('remaining_need')} realized_sum={out.get('realized_sum')}")
     return out
 
 
-def get_bot_open_positions(bot_id: str) -> Dict[Tuple[str, str], Dict[str, Any]]:
-    """
-    返回：
-    {
-      (symbol, direction): {
-          "qty": Decimal,
-          "weighted_entry": Decimal
-      }
-    }
-    """
-    conn = _connect()
-    try:
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT symbol, direction,
-                   SUM(CAST(remaining_qty AS REAL)) AS qty_sum,
-                   SUM(CAST(remaining_qty AS REAL) * CAST(entry_price AS REAL)) AS notional_sum
-            FROM lots
-            WHERE bot_id=? AND CAST(remaining_qty AS REAL) > 0
-            GROUP BY symbol, direction
-        """, (bot_id,))
+# ---------------------------
+# Bulk ledger load (fill history backfill)
+# ---------------------------
+BACKFILL_CHECKPOINT_KEY = "backfill_fill_ts"
 
-        out: Dict[Tuple[str, str], Dict[str, Any]] = {}
-        rows = cur.fetchall()
 
-        for r in rows:
-            symbol = r["symbol"]
-            direction = r["direction"]
-            qty_sum = _d(r["qty_sum"] or "0")
-            notional_sum = _d(r["notional_sum"] or "0")
+def get_backfill_checkpoint(key: str = BACKFILL_CHECKPOINT_KEY) -> int:
+    """ts of the last fill committed by bulk_load_fills (0 = never ran)."""
+    return _read_rev(key)
 
-            weighted = (notional_sum / qty_sum) if qty_sum > 0 else Decimal("0")
 
-            out[(symbol, direction)] = {
-                "qty": qty_sum,
-                "weighted_entry": weighted
-            }
+def ledger_rows_after(ts: int, *, live_only: bool = False) -> int:
+    """Count lots + exits with ts > ts; live_only skips rows bulk_load_fills wrote (reason backfill_*)."""
+    where = "ts > ?" + (" AND COALESCE(reason, '') NOT LIKE 'backfill\\_%' ESCAPE '\\'" if live_only else "")
+    conn = _read_conn()
+    return sum(int(conn.execute(f"SELECT COUNT(*) FROM {t} WHERE {where}", (int(ts),)).fetchone()[0])
+               for t in ("lots", "exits"))
+
+
+def reset_ledger(key: str = BACKFILL_CHECKPOINT_KEY) -> None:
+    """Delete every lot, exit and hourly bucket and clear the backfill checkpoint."""
+    def _w(conn: sqlite3.Connection):
+        cur = conn.cursor()
+        for table in ("lots", "exits", "pnl_hourly"):
+            cur.execute(f"DELETE FROM {table}")
+        cur.execute("DELETE FROM store_meta WHERE key=?", (key,))
+        _bump_lots_rev(cur)
+        _after_commit(_book_invalidate)
+
+    _submit_write(_w)
+
+
+def bulk_load_fills(fills: List[Dict[str, Any]], *, key: str = BACKFILL_CHECKPOINT_KEY) -> Dict[str, int]:
+    """Replay attributed fills into lots/exits in one transaction.
+
+    fills: [{"bot_id", "symbol", "mode" ("entry"/"exit"), "entry_side", "qty", "price", "ts"}]
+    sorted by ts. Exits are FIFO-matched exactly like record_exit_fifo, against the open
+    lots already stored plus the lots loaded earlier in this call. Lot ids are assigned
+    here so lots, lot updates and exits each go through a single executemany. The
+    checkpoint (store_meta[key]) advances to the last ts in the same transaction.
+    Returns counts of entry fills, exit fills, exit rows (one per matched lot) and exit
+    fills that found no (or not enough) open lots.
+    """
+    if not fills:
+        return {"entries": 0, "exits": 0, "exit_rows": 0, "unmatched": 0}
+
+    def _w(conn: sqlite3.Connection):
+        cur = conn.cursor()
+        scales: Dict[str, Tuple[int, int]] = {}
+        for sym in sorted({f["symbol"] for f in fills}):
+            rows = [f for f in fills if f["symbol"] == sym]
+            scales[sym] = _symbol_scales(cur, sym, [_d(f["qty"]) for f in rows], [_d(f["price"]) for f in rows])
+
+        # (bot, symbol, direction) -> deque of [lot_id, rem_u, px_u, entry_price_text]
+        books: Dict[Tuple[str, str, str], Deque[List[Any]]] = {}
+        marks = ",".join("?" for _ in scales)
+        for r in cur.execute(f"""
+            SELECT id, bot_id, symbol, direction, remaining_units, entry_px_units, entry_price
+            FROM lots WHERE is_open=1 AND symbol IN ({marks})
+            ORDER BY ts, id
+        """, list(scales)):
+            books.setdefault((r[1], r[2], r[3]), deque()).append([int(r[0]), int(r[4]), int(r[5]), r[6]])
+
+        next_id = int(cur.execute("SELECT COALESCE(MAX(id), 0) FROM lots").fetchone()[0]) + 1
+        new_lots: Dict[int, List[Any]] = {}
+        lot_updates: Dict[int, Tuple[int, int]] = {}
+        exit_rows: List[Tuple[Any, ...]] = []
+        buckets: Dict[Tuple[str, str, int], List[int]] = {}
+        entries = exits = unmatched = 0
+
+        for f in fills:
+            bot_id, symbol, ts = str(f["bot_id"]), str(f["symbol"]), int(f["ts"])
+            entry_side = str(f["entry_side"]).upper()
+            direction = _side_to_direction(entry_side)
+            q, p = _d(f["qty"]), _d(f["price"])
+            if q <= 0 or p <= 0:
+                continue
+            qs, ps = scales[symbol]
+            lots = books.setdefault((bot_id, symbol, direction), deque())
+
+            if f["mode"] == "entry":
+                q_u, px_u = _to_units(q, qs), _to_units(p, ps)
+                new_lots[next_id] = [
+                    next_id, bot_id, symbol, direction, entry_side, str(q), str(p), str(q),
+                    str(f.get("reason") or "backfill_entry"), ts, q_u, px_u, q_u, 1,
+                ]
+                lots.append([next_id, q_u, px_u, str(p)])
+                next_id += 1
+                entries += 1
+                continue
+
+            exits += 1
+            need_u = _to_units(q, qs)
+            exit_px_u = _to_units(p, ps)
+            exit_side = "SELL" if direction == "LONG" else "BUY"
+            while need_u > 0 and lots:
+                lot = lots[0]
+                take_u = lot[1] if lot[1] <= need_u else need_u
+                take = _from_units(take_u, qs)
+                entry_price = _d(lot[3])
+                pnl = (p - entry_price) * take if direction == "LONG" else (entry_price - p) * take
+                pnl_u = _to_units(pnl, PNL_SCALE)
+                exit_rows.append((
+                    bot_id, symbol, direction, entry_side, exit_side,
+                    str(take), str(entry_price), str(p), str(pnl), str(f.get("reason") or "backfill_exit"), ts,
+                    take_u, lot[2], exit_px_u, pnl_u,
+                ))
+                buckets.setdefault((bot_id, symbol, ts // ROLLUP_BUCKET_SEC * ROLLUP_BUCKET_SEC), []).append(pnl_u)
+                lot[1] -= take_u
+                need_u -= take_u
+                if lot[0] in new_lots:
+                    row = new_lots[lot[0]]
+                    row[7], row[12], row[13] = str(_from_units(lot[1], qs)), lot[1], 1 if lot[1] > 0 else 0
+                else:
+                    lot_updates[lot[0]] = (lot[1], qs)
+                if lot[1] <= 0:
+                    lots.popleft()
+            if need_u > 0:
+                unmatched += 1
+
+        cur.executemany("""
+            INSERT INTO lots (
+                id, bot_id, symbol, direction, entry_side, qty, entry_price, remaining_qty, reason, ts,
+                qty_units, entry_px_units, remaining_units, is_open
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, list(new_lots.values()))
+        cur.executemany("""
+            UPDATE lots SET remaining_qty=?, remaining_units=?, is_open=?
+            WHERE id=?
+        """, [
+            (str(_from_units(rem_u, qs)), rem_u, 1 if rem_u > 0 else 0, lot_id)
+            for lot_id, (rem_u, qs) in lot_updates.items()
+        ])
+        cur.executemany("""
+            INSERT INTO exits (
+                bot_id, symbol, direction, entry_side, exit_side,
+                exit_qty, entry_price, exit_price, realized_pnl, reason, ts,
+                exit_qty_units, entry_px_units, exit_px_units, pnl_units
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, exit_rows)
+        for (bot_id, symbol, hour_ts), units in buckets.items():
+            _rollup_add(cur, bot_id, symbol, hour_ts, units)
+
+        cur.execute(
+            "INSERT INTO store_meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+            (key, max(int(f["ts"]) for f in fills)),
+        )
+        _bump_lots_rev(cur)
+        _after_commit(_book_invalidate)
+        return {"entries": entries, "exits": exits, "exit_rows": len(exit_rows), "unmatched": unmatched}
+
+    return _submit_write(_w)
 
-        return out
-    finally:
-        conn.close()
+
+def get_bot_open_positions(bot_id: str) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """
+    返回：
+    {
+      (symbol, direction): {
+          "qty": Decimal,
+          "weighted_entry": Decimal
+      }
+    }
+    """
+    _book_sync()
+    with _BOOK_LOCK:
+        return {key: _book_position(a) for key, a in _BOOK.get(bot_id, {}).items()}
 
 
 def get_symbol_open_directions(symbol: str) -> Set[str]:
@@ -390,31 +1640,49 @@ def get_symbol_open_directions(symbol: str) -> Set[str]:
     if not symbol:
         return set()
 
-    conn = _connect()
-    try:
-        cur = conn.cursor()
-        rows = cur.execute(
-            """
-            SELECT DISTINCT direction
-            FROM lots
-            WHERE symbol=? AND CAST(remaining_qty AS REAL) > 0
-            """,
-            (symbol,),
-        ).fetchall()
+    _book_sync()
+    with _BOOK_LOCK:
+        return {d for (_bot, _sym, d) in _BOOK_BY_SYMBOL.get(symbol, {}) if d in ("LONG", "SHORT")}
 
-        dirs: Set[str] = set()
-        for (direction,) in rows:
-            d = str(direction or "").upper().strip()
-            if d in ("LONG", "SHORT"):
-                dirs.add(d)
-        return dirs
-    finally:
-        conn.close()
+
+def get_all_open_positions(
+    symbol: Optional[str] = None,
+    bots: Optional[Any] = None,
+) -> Dict[Tuple[str, str, str], Dict[str, Any]]:
+    """Every open (bot_id, symbol, direction) aggregate in one snapshot.
+
+    Optional filters: symbol (case-insensitive) and bots (iterable of bot ids).
+    Values have the same shape as get_bot_open_positions().
+    """
+    bot_set = set(bots) if bots is not None else None
+    _book_sync()
+    with _BOOK_LOCK:
+        if symbol:
+            items = list(_BOOK_BY_SYMBOL.get(str(symbol).upper().strip(), {}).items())
+        else:
+            items = [
+                ((bot_id, sym, direction), a)
+                for bot_id, per_bot in _BOOK.items()
+                for (sym, direction), a in per_bot.items()
+            ]
+        return {
+            key: _book_position(a)
+            for key, a in items
+            if bot_set is None or key[0] in bot_set
+        }
+
+
+def get_symbol_holders(symbol: str) -> List[Dict[str, Any]]:
+    """Bots holding an open position in symbol: [{"bot_id", "direction", "qty", "weighted_entry"}]."""
+    out: List[Dict[str, Any]] = []
+    for (bot_id, _sym, direction), v in sorted(get_all_open_positions(symbol=symbol).items()):
+        out.append({"bot_id": bot_id, "direction": direction, "qty": v["qty"], "weighted_entry": v["weighted_entry"]})
+    return out
 
 
 def list_bots_with_activity() -> List[str]:
 
-    conn = _connect()
+    conn = _read_conn()
     cur = conn.cursor()
 
     cur.execute("""
@@ -424,74 +1692,103 @@ def list_bots_with_activity() -> List[str]:
     """)
 
     bots = sorted([r[0] for r in cur.fetchall() if r[0]])
-    conn.close()
     return bots
 
 
 def get_bot_summary(bot_id: str) -> Dict[str, Any]:
-    conn = _connect()
-    cur = conn.cursor()
-
     now = _now()
     day_ago = now - 24 * 3600
     week_ago = now - 7 * 24 * 3600
 
-    def _sum_since(ts_from: int) -> Decimal:
-        cur.execute("""
-            SELECT SUM(CAST(realized_pnl AS REAL)) AS s
-            FROM exits
-            WHERE bot_id=? AND ts>=?
-        """, (bot_id, ts_from))
-        v = cur.fetchone()["s"]
-        return _d(v or "0")
-
-    cur.execute("""
-        SELECT SUM(CAST(realized_pnl AS REAL)) AS s, COUNT(*) AS c
-        FROM exits WHERE bot_id=?
-    """, (bot_id,))
-    row = cur.fetchone()
-    total = _d(row["s"] or "0")
-    count = int(row["c"] or 0)
+    with read_snapshot() as conn:
+        cur = conn.cursor()
+        day = _rollup_window(cur, day_ago, bot_id)
+        week = _rollup_window(cur, week_ago, bot_id)
+        total = _rollup_window(cur, None, bot_id)
 
     out = {
         "bot_id": bot_id,
-        "realized_day": str(_sum_since(day_ago)),
-        "realized_week": str(_sum_since(week_ago)),
-        "realized_total": str(total),
-        "trades_count": count,
+        "realized_day": str(_from_units(day["pnl_units"], PNL_SCALE)),
+        "realized_week": str(_from_units(week["pnl_units"], PNL_SCALE)),
+        "realized_total": str(_from_units(total["pnl_units"], PNL_SCALE)),
+        "trades_count": total["trades"],
     }
 
-    conn.close()
     return out
 
 
 # ---------------------------
 # Lock level persistence（保留兼容）
 # ---------------------------
+# 锁位读多写少：全部放在进程内字典里，读只查字典。
+# 本进程的 set/clear 在提交后直接更新字典；另一个进程的修改通过 data_version + locks_rev 发现后整表重载。
+_LOCKS_LOCK = threading.RLock()
+_LOCKS: Dict[Tuple[str, str, str], Decimal] = {}
+_LOCKS_REV: Optional[int] = None
+_LOCKS_DV: Optional[int] = None
+_LOCKS_PID: Optional[int] = None
+
+
+def _lock_key(bot_id: str, symbol: str, direction: str) -> Tuple[str, str, str]:
+    return str(bot_id).upper().strip(), str(symbol).upper().strip(), str(direction).upper().strip()
+
+
+def _locks_rebuild() -> None:
+    global _LOCKS, _LOCKS_REV, _LOCKS_PID
+    with _LOCKS_LOCK:
+        with read_snapshot(sync=False) as conn:
+            rev = _read_rev("locks_rev")
+            rows = conn.execute("SELECT bot_id, symbol, direction, lock_level_pct FROM lock_levels").fetchall()
+        locks: Dict[Tuple[str, str, str], Decimal] = {}
+        for r in rows:
+            try:
+                locks[_lock_key(r[0], r[1], r[2])] = _d(r[3])
+            except Exception:
+                continue
+        _LOCKS, _LOCKS_REV, _LOCKS_PID = locks, rev, os.getpid()
+
+
+def _locks_sync() -> None:
+    """Same contract as _book_sync: inside a read_snapshot() only an invalid cache is rebuilt."""
+    global _LOCKS_DV
+    with _LOCKS_LOCK:
+        valid = _LOCKS_REV is not None and _LOCKS_PID == os.getpid()
+        if getattr(_POOL_LOCAL, "snapshot", None) is not None:
+            if not valid:
+                _locks_rebuild()
+                _LOCKS_DV = None
+            return
+        dv = _data_version()
+        if valid and dv == _LOCKS_DV:
+            return
+        if not valid or _read_rev("locks_rev") > _LOCKS_REV:
+            _locks_rebuild()
+        _LOCKS_DV = dv
+
+
+def _locks_apply(rev: Tuple[int, int], key: Tuple[str, str, str], lvl: Optional[Decimal]) -> None:
+    """After-commit: apply our own set/clear. A skipped revision marks the cache stale."""
+    global _LOCKS_REV
+    old, new = rev
+    with _LOCKS_LOCK:
+        if _LOCKS_REV != old or _LOCKS_PID != os.getpid():
+            _LOCKS_REV = None
+            return
+        if lvl is None:
+            _LOCKS.pop(key, None)
+        else:
+            _LOCKS[key] = lvl
+        _LOCKS_REV = new
+
+
 def get_lock_level_pct(bot_id: str, symbol: str, direction: str) -> Decimal:
-    bot_id = str(bot_id).upper().strip()
-    symbol = str(symbol).upper().strip()
-    direction = str(direction).upper().strip()
-    conn = _connect()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT lock_level_pct FROM lock_levels
-        WHERE bot_id=? AND symbol=? AND direction=?
-    """, (bot_id, symbol, direction.upper()))
-    row = cur.fetchone()
-    conn.close()
-    if not row:
-        return Decimal("0")
-    try:
-        return _d(row["lock_level_pct"])
-    except Exception:
-        return Decimal("0")
+    _locks_sync()
+    with _LOCKS_LOCK:
+        return _LOCKS.get(_lock_key(bot_id, symbol, direction), Decimal("0"))
 
 
-def set_lock_level_pct(bot_id: str, symbol: str, direction: str, lock_level_pct: Decimal):
-    bot_id = str(bot_id).upper().strip()
-    symbol = str(symbol).upper().strip()
-    direction = str(direction).upper().strip()
+def set_lock_level_pct(bot_id: str, symbol: str, direction: str, lock_level_pct: Decimal, *, wait: bool = True):
+    key = _lock_key(bot_id, symbol, direction)
     lvl = _d(lock_level_pct)
 
     def _w(conn: sqlite3.Connection):
@@ -501,25 +1798,28 @@ def set_lock_level_pct(bot_id: str, symbol: str, direction: str, lock_level_pct:
             VALUES (?, ?, ?, ?, ?)
             ON CONFLICT(bot_id, symbol, direction)
             DO UPDATE SET lock_level_pct=excluded.lock_level_pct, updated_ts=excluded.updated_ts
-        """, (bot_id, symbol, direction.upper(), str(lvl), _now()))
+        """, key + (str(lvl), _now()))
+        rev = _bump_rev(cur, "locks_rev")
+        _after_commit(lambda: _locks_apply(rev, key, lvl))
         return True
 
-    _write_with_retry(_w)
+    _submit_write(_w, wait=wait, label="set_lock_level_pct")
 
 
-def clear_lock_level_pct(bot_id: str, symbol: str, direction: str):
-    bot_id = str(bot_id).upper().strip()
-    symbol = str(symbol).upper().strip()
-    direction = str(direction).upper().strip()
+def clear_lock_level_pct(bot_id: str, symbol: str, direction: str, *, wait: bool = True):
+    key = _lock_key(bot_id, symbol, direction)
+
     def _w(conn: sqlite3.Connection):
         cur = conn.cursor()
         cur.execute("""
             DELETE FROM lock_levels
             WHERE bot_id=? AND symbol=? AND direction=?
-        """, (bot_id, symbol, direction.upper()))
+        """, key)
+        rev = _bump_rev(cur, "locks_rev")
+        _after_commit(lambda: _locks_apply(rev, key, None))
         return True
 
-    _write_with_retry(_w)
+    _submit_write(_w, wait=wait, label="clear_lock_level_pct")
 
 
 # ---------------------------
@@ -569,24 +1869,21 @@ def set_protective_orders(
         ))
         return True
 
-    _write_with_retry(_w)
+    _submit_write(_w)
 
 
 def get_protective_orders(bot_id: str, symbol: str, direction: str) -> Dict[str, Any]:
-    conn = _connect()
-    try:
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT * FROM protective_orders
-            WHERE bot_id=? AND symbol=? AND direction=?
-            LIMIT 1
-        """, (bot_id, symbol, direction.upper()))
-        row = cur.fetchone()
-        if not row:
-            return {}
-        return dict(row)
-    finally:
-        conn.close()
+    conn = _read_conn()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT * FROM protective_orders
+        WHERE bot_id=? AND symbol=? AND direction=?
+        LIMIT 1
+    """, (bot_id, symbol, direction.upper()))
+    row = cur.fetchone()
+    if not row:
+        return {}
+    return dict(row)
 
 
 def clear_protective_orders(bot_id: str, symbol: str, direction: str):
@@ -598,7 +1895,7 @@ def clear_protective_orders(bot_id: str, symbol: str, direction: str):
         """, (bot_id, symbol, direction.upper()))
         return True
 
-    _write_with_retry(_w)
+    _submit_write(_w)
 
 
 def find_protective_owner_by_order_id(order_id: str) -> Dict[str, Any]:
@@ -607,24 +1904,21 @@ def find_protective_owner_by_order_id(order_id: str) -> Dict[str, Any]:
     """
     if not order_id:
         return {}
-    conn = _connect()
-    try:
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT * FROM protective_orders
-            WHERE (sl_order_id=? OR tp_order_id=?)
-              AND is_active=1
-            LIMIT 1
-        """, (str(order_id), str(order_id)))
-        row = cur.fetchone()
-        if not row:
-            return {}
-        d = dict(row)
-        kind = "SL" if d.get("sl_order_id") == str(order_id) else "TP"
-        d["kind"] = kind
-        return d
-    finally:
-        conn.close()
+    conn = _read_conn()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT * FROM protective_orders
+        WHERE (sl_order_id=? OR tp_order_id=?)
+          AND is_active=1
+        LIMIT 1
+    """, (str(order_id), str(order_id)))
+    row = cur.fetchone()
+    if not row:
+        return {}
+    d = dict(row)
+    kind = "SL" if d.get("sl_order_id") == str(order_id) else "TP"
+    d["kind"] = kind
+    return d
 
 
 # Backward-compatible alias (older app.py expects this name)
@@ -632,10 +1926,52 @@ def get_protective_owner_by_order_id(order_id: str) -> Dict[str, Any]:
     return find_protective_owner_by_order_id(order_id)
 
 
-def list_recent_trades(bot_id: Optional[str] = None, limit: int = 200) -> list:
+Cursor = Tuple[int, int]
+
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """Page cursor "<ts>:<id>" for a row of exits / trade_events."""
+    return f"{int(row['ts'])}:{int(row['id'])}"
+
+
+def parse_cursor(value: Any) -> Optional[Cursor]:
+    """(ts, id) from encode_cursor()'s text; None for empty. Raises ValueError if malformed."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, tuple):
+        ts, rid = value
+        return int(ts), int(rid)
+    ts, sep, rid = str(value).strip().partition(":")
+    if not sep:
+        raise ValueError(f"bad cursor {value!r}, expected <ts>:<id>")
+    return int(ts), int(rid)
+
+
+def _keyset_clause(before: Optional[Cursor], after: Optional[Cursor]) -> Tuple[str, List[Any], str]:
+    """Keyset predicate on (ts, id) relative to a cursor; returns (sql, args, order).
+
+    The cursor carries the position itself, so paging keeps working after the cursor row
+    has been archived away.
+    """
+    if before is not None:
+        return " AND (ts, id) < (?, ?)", [int(before[0]), int(before[1])], "DESC"
+    if after is not None:
+        return " AND (ts, id) > (?, ?)", [int(after[0]), int(after[1])], "ASC"
+    return "", [], "DESC"
+
+
+def list_recent_trades(
+    bot_id: Optional[str] = None,
+    limit: int = 200,
+    *,
+    before_id: Optional[Any] = None,
+    after_id: Optional[Any] = None,
+) -> list:
     """
     Recent realized trades (from exits table), newest first.
     Used by /dashboard and /api/trades.
+    Page back with before_id=encode_cursor(<last row>), forward with
+    after_id=encode_cursor(<first row>).
     """
     try:
         limit_i = int(limit)
@@ -645,45 +1981,43 @@ def list_recent_trades(bot_id: Optional[str] = None, limit: int = 200) -> list:
     except Exception:
         limit_i = 200
 
-    conn = _connect()
-    try:
-        cur = conn.cursor()
-        if bot_id:
-            cur.execute("""
-                SELECT ts, bot_id, symbol, direction, entry_side, exit_qty, entry_price, exit_price,
-                       realized_pnl, reason
-                FROM exits
-                WHERE bot_id=?
-                ORDER BY ts DESC
-                LIMIT ?
-            """, (str(bot_id), limit_i))
-        else:
-            cur.execute("""
-                SELECT ts, bot_id, symbol, direction, entry_side, exit_qty, entry_price, exit_price,
-                       realized_pnl, reason
-                FROM exits
-                ORDER BY ts DESC
-                LIMIT ?
-            """, (limit_i,))
-        rows = cur.fetchall()
-        out = []
-        for r in rows:
-            d = dict(r)
-            out.append({
-                "ts": int(d.get("ts") or 0),
-                "bot_id": d.get("bot_id"),
-                "symbol": d.get("symbol"),
-                "direction": d.get("direction"),
-                "entry_side": d.get("entry_side"),
-                "exit_qty": str(d.get("exit_qty") or ""),
-                "entry_price": str(d.get("entry_price") or ""),
-                "exit_price": str(d.get("exit_price") or ""),
-                "realized_pnl": str(d.get("realized_pnl") or "0"),
-                "reason": d.get("reason") or "",
-            })
-        return out
-    finally:
-        conn.close()
+    where = "1=1"
+    args: List[Any] = []
+    if bot_id:
+        where += " AND bot_id=?"
+        args.append(str(bot_id))
+    ks_sql, ks_args, order = _keyset_clause(parse_cursor(before_id), parse_cursor(after_id))
+
+    conn = _read_conn()
+    cur = conn.cursor()
+    cur.execute(f"""
+        SELECT id, ts, bot_id, symbol, direction, entry_side, exit_qty, entry_price, exit_price,
+               realized_pnl, reason
+        FROM exits
+        WHERE {where}{ks_sql}
+        ORDER BY ts {order}, id {order}
+        LIMIT ?
+    """, args + ks_args + [limit_i])
+    rows = cur.fetchall()
+    if order == "ASC":
+        rows.reverse()
+    out = []
+    for r in rows:
+        d = dict(r)
+        out.append({
+            "id": int(d.get("id") or 0),
+            "ts": int(d.get("ts") or 0),
+            "bot_id": d.get("bot_id"),
+            "symbol": d.get("symbol"),
+            "direction": d.get("direction"),
+            "entry_side": d.get("entry_side"),
+            "exit_qty": str(d.get("exit_qty") or ""),
+            "entry_price": str(d.get("entry_price") or ""),
+            "exit_price": str(d.get("exit_price") or ""),
+            "realized_pnl": str(d.get("realized_pnl") or "0"),
+            "reason": d.get("reason") or "",
+        })
+    return out
 
 # -----------------------------------------------------------------------------
 # Compatibility helpers (older app.py / worker imports)
@@ -699,172 +2033,136 @@ def upsert_protective_orders(*args, **kwargs):
     return None
 
 
-def list_pending_orders(*args, **kwargs):
-    """Backward-compatible shim.
+# -----------------------------------------------------------------------------
+# Pending orders (outbox for fills that were not recorded inline)
+# -----------------------------------------------------------------------------
+# 下单前先写一行 pending；web 进程拿到成交后在记账的同一事务里把它置为 DONE。
+# 没拿到成交的行由 worker 按 next_retry_ts 指数退避重试，直到 DONE 或超过次数置 FAILED。
+PENDING_GRACE_SEC = int(float(os.getenv("PENDING_GRACE_SEC", "45")))
+PENDING_BACKOFF_BASE_SEC = int(float(os.getenv("PENDING_BACKOFF_BASE_SEC", "2")))
+PENDING_BACKOFF_MAX_SEC = int(float(os.getenv("PENDING_BACKOFF_MAX_SEC", "300")))
+PENDING_MAX_TRIES = int(os.getenv("PENDING_MAX_TRIES", "12"))
 
-    Pending-order reconciliation is optional. If you don't use a pending-orders table,
-    returning an empty list is safe.
-    """
-    return []
 
+def add_pending_order(
+    bot_id: str,
+    signal_id: str,
+    symbol: str,
+    mode: str,
+    side: str,
+    direction: str,
+    client_order_id: str,
+    order_id: str = "",
+    grace_sec: Optional[int] = None,
+) -> bool:
+    """Record an order about to be placed. side is the entry side for both modes.
+
+    The first retry is due after grace_sec (default PENDING_GRACE_SEC), which should cover
+    the inline fill wait so the reconciler does not race the request that placed the order.
+    An existing row is only reset if it is still PENDING with the same mode; otherwise
+    nothing is written and False is returned (a resolved row or another order's row is
+    never overwritten).
+    """
+    now = _now()
+    due = now + int(PENDING_GRACE_SEC if grace_sec is None else grace_sec)
 
-def touch_pending_try(*args, **kwargs):
-    return None
+    def _w(conn: sqlite3.Connection) -> bool:
+        cur = conn.execute("""
+            INSERT INTO pending_orders (
+                bot_id, signal_id, symbol, mode, side, direction, order_id, client_order_id,
+                status, tries, next_retry_ts, last_try_ts, note, ts, updated_ts
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'PENDING', 0, ?, NULL, '', ?, ?)
+            ON CONFLICT(bot_id, signal_id) DO UPDATE SET
+                symbol=excluded.symbol, mode=excluded.mode, side=excluded.side,
+                direction=excluded.direction, order_id=excluded.order_id,
+                client_order_id=excluded.client_order_id, status='PENDING', tries=0,
+                next_retry_ts=excluded.next_retry_ts, last_try_ts=NULL, note='',
+                ts=excluded.ts, updated_ts=excluded.updated_ts
+            WHERE pending_orders.status='PENDING' AND pending_orders.mode=excluded.mode
+        """, (
+            str(bot_id), str(signal_id), str(symbol).upper(), str(mode).lower(),
+            str(side).upper(), str(direction).upper(), str(order_id or ""), str(client_order_id or ""),
+            due, now, now,
+        ))
+        return cur.rowcount > 0
 
+    return bool(_submit_write(_w, label="add_pending_order"))
 
-def mark_pending_done(*args, **kwargs):
-    return None
 
+def set_pending_order_id(bot_id: str, signal_id: str, order_id: str, *, wait: bool = True) -> None:
+    """Attach the exchange order id once the order is acknowledged."""
+    if not order_id:
+        return
+    _submit_write(lambda conn: conn.execute(
+        "UPDATE pending_orders SET order_id=?, updated_ts=? WHERE bot_id=? AND signal_id=?",
+        (str(order_id), _now(), str(bot_id), str(signal_id)),
+    ), wait=wait, label="set_pending_order_id")
 
-def mark_pending_failed(*args, **kwargs):
-    return None
 
-# ----------------------------
-# Dashboard live feed helpers
-# ----------------------------
+def list_pending_orders(limit: int = 50, min_retry_gap_sec: int = 1) -> List[Dict[str, Any]]:
+    """PENDING rows that are due, oldest due first.
 
-def record_trade_event(
-    bot_id: str,
-    symbol: str,
-    direction: str,
-    event_type: str,
-    *,
-    qty: Optional[Decimal] = None,
-    entry_price: Optional[Decimal] = None,
-    exit_price: Optional[Decimal] = None,
-    stop_price: Optional[Decimal] = None,
-    lock_level_pct: Optional[Decimal] = None,
-    realized_pnl: Optional[Decimal] = None,
-    reason: str = "",
-    ts: Optional[int] = None,
-):
-    """Insert a compact event for the dashboard live feed."""
-    bot_id = str(bot_id).upper().strip()
-    symbol = str(symbol).upper().strip()
-    direction = str(direction).upper().strip()
-    event_type = str(event_type).upper().strip()
-    if not ts:
-        ts = _now()
+    min_retry_gap_sec additionally skips rows tried less than that many seconds ago.
+    """
+    now = _now()
+    rows = _read_conn().execute("""
+        SELECT bot_id, signal_id, symbol, mode, side, direction, order_id, client_order_id,
+               tries, next_retry_ts, last_try_ts, ts
+        FROM pending_orders
+        WHERE status='PENDING' AND next_retry_ts <= ?
+          AND (last_try_ts IS NULL OR last_try_ts <= ?)
+        ORDER BY next_retry_ts
+        LIMIT ?
+    """, (now, now - max(0, int(min_retry_gap_sec)), max(1, int(limit)))).fetchall()
+    return [dict(r) for r in rows]
+
+
+def touch_pending_tries(keys: List[Tuple[str, str]]) -> None:
+    """Count one attempt for each (bot_id, signal_id) and push next_retry_ts back
+    exponentially (base * 2^tries, capped). Rows reaching PENDING_MAX_TRIES become FAILED.
+    """
+    if not keys:
+        return
+    now = _now()
+    params = [(now, now, now, str(b), str(s)) for b, s in keys]
 
     def _w(conn: sqlite3.Connection):
-        cur = conn.cursor()
-        cur.execute(
-            """
-            INSERT INTO trade_events (
-                bot_id, symbol, direction, event_type,
-                qty, entry_price, exit_price, stop_price, lock_level_pct,
-                realized_pnl, reason, ts
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                bot_id,
-                symbol,
-                direction,
-                event_type,
-                (str(qty) if qty is not None else None),
-                (str(entry_price) if entry_price is not None else None),
-                (str(exit_price) if exit_price is not None else None),
-                (str(stop_price) if stop_price is not None else None),
-                (str(lock_level_pct) if lock_level_pct is not None else None),
-                (str(realized_pnl) if realized_pnl is not None else None),
-                (reason or None),
-                int(ts),
-            ),
-        )
-        return True
+        conn.executemany(f"""
+            UPDATE pending_orders
+            SET tries=tries + 1,
+                last_try_ts=?,
+                next_retry_ts=? + MIN({PENDING_BACKOFF_MAX_SEC}, {PENDING_BACKOFF_BASE_SEC} * (1 << MIN(tries, 20))),
+                updated_ts=?
+            WHERE bot_id=? AND signal_id=? AND status='PENDING'
+        """, params)
+        conn.executemany("""
+            UPDATE pending_orders SET status='FAILED', note='max_tries'
+            WHERE bot_id=? AND signal_id=? AND status='PENDING' AND tries >= ?
+        """, [(str(b), str(s), PENDING_MAX_TRIES) for b, s in keys])
 
-    return _write_with_retry(_w)
+    _submit_write(_w)
 
 
-def list_trade_events(
-    *,
-    bot_id: Optional[str] = None,
-    limit: int = 50,
-    days: int = 7,
-) -> List[Dict[str, Any]]:
-    """List recent dashboard events (newest first)."""
-    limit = max(1, min(int(limit or 50), 500))
-    days = max(1, min(int(days or 7), 90))
-    since_ts = _now() - days * 86400
+def touch_pending_try(bot_id: str, signal_id: str) -> None:
+    touch_pending_tries([(bot_id, signal_id)])
 
-    conn = _connect()
-    try:
-        cur = conn.cursor()
-        if bot_id:
-            bot_id = str(bot_id).upper().strip()
-            cur.execute(
-                """
-                SELECT * FROM trade_events
-                WHERE bot_id=? AND ts>=?
-                ORDER BY ts DESC, id DESC
-                LIMIT ?
-                """,
-                (bot_id, since_ts, limit),
-            )
-        else:
-            cur.execute(
-                """
-                SELECT * FROM trade_events
-                WHERE ts>=?
-                ORDER BY ts DESC, id DESC
-                LIMIT ?
-                """,
-                (since_ts, limit),
-            )
 
-        rows = cur.fetchall()
-        return [{k: r[k] for k in r.keys()} for r in rows]
-    finally:
-        conn.close()
+def _pending_resolve(cur: sqlite3.Cursor, bot_id: str, signal_id: str, note: str, status: str = "DONE") -> bool:
+    """PENDING -> status inside the caller's transaction. False if it was already resolved."""
+    cur.execute("""
+        UPDATE pending_orders SET status=?, note=?, updated_ts=?
+        WHERE bot_id=? AND signal_id=? AND status='PENDING'
+    """, (status, str(note or "")[:500], _now(), str(bot_id), str(signal_id)))
+    return cur.rowcount > 0
 
 
-def realized_pnl_by_window(
-    window_seconds: int,
-    *,
-    bot_id: Optional[str] = None,
-) -> Dict[str, Any]:
-    """Return realized pnl + trade count over a lookback window."""
-    window_seconds = max(60, int(window_seconds))
-    since_ts = _now() - window_seconds
+def mark_pending_done(bot_id: str, signal_id: str, note: str = "") -> bool:
+    return bool(_submit_write(lambda conn: _pending_resolve(conn.cursor(), bot_id, signal_id, note, "DONE")))
 
-    conn = _connect()
-    try:
-        cur = conn.cursor()
-        if bot_id:
-            bot_id = str(bot_id).upper().strip()
-            cur.execute(
-                """
-                SELECT
-                    COUNT(*) AS trades,
-                    COALESCE(SUM(CAST(realized_pnl AS REAL)), 0.0) AS realized
-                FROM exits
-                WHERE bot_id=? AND ts>=?
-                """,
-                (bot_id, since_ts),
-            )
-        else:
-            cur.execute(
-                """
-                SELECT
-                    COUNT(*) AS trades,
-                    COALESCE(SUM(CAST(realized_pnl AS REAL)), 0.0) AS realized
-                FROM exits
-                WHERE ts>=?
-                """,
-                (since_ts,),
-            )
 
-        r = cur.fetchone()
-        return {
-            "since_ts": int(since_ts),
-            "window_seconds": int(window_seconds),
-            "bot_id": bot_id,
-            "trades": int(r["trades"] or 0),
-            "realized": float(r["realized"] or 0.0),
-        }
-    finally:
-        conn.close()
+def mark_pending_failed(bot_id: str, signal_id: str, note: str = "") -> bool:
+    return bool(_submit_write(lambda conn: _pending_resolve(conn.cursor(), bot_id, signal_id, note, "FAILED")))
 
 # ----------------------------
 # Dashboard live feed helpers
@@ -884,11 +2182,11 @@ def record_trade_event(
     realized_pnl: Optional[Decimal] = None,
     reason: str = "",
     ts: Optional[int] = None,
-):
-    """Write a lightweight event row for the web dashboard.
+    wait: bool = True,
+) -> bool:
+    """Write a small event row for the dashboard live feed.
 
-    event_type: ENTRY / EXIT / STOP_UPDATE
-    All numeric fields are stored as TEXT for Decimal safety.
+    wait=False queues the row and returns True immediately (used for STOP_UPDATE).
     """
     bot_id = str(bot_id).upper().strip()
     symbol = str(symbol).upper().strip()
@@ -925,51 +2223,105 @@ def record_trade_event(
         )
         return True
 
-    return _write_with_retry(_w)
+    if not wait:
+        _submit_write(_w, wait=False, label=f"trade_event {event_type}")
+        return True
+    return bool(_submit_write(_w))
 
 
 def list_trade_events(
     *,
     bot_id: Optional[str] = None,
-    limit: int = 50,
+    limit: int = 60,
     days: int = 7,
+    before_id: Optional[Any] = None,
+    after_id: Optional[Any] = None,
 ) -> List[Dict[str, Any]]:
-    limit = max(1, min(int(limit or 50), 500))
+    """Newest-first events. `days` bounds the first page only; page with before_id/after_id
+    cursors (see encode_cursor)."""
+    limit = max(1, min(int(limit or 60), 500))
     days = max(1, min(int(days or 7), 90))
-    since_ts = _now() - days * 86400
+    before, after = parse_cursor(before_id), parse_cursor(after_id)
+    since_ts = _now() - days * 86400 if (before is None and after is None) else 0
+
+    where = "ts>=?"
+    args: List[Any] = [since_ts]
+    if bot_id:
+        bot_id = str(bot_id).upper().strip()
+        where = "bot_id=? AND " + where
+        args.insert(0, bot_id)
+    ks_sql, ks_args, order = _keyset_clause(before, after)
+
+    conn = _read_conn()
+    cur = conn.cursor()
+    cur.execute(
+        f"""
+        SELECT * FROM trade_events
+        WHERE {where}{ks_sql}
+        ORDER BY ts {order}, id {order}
+        LIMIT ?
+        """,
+        args + ks_args + [limit],
+    )
+
+    rows = cur.fetchall()
+    if order == "ASC":
+        rows.reverse()
+    out: List[Dict[str, Any]] = []
+    for r in rows:
+        out.append({k: r[k] for k in r.keys()})
+    return out
 
-    conn = _connect()
-    try:
-        cur = conn.cursor()
-        if bot_id:
-            bot_id = str(bot_id).upper().strip()
-            cur.execute(
-                """
-                SELECT * FROM trade_events
-                WHERE bot_id=? AND ts>=?
-                ORDER BY ts DESC, id DESC
-                LIMIT ?
-                """,
-                (bot_id, since_ts, limit),
-            )
-        else:
-            cur.execute(
-                """
-                SELECT * FROM trade_events
-                WHERE ts>=?
-                ORDER BY ts DESC, id DESC
-                LIMIT ?
-                """,
-                (since_ts, limit),
-            )
 
-        rows = cur.fetchall()
-        out: List[Dict[str, Any]] = []
+EXPORT_TABLES = ("exits", "trade_events")
+
+
+def export_columns(table: str) -> List[str]:
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"unsupported export table: {table}")
+    return [r[1] for r in _read_conn().execute(f"PRAGMA table_info({table})").fetchall()]
+
+
+def iter_export_rows(
+    table: str,
+    *,
+    bot_id: Optional[str] = None,
+    since_ts: Optional[int] = None,
+    until_ts: Optional[int] = None,
+    after_id: Optional[Any] = None,
+    batch: int = 1000,
+):
+    """Yield rows of exits/trade_events oldest-first in keyset batches (constant memory).
+
+    Each batch is its own short read, so a slow client never pins a WAL snapshot.
+    after_id (a cursor, see encode_cursor) resumes an interrupted export.
+    """
+    cols = export_columns(table)
+    batch = max(1, min(int(batch), 10000))
+    where = "1=1"
+    args: List[Any] = []
+    if bot_id:
+        where += " AND bot_id=?"
+        args.append(str(bot_id).upper().strip())
+    if since_ts is not None:
+        where += " AND ts>=?"
+        args.append(int(since_ts))
+    if until_ts is not None:
+        where += " AND ts<?"
+        args.append(int(until_ts))
+
+    last = parse_cursor(after_id)
+    while True:
+        ks_sql, ks_args = ("", []) if last is None else (" AND (ts, id) > (?, ?)", [last[0], last[1]])
+        rows = _read_conn().execute(
+            f"SELECT {', '.join(cols)} FROM {table} WHERE {where}{ks_sql} ORDER BY ts ASC, id ASC LIMIT ?",
+            args + ks_args + [batch],
+        ).fetchall()
         for r in rows:
-            out.append({k: r[k] for k in r.keys()})
-        return out
-    finally:
-        conn.close()
+            yield {k: r[k] for k in cols}
+        if len(rows) < batch:
+            return
+        last = (int(rows[-1]["ts"]), int(rows[-1]["id"]))
 
 
 def realized_pnl_by_window(
@@ -977,192 +2329,220 @@ def realized_pnl_by_window(
     *,
     bot_id: Optional[str] = None,
 ) -> Dict[str, Any]:
+    """Realized PnL and trade count over a rolling window."""
     window_seconds = max(60, int(window_seconds))
     since_ts = _now() - window_seconds
 
-    conn = _connect()
-    try:
-        cur = conn.cursor()
-        if bot_id:
-            bot_id = str(bot_id).upper().strip()
-            cur.execute(
-                """
-                SELECT
-                    COUNT(*) AS trades,
-                    COALESCE(SUM(CAST(realized_pnl AS REAL)), 0.0) AS realized
-                FROM exits
-                WHERE bot_id=? AND ts>=?
-                """,
-                (bot_id, since_ts),
-            )
-        else:
-            cur.execute(
-                """
-                SELECT
-                    COUNT(*) AS trades,
-                    COALESCE(SUM(CAST(realized_pnl AS REAL)), 0.0) AS realized
-                FROM exits
-                WHERE ts>=?
-                """,
-                (since_ts,),
-            )
+    if bot_id:
+        bot_id = str(bot_id).upper().strip()
 
-        r = cur.fetchone()
-        return {
-            "since_ts": int(since_ts),
-            "window_seconds": int(window_seconds),
-            "bot_id": bot_id,
-            "trades": int(r["trades"] or 0),
-            "realized": float(r["realized"] or 0.0),
-        }
-    finally:
-        conn.close()
+    with read_snapshot() as conn:
+        r = _rollup_window(conn.cursor(), since_ts, bot_id or None)
 
-# ----------------------------
-# Dashboard live feed helpers
-# ----------------------------
+    return {
+        "since_ts": int(since_ts),
+        "window_seconds": int(window_seconds),
+        "bot_id": bot_id,
+        "trades": r["trades"],
+        "realized": float(_from_units(r["pnl_units"], PNL_SCALE)),
+        "wins": r["wins"],
+        "losses": r["losses"],
+    }
 
-def record_trade_event(
-    bot_id: str,
-    symbol: str,
-    direction: str,
-    event_type: str,
-    *,
-    qty: Optional[Decimal] = None,
-    entry_price: Optional[Decimal] = None,
-    exit_price: Optional[Decimal] = None,
-    stop_price: Optional[Decimal] = None,
-    lock_level_pct: Optional[Decimal] = None,
-    realized_pnl: Optional[Decimal] = None,
-    reason: str = "",
-    ts: Optional[int] = None,
-) -> bool:
-    """Write a small event row for the dashboard live feed."""
-    bot_id = str(bot_id).upper().strip()
-    symbol = str(symbol).upper().strip()
-    direction = str(direction).upper().strip()
-    event_type = str(event_type).upper().strip()
-    if ts is None:
-        ts = _now()
 
-    def _w(conn: sqlite3.Connection):
-        cur = conn.cursor()
-        cur.execute(
-            """
-            INSERT INTO trade_events (
-                bot_id, symbol, direction, event_type,
-                qty, entry_price, exit_price, stop_price, lock_level_pct,
-                realized_pnl, reason, ts
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                bot_id,
-                symbol,
-                direction,
-                event_type,
-                (str(qty) if qty is not None else None),
-                (str(entry_price) if entry_price is not None else None),
-                (str(exit_price) if exit_price is not None else None),
-                (str(stop_price) if stop_price is not None else None),
-                (str(lock_level_pct) if lock_level_pct is not None else None),
-                (str(realized_pnl) if realized_pnl is not None else None),
-                (reason or None),
-                int(ts),
-            ),
-        )
-        return True
+# ---------------------------
+# Retention / archive / compaction
+# ---------------------------
+# 过期行先追加到 gzip NDJSON 归档（按表 + UTC 日期分文件），fsync 之后再删除，
+# 最后 incremental_vacuum 把空闲页还给文件系统。exits / lots 永久保留（不在策略里）。
+PNL_ARCHIVE_DIR = os.path.join(BASE_DIR, os.getenv("PNL_ARCHIVE_DIR", "archive"))
+RETENTION_INTERVAL_SEC = int(os.getenv("RETENTION_INTERVAL_SEC", str(6 * 3600)))
+RETENTION_BATCH = int(os.getenv("RETENTION_BATCH", "5000"))
+# freelist pages released per writer job, so a big reclaim never holds the write lock long
+RETENTION_VACUUM_PAGES = int(os.getenv("RETENTION_VACUUM_PAGES", "2000"))
+
+# ttl_sec <= 0 means keep forever
+RETENTION_POLICIES: List[Dict[str, Any]] = [
+    {
+        "name": "trade_events.STOP_UPDATE",
+        "table": "trade_events",
+        "where": "event_type='STOP_UPDATE'",
+        "ttl_sec": int(float(os.getenv("RETAIN_STOP_UPDATE_DAYS", "7")) * 86400),
+    },
+    {
+        "name": "trade_events",
+        "table": "trade_events",
+        "where": "event_type<>'STOP_UPDATE'",
+        "ttl_sec": int(float(os.getenv("RETAIN_TRADE_EVENTS_DAYS", "90")) * 86400),
+    },
+    {
+        "name": "pending_orders",
+        "table": "pending_orders",
+        "where": "status<>'PENDING'",
+        "ttl_sec": int(float(os.getenv("RETAIN_PENDING_ORDERS_DAYS", "30")) * 86400),
+    },
+    {
+        "name": "processed_signals",
+        "table": "processed_signals",
+        "where": "1=1",
+        "ttl_sec": PROCESSED_SIGNAL_TTL_SEC,
+    },
+]
+
+_RETENTION_THREAD: Optional[threading.Thread] = None
+_RETENTION_LOCK = threading.Lock()
+
+
+def _archive_rows(table: str, rows: List[Dict[str, Any]]) -> None:
+    """Append rows to <archive>/<table>-<YYYY-MM-DD>.ndjson.gz (one gzip member per call)."""
+    by_day: Dict[str, List[Dict[str, Any]]] = {}
+    for r in rows:
+        day = time.strftime("%Y-%m-%d", time.gmtime(int(r.get("ts") or 0)))
+        by_day.setdefault(day, []).append(r)
+
+    os.makedirs(PNL_ARCHIVE_DIR, exist_ok=True)
+    for day, items in by_day.items():
+        path = os.path.join(PNL_ARCHIVE_DIR, f"{table}-{day}.ndjson.gz")
+        payload = "".join(json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n" for r in items)
+        with open(path, "ab") as f:
+            with gzip.GzipFile(fileobj=f, mode="ab") as gz:
+                gz.write(payload.encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _apply_policy(policy: Dict[str, Any], now: int) -> int:
+    ttl = int(policy.get("ttl_sec") or 0)
+    if ttl <= 0:
+        return 0
+    table = policy["table"]
+    cutoff = now - ttl
+    moved = 0
+    while True:
+        rows = _read_conn().execute(
+            f"SELECT rowid AS _rowid, * FROM {table} WHERE ts < ? AND ({policy['where']}) ORDER BY ts LIMIT ?",
+            (cutoff, RETENTION_BATCH),
+        ).fetchall()
+        if not rows:
+            break
+        items = [{k: r[k] for k in r.keys() if k != "_rowid"} for r in rows]
+        rowids = [(int(r["_rowid"]),) for r in rows]
 
-    return bool(_write_with_retry(_w))
+        # archive first (at-least-once: a crash before the delete only duplicates archive lines)
+        _archive_rows(table, items)
+        _submit_write(lambda conn, ids=rowids: conn.executemany(f"DELETE FROM {table} WHERE rowid=?", ids).rowcount)
+        moved += len(rows)
+        if len(rows) < RETENTION_BATCH:
+            break
+    return moved
 
 
-def list_trade_events(
-    *,
-    bot_id: Optional[str] = None,
-    limit: int = 60,
-    days: int = 7,
-) -> List[Dict[str, Any]]:
-    limit = max(1, min(int(limit or 60), 500))
-    days = max(1, min(int(days or 7), 90))
-    since_ts = _now() - days * 86400
+def switch_to_incremental_vacuum() -> bool:
+    """One-time offline step: set auto_vacuum=INCREMENTAL and rewrite the file with VACUUM.
 
+    The VACUUM holds the write lock for the whole rewrite, so run it in a maintenance
+    window with web and worker stopped (python pnl_store.py vacuum). True once switched.
+    """
     conn = _connect()
-    try:
-        cur = conn.cursor()
-        if bot_id:
-            bot_id = str(bot_id).upper().strip()
-            cur.execute(
-                """
-                SELECT * FROM trade_events
-                WHERE bot_id=? AND ts>=?
-                ORDER BY ts DESC, id DESC
-                LIMIT ?
-                """,
-                (bot_id, since_ts, limit),
-            )
-        else:
-            cur.execute(
-                """
-                SELECT * FROM trade_events
-                WHERE ts>=?
-                ORDER BY ts DESC, id DESC
-                LIMIT ?
-                """,
-                (since_ts, limit),
-            )
+    if int(conn.execute("PRAGMA auto_vacuum").fetchone()[0]) == 2:
+        return True
+    t0 = time.time()
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("VACUUM")
+    print(f"[PNL] auto_vacuum=INCREMENTAL after VACUUM in {time.time() - t0:.2f}s")
+    return int(conn.execute("PRAGMA auto_vacuum").fetchone()[0]) == 2
 
-        rows = cur.fetchall()
-        out: List[Dict[str, Any]] = []
-        for r in rows:
-            out.append({k: r[k] for k in r.keys()})
-        return out
-    finally:
-        conn.close()
 
+def _incremental_vacuum(conn: sqlite3.Connection) -> int:
+    # fetchall() steps the PRAGMA to completion; one step only releases one page
+    before = int(conn.execute("PRAGMA freelist_count").fetchone()[0])
+    conn.execute(f"PRAGMA incremental_vacuum({max(1, RETENTION_VACUUM_PAGES)})").fetchall()
+    return before - int(conn.execute("PRAGMA freelist_count").fetchone()[0])
 
-def realized_pnl_by_window(
-    window_seconds: int,
-    *,
-    bot_id: Optional[str] = None,
-) -> Dict[str, Any]:
-    """Realized PnL and trade count over a rolling window."""
-    window_seconds = max(60, int(window_seconds))
-    since_ts = _now() - window_seconds
 
-    conn = _connect()
-    try:
-        cur = conn.cursor()
-        if bot_id:
-            bot_id = str(bot_id).upper().strip()
-            cur.execute(
-                """
-                SELECT
-                    COUNT(*) AS trades,
-                    COALESCE(SUM(CAST(realized_pnl AS REAL)), 0.0) AS realized
-                FROM exits
-                WHERE bot_id=? AND ts>=?
-                """,
-                (bot_id, since_ts),
-            )
-        else:
-            cur.execute(
-                """
-                SELECT
-                    COUNT(*) AS trades,
-                    COALESCE(SUM(CAST(realized_pnl AS REAL)), 0.0) AS realized
-                FROM exits
-                WHERE ts>=?
-                """,
-                (since_ts,),
-            )
+def run_retention() -> Dict[str, Any]:
+    """Archive + delete expired rows per RETENTION_POLICIES, then incremental vacuum."""
+    with _RETENTION_LOCK:
+        t0 = time.time()
+        now = _now()
+        conn = _connect()
+        page_size = int(conn.execute("PRAGMA page_size").fetchone()[0])
+        size_before = os.path.getsize(DB_PATH) if os.path.exists(DB_PATH) else 0
 
-        r = cur.fetchone()
-        return {
-            "since_ts": int(since_ts),
-            "window_seconds": int(window_seconds),
-            "bot_id": bot_id,
-            "trades": int((r["trades"] or 0) if r else 0),
-            "realized": float((r["realized"] or 0.0) if r else 0.0),
+        archived: Dict[str, int] = {}
+        for policy in RETENTION_POLICIES:
+            try:
+                archived[policy["name"]] = _apply_policy(policy, now)
+            except Exception as e:
+                archived[policy["name"]] = -1
+                print(f"[PNL] retention {policy['name']} error: {e!r}")
+
+        free_before = int(conn.execute("PRAGMA freelist_count").fetchone()[0])
+        if int(conn.execute("PRAGMA auto_vacuum").fetchone()[0]) == 2:
+            # bounded jobs so live writes interleave with the reclaim
+            while _submit_write(_incremental_vacuum, label="incremental_vacuum") > 0:
+                pass
+        elif free_before > 0:
+            print(f"[PNL] retention: auto_vacuum is not INCREMENTAL, {free_before} free pages stay in the file; "
+                  "run `python pnl_store.py vacuum` in a maintenance window")
+        free_after = int(conn.execute("PRAGMA freelist_count").fetchone()[0])
+        try:
+            conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+        except sqlite3.OperationalError:
+            pass
+        size_after = os.path.getsize(DB_PATH) if os.path.exists(DB_PATH) else 0
+
+        report = {
+            "archived": archived,
+            "bytes_reclaimed": (free_before - free_after) * page_size,
+            "freelist_pages": free_after,
+            "db_bytes_before": size_before,
+            "db_bytes_after": size_after,
+            "elapsed_sec": round(time.time() - t0, 3),
         }
-    finally:
-        conn.close()
+        print(f"[PNL] retention: {report}")
+        return report
+
+
+def start_retention_thread(interval_sec: Optional[int] = None) -> None:
+    """Run run_retention() every interval_sec in a daemon thread (start from ONE process only)."""
+    global _RETENTION_THREAD
+    if _RETENTION_THREAD is not None and _RETENTION_THREAD.is_alive():
+        return
+    every = max(60, int(interval_sec or RETENTION_INTERVAL_SEC))
+
+    def _loop():
+        while True:
+            try:
+                run_retention()
+            except Exception as e:
+                print(f"[PNL] retention loop error: {e!r}")
+            time.sleep(every)
+
+    _RETENTION_THREAD = threading.Thread(target=_loop, daemon=True, name="pnl-retention")
+    _RETENTION_THREAD.start()
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="pnl_store maintenance")
+    sub_p = ap.add_subparsers(dest="cmd", required=True)
+    sub_p.add_parser("backfill-rollups", help="rebuild pnl_hourly from the exits table")
+    sub_p.add_parser("retention", help="archive expired rows and run incremental vacuum once")
+    sub_p.add_parser("vacuum", help="one-time switch to auto_vacuum=INCREMENTAL (full VACUUM; stop web + worker first)")
+    args = ap.parse_args()
+
+    init_db()
+    if args.cmd == "backfill-rollups":
+        t0 = time.time()
+        n = rebuild_pnl_hourly()
+        print(f"[PNL] pnl_hourly rebuilt: buckets={n} in {time.time() - t0:.2f}s")
+    elif args.cmd == "retention":
+        run_retention()
+    elif args.cmd == "vacuum":
+        switch_to_incremental_vacuum()
+    flush_writes()
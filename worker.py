@@ -1,21 +1,22 @@
 import os
 import time
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
 
 from pnl_store import (
     init_db,
     list_pending_orders,
-    touch_pending_try,
-    mark_pending_done,
+    touch_pending_tries,
     mark_pending_failed,
     record_entry,
     record_exit_fifo,
     set_lock_level_pct,
     clear_lock_level_pct,
+    start_retention_thread,
 )
 
-from apex_client import get_fill_summary
+from apex_client import get_fill_summary, get_fill_summaries, start_ticker_refresher
 
 # Reuse the monitor/risk threads implemented inside the web app module
 import app as app_module
@@ -37,12 +38,18 @@ def main():
     os.environ.setdefault("ENABLE_RISK_LOOP", "1")  # <-- bot-side SL + ladder trailing
     os.environ.setdefault("RISK_PRICE_SOURCE", "MARK")  # MARK / LAST / INDEX / L1
     os.environ.setdefault("ENABLE_EXCHANGE_PROTECTIVE", "0")
+    os.environ.setdefault("ENABLE_TICKER_REFRESHER", "1")
 
     # Pending reconcile defaults
     os.environ.setdefault("PENDING_RETRY_GAP_SEC", "1")
     os.environ.setdefault("PENDING_FILL_WAIT_SEC", "2.0")
     os.environ.setdefault("PENDING_FILL_POLL_INTERVAL", "0.2")
 
+    # Bulk ticker refresh for the risk loop's marks (web processes leave it off)
+    if str(os.getenv("ENABLE_TICKER_REFRESHER", "1")).strip() == "1":
+        start_ticker_refresher()
+        print("[worker] started ticker refresher")
+
     started_any = False
 
     # Start monitor thread (private WS + fills/orders handling)
@@ -71,98 +78,127 @@ def main():
     # ------------------------------------------------------------------
     # Background reconciliation: record entries/exits when fills are delayed
     # ------------------------------------------------------------------
+    def _resolve_pending(p: dict, fill: dict) -> bool:
+        bot_id = str(p.get("bot_id"))
+        sig_id = str(p.get("signal_id"))
+        symbol = str(p.get("symbol"))
+        mode = str(p.get("mode"))
+        side = str(p.get("side"))
+        direction = str(p.get("direction"))
+
+        try:
+            qty = Decimal(str(fill.get("filled_qty") or "0"))
+            px = Decimal(str(fill.get("avg_fill_price") or "0"))
+        except Exception:
+            return False
+        if qty <= 0 or px <= 0:
+            return False
+
+        if mode == "entry":
+            # resolves the pending row in the same transaction; False = web already recorded it
+            if not record_entry(
+                bot_id=bot_id,
+                symbol=symbol,
+                side=side,
+                qty=qty,
+                price=px,
+                reason="pending_entry_reconcile",
+                pending_signal_id=sig_id,
+            ):
+                return True
+
+            # Initialize ladder base lock if needed
+            try:
+                if hasattr(app_module, "_bot_uses_ladder") and app_module._bot_uses_ladder(bot_id, direction):
+                    base = getattr(app_module, "LADDER_BASE_SL_PCT", Decimal("0.5"))
+                    try:
+                        set_lock_level_pct(bot_id, symbol, direction, -Decimal(str(base)))
+                    except Exception:
+                        pass
+            except Exception:
+                pass
+
+        elif mode == "exit":
+            out = record_exit_fifo(
+                bot_id=bot_id,
+                symbol=symbol,
+                entry_side=side,  # side is the entry side for record_exit_fifo
+                exit_qty=qty,
+                exit_price=px,
+                reason="pending_exit_reconcile",
+                pending_signal_id=sig_id,
+            )
+            if (out or {}).get("duplicate"):
+                return True
+            try:
+                clear_lock_level_pct(bot_id, symbol, direction)
+            except Exception:
+                pass
+        else:
+            mark_pending_failed(bot_id, sig_id, note=f"unknown_mode:{mode}")
+            return True
+
+        print(f"[worker][pending] reconciled {mode} bot={bot_id} sig={sig_id} qty={qty} px={px} src={fill.get('source')}")
+        return True
+
+    def _wait_and_resolve(p: dict) -> bool:
+        try:
+            fill = get_fill_summary(
+                symbol=str(p.get("symbol")),
+                order_id=str(p.get("order_id") or "") or None,
+                client_order_id=str(p.get("client_order_id") or "") or None,
+                max_wait_sec=float(os.getenv("PENDING_FILL_WAIT_SEC", "2.0")),
+                poll_interval=float(os.getenv("PENDING_FILL_POLL_INTERVAL", "0.2")),
+            )
+        except Exception:
+            return False
+        return _resolve_pending(p, fill)
+
+    reconcile_workers = max(1, int(os.getenv("PENDING_RECONCILE_WORKERS", "8")))
+    reconcile_pool = ThreadPoolExecutor(max_workers=reconcile_workers, thread_name_prefix="pending-fill")
+
     def _reconcile_pending_loop():
         while True:
             try:
                 gap = int(float(os.getenv("PENDING_RETRY_GAP_SEC", "1")))
-                pendings = list_pending_orders(limit=50, min_retry_gap_sec=max(1, gap))
+                pendings = list_pending_orders(limit=int(os.getenv("PENDING_RECONCILE_BATCH", "50")), min_retry_gap_sec=max(1, gap))
                 if not pendings:
                     time.sleep(0.5)
                     continue
 
+                todo = []
                 for p in pendings:
-                    bot_id = str(p.get("bot_id"))
-                    sig_id = str(p.get("signal_id"))
-                    symbol = str(p.get("symbol"))
-                    mode = str(p.get("mode"))
-                    side = str(p.get("side"))
-                    direction = str(p.get("direction"))
-                    order_id = str(p.get("order_id") or "")
-                    client_order_id = str(p.get("client_order_id") or "")
-
-                    if not bot_id or not sig_id or not symbol or (not order_id and not client_order_id):
-                        mark_pending_failed(bot_id, sig_id, note="missing_keys")
+                    if not p.get("order_id") and not p.get("client_order_id"):
+                        mark_pending_failed(str(p.get("bot_id")), str(p.get("signal_id")), note="missing_keys")
                         continue
+                    todo.append(p)
 
-                    touch_pending_try(bot_id, sig_id)
+                # count the attempt (and back off) up-front so a crash mid-batch cannot hot-loop
+                touch_pending_tries([(str(p.get("bot_id")), str(p.get("signal_id"))) for p in todo])
 
-                    try:
-                        fill = get_fill_summary(
-                            symbol=symbol,
-                            order_id=order_id,
-                            client_order_id=client_order_id,
-                            max_wait_sec=float(os.getenv("PENDING_FILL_WAIT_SEC", "2.0")),
-                            poll_interval=float(os.getenv("PENDING_FILL_POLL_INTERVAL", "0.2")),
-                        )
-                    except Exception:
-                        continue
+                # 1) one recent-fills call per symbol resolves most of a burst
+                try:
+                    fills = get_fill_summaries(todo)
+                except Exception as e:
+                    print("[worker][pending] batched fill lookup error:", e)
+                    fills = [None] * len(todo)
 
+                rest = []
+                for p, fill in zip(todo, fills):
                     try:
-                        qty = Decimal(str(fill.get("filled_qty") or "0"))
-                        px = Decimal(str(fill.get("avg_fill_price") or "0"))
-                    except Exception:
+                        if fill and _resolve_pending(p, fill):
+                            continue
+                    except Exception as e:
+                        print(f"[worker][pending] resolve error sig={p.get('signal_id')}: {e}")
                         continue
+                    rest.append(p)
 
-                    if qty <= 0 or px <= 0:
-                        continue
-
-                    if mode == "entry":
-                        try:
-                            record_entry(
-                                bot_id=bot_id,
-                                symbol=symbol,
-                                side=side,
-                                qty=qty,
-                                price=px,
-                                reason="pending_entry_reconcile",
-                            )
-                        except Exception:
-                            # likely already recorded; treat as done
-                            pass
-
-                        # Initialize ladder base lock if needed
-                        try:
-                            if hasattr(app_module, "_bot_uses_ladder") and app_module._bot_uses_ladder(bot_id, direction):
-                                base = getattr(app_module, "LADDER_BASE_SL_PCT", Decimal("0.5"))
-                                try:
-                                    set_lock_level_pct(bot_id, symbol, direction, -Decimal(str(base)))
-                                except Exception:
-                                    pass
-                        except Exception:
-                            pass
-
-                        mark_pending_done(bot_id, sig_id, note=f"reconciled_entry qty={qty} px={px}")
-
-                    elif mode == "exit":
-                        entry_side = side  # side is the entry side for record_exit_fifo
-                        try:
-                            record_exit_fifo(
-                                bot_id=bot_id,
-                                symbol=symbol,
-                                entry_side=entry_side,
-                                exit_qty=qty,
-                                exit_price=px,
-                                reason="pending_exit_reconcile",
-                            )
-                        except Exception:
-                            pass
-                        try:
-                            clear_lock_level_pct(bot_id, symbol, direction)
-                        except Exception:
-                            pass
-                        mark_pending_done(bot_id, sig_id, note=f"reconciled_exit qty={qty} px={px}")
-                    else:
-                        mark_pending_failed(bot_id, sig_id, note=f"unknown_mode:{mode}")
+                # 2) the rest wait for WS/REST per order, concurrently
+                for p, fut in [(p, reconcile_pool.submit(_wait_and_resolve, p)) for p in rest]:
+                    try:
+                        fut.result()
+                    except Exception as e:
+                        print(f"[worker][pending] resolve error sig={p.get('signal_id')}: {e}")
 
             except Exception as e:
                 print("[worker][pending] reconcile loop error:", e)
@@ -171,6 +207,10 @@ def main():
     threading.Thread(target=_reconcile_pending_loop, daemon=True, name="pending-reconcile").start()
     print("[worker] started pending reconcile loop")
 
+    # Retention/archiving runs in the worker only (the web process never prunes)
+    start_retention_thread()
+    print("[worker] started retention loop")
+
     while True:
         time.sleep(60)
 